@@ -0,0 +1,96 @@
+"""
+Benchmark: per-polygon shoelace loop vs the vectorized area engine (areas.py).
+Builds random roof-like polygons and masks, times calculate_polygon_area
+(one pure-Python loop per polygon) against pack_polygons + polygon_areas_px
+on one ragged array, checks the planar areas agree, and shows how far the
+nominal 0.0625 sqft/pixel is from the ground scale at a few latitudes.
+
+The headline speedup is end to end: Python lists in, areas out, packing
+included. The array-only time (already packed) and the ground-area and
+mask timings are printed for reference; repair costing uses none of these
+(it scales pixel counts, see areas.pixel_areas_sqft).
+
+Usage: python benchmarks/bench_areas.py [n_polygons ...]   (default: 10000 100000)
+"""
+import math
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+root_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(root_dir))
+
+from areas import (
+    PIXEL_TO_SQFT,
+    PixelGrid,
+    calculate_polygon_area,
+    mask_areas_sqft,
+    pack_polygons,
+    polygon_areas_px,
+    polygon_areas_sqft,
+    sqft_per_pixel,
+)
+
+
+def make_polygons(n_polygons: int, seed: int = 42):
+    """Star-shaped polygons of 4-24 vertices, 10-60 px radius, spread over a 20k px image."""
+    rng = np.random.default_rng(seed)
+    polygons = []
+    for _ in range(n_polygons):
+        k = int(rng.integers(4, 25))
+        angles = np.sort(rng.uniform(0, 2 * math.pi, k))
+        radii = rng.uniform(10, 60, k)
+        cx, cy = rng.uniform(0, 20000, 2)
+        polygons.append(list(zip((cx + radii * np.cos(angles)).tolist(), (cy + radii * np.sin(angles)).tolist())))
+    return polygons
+
+
+def bench(n_polygons: int) -> None:
+    polygons = make_polygons(n_polygons)
+    grid = PixelGrid.at_latitude(32.79)
+
+    start = time.perf_counter()
+    loop = [calculate_polygon_area(polygon) for polygon in polygons]
+    loop_sec = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vertices, offsets = pack_polygons(polygons)
+    pack_sec = time.perf_counter() - start
+
+    start = time.perf_counter()
+    planar = polygon_areas_px(vertices, offsets)
+    planar_sec = time.perf_counter() - start
+
+    start = time.perf_counter()
+    ground = polygon_areas_sqft(vertices, offsets, grid)
+    ground_sec = time.perf_counter() - start
+
+    # Masks: each polygon's bounding box filled, ragged sizes
+    boxes = [(min(p[i][1] for i in range(len(p))), max(p[i][1] for i in range(len(p))),
+              min(p[i][0] for i in range(len(p))), max(p[i][0] for i in range(len(p)))) for p in polygons]
+    masks = [np.ones((int(y1 - y0) + 1, int(x1 - x0) + 1), dtype=bool) for y0, y1, x0, x1 in boxes]
+    start = time.perf_counter()
+    mask_areas_sqft(masks, [y0 for y0, _, _, _ in boxes], grid)
+    mask_sec = time.perf_counter() - start
+
+    error = float(np.max(np.abs(planar - np.asarray(loop)) / np.maximum(loop, 1e-9)))
+    ratio = float(ground.sum() / (planar.sum() * PIXEL_TO_SQFT))
+    vectorized_sec = pack_sec + planar_sec
+    print(f"{n_polygons:>8,} polygons | loop {loop_sec * 1000:8.1f} ms | "
+          f"pack + planar {vectorized_sec * 1000:7.1f} ms (speedup {loop_sec / vectorized_sec:4.1f}x) | "
+          f"planar only {planar_sec * 1000:6.1f} ms | "
+          f"ground {ground_sec * 1000:6.1f} ms | masks {mask_sec * 1000:7.1f} ms | "
+          f"max rel diff {error:.1e} | ground/nominal at 32.79N {ratio:.3f}")
+    if error > 1e-9:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 100_000]
+    for lat in (0.0, 25.76, 32.79, 40.71, 47.61):
+        print(f"lat {lat:5.2f}: {sqft_per_pixel(lat):.4f} sqft/pixel at zoom 21 "
+              f"({sqft_per_pixel(lat) / PIXEL_TO_SQFT:.1%} of the nominal {PIXEL_TO_SQFT})")
+    for size in sizes:
+        bench(size)
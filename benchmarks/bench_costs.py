@@ -0,0 +1,132 @@
+"""
+Benchmark: scalar calculate_repair_costs vs vectorized calculate_repair_costs_bulk.
+Prices the same synthetic damages both ways, end to end (damage objects in,
+one RepairCosts per roof out), checks the results are identical and prints
+timings. Each size runs twice: without a result (nominal 0.0625 sqft/pixel)
+and with a georeferenced result, where every damage is scaled at its own
+image row as in production.
+
+Usage: python benchmarks/bench_costs.py [n_damages ...]   (default: 10000 1000000)
+"""
+import random
+import sys
+import time
+from dataclasses import dataclass
+from enum import Enum
+from pathlib import Path
+from typing import Optional, Tuple
+
+# Same import setup as main.py: MVP modules + parent AI_Roof_Damage_Detection
+root_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(root_dir.parent / "AI_Roof_Damage_Detection"))
+sys.path.insert(0, str(root_dir))
+
+from src.detection.damage_detector import DamageType, DamageSeverity
+from mvp_costs import calculate_repair_costs, calculate_repair_costs_bulk, damages_to_columns
+from mvp_geometry import TILE_SIZE, Bounds, tile_range
+
+# A ~2 km box in Dallas (75201) at zoom 21
+BENCH_BOUNDS = Bounds(south=32.775, west=-96.81, north=32.795, east=-96.79)
+BENCH_ZOOM = 21
+
+
+class UnlistedDamageType(Enum):
+    """A damage type the cost tables do not know (priced as "unknown")."""
+    DEBRIS = "debris"
+
+
+@dataclass
+class BenchDamage:
+    """Minimal damage record with the fields the cost engines read."""
+    damage_type: Enum
+    severity: DamageSeverity
+    area_pixels: int
+    roof_id: int
+    bbox: Tuple[int, int, int, int]
+
+
+@dataclass
+class BenchResult:
+    """Minimal analysis result with the fields the ground scale reads (mosaic_georef)."""
+    image_width: int
+    image_height: int
+    bounding_box: Tuple[float, float, float, float]
+    center_lat: float
+    center_lng: float
+
+
+def make_result() -> BenchResult:
+    """Unscaled mosaic of BENCH_BOUNDS' tile range."""
+    x0, y0, x1, y1 = tile_range(BENCH_BOUNDS, BENCH_ZOOM)
+    lat, lng = BENCH_BOUNDS.center
+    return BenchResult(
+        image_width=(x1 - x0) * TILE_SIZE,
+        image_height=(y1 - y0) * TILE_SIZE,
+        bounding_box=(BENCH_BOUNDS.south, BENCH_BOUNDS.west, BENCH_BOUNDS.north, BENCH_BOUNDS.east),
+        center_lat=lat,
+        center_lng=lng
+    )
+
+
+def make_damages(n_damages: int, image_height: int, damages_per_roof: int = 4, seed: int = 42):
+    """Random damages spread over n_damages / damages_per_roof roofs; 1% of an unlisted type."""
+    rng = random.Random(seed)
+    types = list(DamageType)
+    severities = list(DamageSeverity)
+    n_roofs = max(1, n_damages // damages_per_roof)
+    damages = []
+    for _ in range(n_damages):
+        y = rng.randrange(max(1, image_height - 100))
+        x = rng.randrange(10000)
+        damages.append(BenchDamage(
+            damage_type=UnlistedDamageType.DEBRIS if rng.random() < 0.01 else rng.choice(types),
+            severity=rng.choice(severities),
+            area_pixels=rng.randint(10, 20000),
+            roof_id=rng.randrange(n_roofs),
+            bbox=(x, y, x + 80, y + 80)
+        ))
+    return damages
+
+
+def bench(n_damages: int, result: Optional[BenchResult]) -> None:
+    damages = make_damages(n_damages, result.image_height if result is not None else 10000)
+    label = "georeferenced" if result is not None else "nominal"
+
+    # Scalar path as main.py used it: group per roof, one call per roof
+    start = time.perf_counter()
+    by_roof = {}
+    for damage in damages:
+        by_roof.setdefault(damage.roof_id, []).append(damage)
+    scalar = {roof_id: calculate_repair_costs(result, damages=roof_damages)
+              for roof_id, roof_damages in by_roof.items()}
+    scalar_sec = time.perf_counter() - start
+
+    # Bulk path end to end: objects -> columns -> reductions -> RepairCosts
+    start = time.perf_counter()
+    columns = damages_to_columns(damages, result)
+    convert_sec = time.perf_counter() - start
+
+    start = time.perf_counter()
+    bulk = calculate_repair_costs_bulk(columns)
+    bulk_sec = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vectorized = bulk.to_repair_costs()
+    materialize_sec = time.perf_counter() - start
+    end_to_end_sec = convert_sec + bulk_sec + materialize_sec
+
+    mismatches = sum(1 for roof_id, costs in scalar.items() if vectorized.get(roof_id) != costs)
+    print(f"{n_damages:>9,} damages / {len(scalar):>7,} roofs, {label:<13} | "
+          f"scalar {scalar_sec * 1000:9.1f} ms | "
+          f"bulk {end_to_end_sec * 1000:9.1f} ms (speedup {scalar_sec / end_to_end_sec:4.1f}x): "
+          f"{convert_sec * 1000:.1f} ms to columns, {bulk_sec * 1000:.1f} ms reductions, "
+          f"{materialize_sec * 1000:.1f} ms to RepairCosts | mismatches {mismatches}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10_000, 1_000_000]
+    for size in sizes:
+        bench(size, None)
+        bench(size, make_result())
@@ -0,0 +1,366 @@
+"""
+Benchmark: offline end-to-end MVP flow.
+Replays the cached tiles in cache/tiles/ through a local fake MapTiler
+server, sends every report to a local SMTP sink and prices/renders fixed
+synthetic AnalysisResults of 10, 1k and 100k roofs. Each stage is timed with
+mvp_trace, and throughput is compared against a stored baseline so
+regressions fail loudly.
+
+No network access, models or credentials are needed.
+
+Usage:
+    python benchmarks/bench_e2e.py                       # compare against baseline
+    python benchmarks/bench_e2e.py --save-baseline       # record a new baseline
+    python benchmarks/bench_e2e.py --sizes 10 1000 --max-emails 200
+"""
+import argparse
+import asyncio
+import json
+import random
+import socketserver
+import sys
+import tempfile
+import threading
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+from loguru import logger
+from PIL import Image
+
+# Same import setup as main.py: MVP modules + parent AI_Roof_Damage_Detection
+root_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(root_dir.parent / "AI_Roof_Damage_Detection"))
+sys.path.insert(0, str(root_dir))
+
+from src.detection.damage_detector import DamageType, DamageSeverity
+from src.output.json_generator import AnalysisResult
+from mvp_index import ResultIndex
+from mvp_crops import CropSettings, render_roof_crops
+from mvp_email import build_damage_report_message, build_crop_attachments, load_template, TEMPLATE_PLACEHOLDERS
+from mvp_smtp import SMTPTransport
+from mvp_dispatch import DispatchConfig, EmailDispatcher, OutgoingEmail
+from mvp_tiles import TileFetcher
+from mvp_tile_cache import TileCache, TileCacheConfig
+from mvp_trace import RunTracer, stage
+
+BASELINE_PATH = Path(__file__).parent / "baseline_e2e.json"
+TILE_CACHE_DIR = root_dir / "cache" / "tiles"
+DEFAULT_SIZES = (10, 1_000, 100_000)
+
+# Largest side of the synthetic mosaics; bigger results are rescaled like saved images
+MOSAIC_MAX_SIDE = 4096
+
+# Stages faster than this in the baseline are too noisy to compare
+MIN_COMPARE_SEC = 0.05
+
+
+@dataclass
+class BenchRoof:
+    """Minimal roof record with the fields the MVP modules read."""
+    id: int
+    bbox: Tuple[float, float, float, float]
+    center: Tuple[float, float]
+    area_pixels: int
+    confidence: float
+
+
+@dataclass
+class BenchDamage:
+    """Minimal damage record with the fields the MVP modules read."""
+    damage_type: DamageType
+    severity: DamageSeverity
+    area_pixels: int
+    roof_id: int
+    bbox: Tuple[float, float, float, float]
+    confidence: float
+
+
+def make_result(n_roofs: int, damaged_share: float = 0.3, seed: int = 42) -> AnalysisResult:
+    """Fixed synthetic result: roofs on a grid, 1-4 damages on a share of them."""
+    rng = random.Random(seed)
+    types = list(DamageType)
+    severities = list(DamageSeverity)
+    cell = 64
+    columns = max(1, int(n_roofs ** 0.5))
+    roofs, damages = [], []
+    for roof_id in range(1, n_roofs + 1):
+        x0 = ((roof_id - 1) % columns) * cell + rng.randint(0, 8)
+        y0 = ((roof_id - 1) // columns) * cell + rng.randint(0, 8)
+        w, h = rng.randint(24, 52), rng.randint(24, 52)
+        roofs.append(BenchRoof(roof_id, (x0, y0, x0 + w, y0 + h), (x0 + w / 2, y0 + h / 2), w * h,
+                               rng.uniform(0.2, 0.99)))
+        if rng.random() < damaged_share:
+            for _ in range(rng.randint(1, 4)):
+                damages.append(BenchDamage(rng.choice(types), rng.choice(severities), rng.randint(10, w * h // 4),
+                                           roof_id, (x0, y0, x0 + w // 2, y0 + h // 2), rng.uniform(0.25, 0.99)))
+    side = columns * cell
+    return AnalysisResult(
+        zipcode="00000",
+        timestamp="2024-01-01T00:00:00",
+        processing_time_sec=0.0,
+        center_lat=32.78,
+        center_lng=-96.80,
+        bounding_box=None,
+        image_width=side,
+        image_height=((n_roofs - 1) // columns + 1) * cell,
+        tiles_processed=0,
+        roofs=roofs,
+        damages=damages,
+        total_roofs=len(roofs),
+        roofs_with_damage=len({d.roof_id for d in damages}),
+        total_damage_area_pixels=sum(d.area_pixels for d in damages),
+        performance={}
+    )
+
+
+def make_mosaic(result: AnalysisResult, path: Path, seed: int = 42) -> None:
+    """Noise image standing in for a saved annotated image / heatmap."""
+    scale = min(1.0, MOSAIC_MAX_SIDE / max(result.image_width, result.image_height))
+    size = (max(1, int(result.image_width * scale)), max(1, int(result.image_height * scale)))
+    pixels = np.random.default_rng(seed).integers(0, 255, (size[1], size[0], 3), dtype=np.uint8)
+    Image.fromarray(pixels).save(path)
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """Local SMTP server that accepts and discards every message."""
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _SMTPSinkHandler)
+        self.messages = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+
+class _SMTPSinkHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line: str) -> None:
+        self.wfile.write(line.encode("ascii") + b"\r\n")
+
+    def handle(self) -> None:
+        self._reply("220 sink ESMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line[:4].upper()
+            if command in (b"EHLO", b"HELO"):
+                self.wfile.write(b"250-sink\r\n250 8BITMIME\r\n")
+            elif command == b"DATA":
+                self._reply("354 end with <CRLF>.<CRLF>")
+                size = 0
+                for data_line in self.rfile:
+                    if data_line in (b".\r\n", b".\n"):
+                        break
+                    size += len(data_line)
+                with self.server._lock:
+                    self.server.messages += 1
+                    self.server.bytes += size
+                self._reply("250 queued")
+            elif command == b"QUIT":
+                self._reply("221 bye")
+                return
+            else:
+                self._reply("250 ok")
+
+
+class FakeMapTiler(ThreadingHTTPServer):
+    """Local tile server replaying cached tile files for any (z, x, y)."""
+    daemon_threads = True
+
+    def __init__(self, tiles: List[bytes]):
+        super().__init__(("127.0.0.1", 0), _FakeMapTilerHandler)
+        self.tiles = tiles
+
+    @property
+    def url_template(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/tiles/{{z}}/{{x}}/{{y}}.png?key={{key}}"
+
+
+class _FakeMapTilerHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        _, _, z, x, y = self.path.split("?")[0].rsplit(".", 1)[0].split("/")
+        body = self.server.tiles[(int(x) * 31 + int(y)) % len(self.server.tiles)]
+        self.send_response(200)
+        self.send_header("Content-Type", "image/png")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+def load_cached_tiles(limit: int) -> List[bytes]:
+    """Tiles from cache/tiles/, or generated noise tiles when it is empty."""
+    paths = sorted(TILE_CACHE_DIR.glob("tile_*.png"))[:limit]
+    if paths:
+        return [p.read_bytes() for p in paths]
+    rng = np.random.default_rng(0)
+    tiles = []
+    for _ in range(min(limit, 64)):
+        buffer = tempfile.SpooledTemporaryFile()
+        Image.fromarray(rng.integers(0, 255, (256, 256, 3), dtype=np.uint8)).save(buffer, format="PNG")
+        buffer.seek(0)
+        tiles.append(buffer.read())
+    return tiles
+
+
+async def bench_tiles(n_tiles: int, work_dir: Path) -> None:
+    """Fetch n_tiles from the fake server cold, then again through the tile cache."""
+    tiles = load_cached_tiles(n_tiles)
+    server = FakeMapTiler(tiles)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    keys = [(21, 480000 + i % 32, 840000 + i // 32) for i in range(n_tiles)]
+    cache = TileCache(TileCacheConfig(cache_dir=str(work_dir / "tile_store")))
+    try:
+        for name, tile_cache in (("tiles.fetch", None), ("tiles.cache_fill", cache), ("tiles.cache_hit", cache)):
+            fetcher = TileFetcher("bench", url_template=server.url_template, cache=tile_cache)
+            with stage(name, items=n_tiles) as s:
+                fetched = await fetcher.fetch_many(keys)
+                s.count(bytes=sum(len(v) for v in fetched.values() if v))
+            await fetcher.close()
+    finally:
+        cache.close()
+        server.shutdown()
+
+
+async def bench_size(n_roofs: int, max_emails: int, sink: SMTPSink, work_dir: Path) -> None:
+    """Run the post-detection flow for one synthetic result size."""
+    result = make_result(n_roofs)
+    annotated = work_dir / f"annotated_{n_roofs}.png"
+    make_mosaic(result, annotated)
+
+    with stage("index", items=len(result.damages)):
+        index = ResultIndex(result)
+    with stage("costs", items=len(result.damages)):
+        bulk = index.bulk_costs
+    emailed = index.damaged_roof_ids[:max_emails]
+    with stage("crops", items=len(emailed)):
+        crops = render_roof_crops(result, emailed, annotated_image_path=str(annotated),
+                                  settings=CropSettings(image_format="JPEG", quality=80))
+
+    template = load_template()
+    values = {name: name for name in TEMPLATE_PLACEHOLDERS}
+    with stage("template", items=len(emailed)):
+        for _ in emailed:
+            template.render(values)
+
+    emails = []
+    with stage("mime", items=len(emailed)) as s:
+        for roof_id in emailed:
+            msg = build_damage_report_message(
+                recipient_email="bench@example.com",
+                zipcode=result.zipcode,
+                result=index.roof_result(roof_id),
+                costs=bulk.costs_for(roof_id),
+                attachments=build_crop_attachments(crops.get(roof_id))
+            )
+            emails.append(OutgoingEmail(msg=msg, context={"roof_id": roof_id}))
+        s.count(bytes=sum(len(e.msg.as_bytes()) for e in emails))
+
+    config = DispatchConfig(concurrency=4, queue_size=100, max_retries=0)
+    with SMTPTransport("127.0.0.1", sink.port, use_tls=False, pool_size=config.concurrency) as transport:
+        with stage("send", items=len(emails)) as s:
+            sink_bytes = sink.bytes
+            stats = await EmailDispatcher(transport, config).dispatch(emails)
+            s.count(failed=stats.failed, bytes=sink.bytes - sink_bytes)
+
+
+def run(sizes: List[int], max_emails: int, n_tiles: int) -> Dict[str, dict]:
+    """Run every scenario; returns {scenario: {stage: metrics}}."""
+    sink = SMTPSink()
+    threading.Thread(target=sink.serve_forever, daemon=True).start()
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        work_dir = Path(tmp)
+        scenarios = [("tiles", lambda: bench_tiles(n_tiles, work_dir))]
+        scenarios += [(f"roofs_{n}", lambda n=n: bench_size(n, max_emails, sink, work_dir)) for n in sizes]
+        for name, scenario in scenarios:
+            tracer = RunTracer(name)
+            with tracer.activate():
+                asyncio.run(scenario())
+            results[name] = {
+                record.name: {
+                    "wall_sec": round(record.wall_sec, 6),
+                    "items": record.counts.get("items", 0),
+                    "items_per_sec": round(record.counts.get("items", 0) / record.wall_sec, 1)
+                    if record.wall_sec else 0.0,
+                    "bytes": record.counts.get("bytes", 0),
+                    "peak_rss_mb": record.peak_rss_mb,
+                }
+                for record in sorted(tracer.stages, key=lambda r: r.start_sec)
+            }
+    sink.shutdown()
+    return results
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    """Stages whose throughput fell more than `tolerance` below the baseline."""
+    regressions = []
+    for scenario, stages in results.items():
+        for name, metrics in stages.items():
+            base = baseline.get(scenario, {}).get(name)
+            if not base or not base["items_per_sec"] or base["wall_sec"] < MIN_COMPARE_SEC:
+                continue
+            ratio = metrics["items_per_sec"] / base["items_per_sec"]
+            if ratio < 1.0 - tolerance:
+                regressions.append(f"{scenario}/{name}: {metrics['items_per_sec']:,.1f}/s vs "
+                                   f"baseline {base['items_per_sec']:,.1f}/s ({ratio:.0%})")
+    return regressions
+
+
+def print_results(results: Dict[str, dict], baseline: Dict[str, dict]) -> None:
+    for scenario, stages in results.items():
+        print(f"\n{scenario}")
+        for name, m in stages.items():
+            base = baseline.get(scenario, {}).get(name)
+            delta = f"  ({m['items_per_sec'] / base['items_per_sec']:.0%} of baseline)" \
+                if base and base["items_per_sec"] else ""
+            print(f"  {name:<18} {m['wall_sec'] * 1000:10.1f} ms {m['items']:>8,} items "
+                  f"{m['items_per_sec']:>12,.1f}/s  rss {m['peak_rss_mb'] or 0:7.1f} MB{delta}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline end-to-end MVP benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="Roof counts")
+    parser.add_argument("--max-emails", type=int, default=500, help="Emails built and sent per size")
+    parser.add_argument("--tiles", type=int, default=462, help="Tiles fetched from the fake MapTiler")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH), help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Write results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed throughput drop (0.25 = 25%%)")
+    args = parser.parse_args()
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    results = run(args.sizes, args.max_emails, args.tiles)
+    baseline_path = Path(args.baseline)
+    baseline = {}
+    if baseline_path.exists() and not args.save_baseline:
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+
+    if args.save_baseline:
+        with open(baseline_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline written to {baseline_path}")
+    elif not baseline:
+        print(f"\nNo baseline at {baseline_path}; run with --save-baseline to record one")
+    else:
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\nREGRESSIONS (more than {args.tolerance:.0%} slower than baseline):")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("\nNo regressions against baseline")
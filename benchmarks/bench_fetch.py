@@ -0,0 +1,208 @@
+"""
+Benchmark: tile fetching against a local stub tile server.
+The stub answers any (z, x, y) after an injected latency, fails a share of
+requests with HTTP 500, throttles with 429 above a concurrency capacity and
+slows down as load approaches it, and honours If-None-Match. Each scenario
+fetches the same tiles with a fresh TileFetcher and reports throughput,
+request latency, retries, throttling and the concurrency the limiter
+settled on.
+
+No network access, models or credentials are needed.
+
+Usage:
+    python benchmarks/bench_fetch.py
+    python benchmarks/bench_fetch.py --tiles 2000 --latency-ms 80 --error-rate 0.02 --capacity 48
+"""
+import argparse
+import asyncio
+import hashlib
+import io
+import multiprocessing
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+from loguru import logger
+from PIL import Image
+
+root_dir = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(root_dir))
+
+from mvp_tiles import FetchConfig, TileFetcher
+from mvp_tile_cache import TileCache, TileCacheConfig
+
+
+class StubTileServer(ThreadingHTTPServer):
+    """Tile server with injected latency, errors and a concurrency capacity."""
+    daemon_threads = True
+    request_queue_size = 512
+
+    def __init__(self, tiles: List[bytes], latency_sec: float, jitter_sec: float, error_rate: float,
+                 capacity: int, peak_in_flight, seed: int = 0):
+        super().__init__(("127.0.0.1", 0), _StubTileHandler)
+        self.tiles = tiles
+        self.etags = [hashlib.sha1(t).hexdigest() for t in tiles]
+        self.latency_sec = latency_sec
+        self.jitter_sec = jitter_sec
+        self.error_rate = error_rate
+        self.capacity = capacity
+        self.in_flight = 0
+        self.peak_in_flight = peak_in_flight    # Shared with the benchmark process
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def admit(self) -> tuple:
+        """(admitted, delay, fail) for a new request; rejected ones are not counted in flight."""
+        with self._lock:
+            if self.in_flight >= self.capacity:
+                return False, 0.0, False
+            self.in_flight += 1
+            self.peak_in_flight.value = max(self.peak_in_flight.value, self.in_flight)
+            # Latency grows with load: up to 3x at capacity
+            load = self.in_flight / self.capacity
+            delay = (self.latency_sec + self._random.uniform(0, self.jitter_sec)) * (1 + 2 * load ** 2)
+            return True, delay, self._random.random() < self.error_rate
+
+    def done(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+
+class _StubTileHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _send(self, status: int, body: bytes = b"", headers: Dict[str, str] = None) -> None:
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        server = self.server
+        admitted, delay, fail = server.admit()
+        if not admitted:
+            self._send(429, headers={"Retry-After": "1"})
+            return
+        try:
+            time.sleep(delay)
+            if fail:
+                self._send(500)
+                return
+            _, _, z, x, y = self.path.split("?")[0].rsplit(".", 1)[0].split("/")
+            index = (int(x) * 31 + int(y)) % len(server.tiles)
+            etag = f'"{server.etags[index]}"'
+            if self.headers.get("If-None-Match") == etag:
+                self._send(304, headers={"ETag": etag})
+                return
+            self._send(200, server.tiles[index], {"Content-Type": "image/jpeg", "ETag": etag,
+                                                  "Last-Modified": "Mon, 01 Jan 2024 00:00:00 GMT"})
+        finally:
+            server.done()
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+def make_tiles(count: int) -> List[bytes]:
+    """Smooth-noise JPEG tiles, about the size of MapTiler satellite tiles."""
+    rng = np.random.default_rng(0)
+    tiles = []
+    for _ in range(count):
+        coarse = Image.fromarray(rng.integers(0, 255, (32, 32, 3), dtype=np.uint8)).resize((256, 256))
+        buffer = io.BytesIO()
+        coarse.save(buffer, format="JPEG", quality=85)
+        tiles.append(buffer.getvalue())
+    return tiles
+
+
+def serve(args, port, peak_in_flight) -> None:
+    """Stub server process (kept out of the benchmark's interpreter, so both are not bound by one GIL)."""
+    server = StubTileServer(make_tiles(32), args.latency_ms / 1000, args.jitter_ms / 1000, args.error_rate,
+                            args.capacity, peak_in_flight)
+    port.value = server.server_address[1]
+    server.serve_forever()
+
+
+async def run_scenario(url_template: str, peak_in_flight, keys, config: FetchConfig, cache: TileCache = None) -> Dict:
+    peak_in_flight.value = 0
+    fetcher = TileFetcher("bench", url_template=url_template, config=config, cache=cache)
+    try:
+        fetched = await fetcher.fetch_many(keys)
+    finally:
+        await fetcher.close()
+    summary = fetcher.summary()
+    summary["missing"] = sum(1 for v in fetched.values() if v is None)
+    summary["server_peak_in_flight"] = peak_in_flight.value
+    return summary
+
+
+def run(args) -> Dict[str, Dict]:
+    port = multiprocessing.Value("i", 0)
+    peak_in_flight = multiprocessing.Value("i", 0)
+    process = multiprocessing.Process(target=serve, args=(args, port, peak_in_flight), daemon=True)
+    process.start()
+    while not port.value:
+        time.sleep(0.05)
+    url_template = f"http://127.0.0.1:{port.value}/tiles/{{z}}/{{x}}/{{y}}.jpg?key={{key}}"
+    side = int(args.tiles ** 0.5) + 1
+    keys = [(21, 480000 + i % side, 840000 + i // side) for i in range(args.tiles)]
+    fixed = args.fixed_concurrency
+    adaptive = FetchConfig(max_concurrency=args.max_concurrency)
+
+    def scenario(config: FetchConfig, cache: TileCache = None) -> Dict:
+        return asyncio.run(run_scenario(url_template, peak_in_flight, keys, config, cache))
+
+    results = {}
+    try:
+        results[f"fixed_{fixed}"] = scenario(FetchConfig(initial_concurrency=fixed, min_concurrency=fixed,
+                                                         max_concurrency=fixed))
+        results["adaptive"] = scenario(adaptive)
+        with tempfile.TemporaryDirectory() as tmp:
+            # Fill, then expire everything: the second pass is conditional requests only
+            cache = TileCache(TileCacheConfig(cache_dir=tmp, ttl_sec=3600))
+            try:
+                scenario(adaptive, cache)
+                cache.config.ttl_sec = 0
+                results["revalidate"] = scenario(adaptive, cache)
+            finally:
+                cache.close()
+    finally:
+        process.terminate()
+        process.join()
+    return results
+
+
+def print_results(results: Dict[str, Dict]) -> None:
+    print(f"\n  {'scenario':<12} {'tiles/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'200':>6} {'304':>6} "
+          f"{'429':>6} {'retry':>6} {'miss':>5} {'conc':>5} {'peak':>5} {'server':>6}")
+    for name, s in results.items():
+        print(f"  {name:<12} {s['tiles_per_sec']:>9,.1f} {s['request_ms_p50']:>8.1f} {s['request_ms_p95']:>8.1f} "
+              f"{s['tiles_fetched']:>6} {s['not_modified']:>6} {s['throttled']:>6} {s['retries']:>6} "
+              f"{s['missing']:>5} {s['concurrency']:>5} {s['concurrency_peak']:>5} {s['server_peak_in_flight']:>6}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tile fetch benchmark against a local stub server")
+    parser.add_argument("--tiles", type=int, default=1000, help="Tiles fetched per scenario")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Base server latency")
+    parser.add_argument("--jitter-ms", type=float, default=30.0, help="Random extra latency")
+    parser.add_argument("--error-rate", type=float, default=0.01, help="Share of requests answered with 500")
+    parser.add_argument("--capacity", type=int, default=64, help="Concurrent requests before the server sends 429")
+    parser.add_argument("--fixed-concurrency", type=int, default=16, help="Limit of the fixed-concurrency baseline")
+    parser.add_argument("--max-concurrency", type=int, default=128, help="Upper bound of the adaptive limit")
+    args = parser.parse_args()
+    logger.remove()
+    logger.add(sys.stderr, level="ERROR")
+
+    print(f"Stub server: {args.latency_ms:.0f}+{args.jitter_ms:.0f} ms, {args.error_rate:.0%} errors, "
+          f"429 above {args.capacity} in flight; {args.tiles} tiles")
+    print_results(run(args))
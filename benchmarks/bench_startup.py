@@ -0,0 +1,93 @@
+"""
+Benchmark: CLI startup time and import RSS per subcommand.
+Runs each main.py subcommand in a fresh interpreter and reports wall time,
+peak RSS at exit and whether the detection stack (torch, ultralytics,
+src.pipeline) was imported.
+
+Usage: python benchmarks/bench_startup.py [repeats]   (default: 3)
+"""
+import json
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+root_dir = Path(__file__).resolve().parent.parent
+MAIN_PATH = root_dir / "main.py"
+
+HEAVY_MODULES = ("torch", "ultralytics", "cv2", "src.pipeline")
+
+# Runs main.py as __main__ and reports on stderr when the interpreter exits
+PROBE = """
+import atexit, json, runpy, sys
+sys.path.insert(0, {root!r})
+from mvp_trace import peak_rss_mb
+
+def report():
+    heavy = [m for m in {heavy!r} if m in sys.modules]
+    sys.stderr.write("STARTUP_STATS " + json.dumps({{"rss_mb": peak_rss_mb(), "heavy": heavy,
+                                                    "modules": len(sys.modules)}}) + "\\n")
+
+atexit.register(report)
+sys.argv = [{main!r}] + sys.argv[1:]
+{body}
+"""
+
+RUN_MAIN = "runpy.run_path(sys.argv[0], run_name='__main__')"
+IMPORT_STACK = "import main, mvp_app; mvp_app.bootstrap(); import src.pipeline"
+
+
+def write_sample_result(path: Path, n_roofs: int = 1000, seed: int = 42) -> None:
+    """Result file in the pipeline's JSON layout for costs-only."""
+    rng = random.Random(seed)
+    roofs, damages = [], []
+    for roof_id in range(1, n_roofs + 1):
+        x, y = rng.randint(0, 8000), rng.randint(0, 3400)
+        roofs.append({"id": roof_id, "bbox": [x, y, x + 40, y + 40], "area_pixels": 1600, "confidence": 0.8})
+        if rng.random() < 0.3:
+            damages.append({"damage_type": rng.choice(["hail_damage", "cracks", "missing_shingles"]),
+                            "severity": rng.choice(["low", "medium", "high", "critical"]),
+                            "area_pixels": rng.randint(10, 400), "roof_id": roof_id})
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"zipcode": "00000", "image_width": 8192, "image_height": 3475,
+                   "roofs": roofs, "damages": damages}, f)
+
+
+def measure(args, body: str = RUN_MAIN) -> dict:
+    probe = PROBE.format(root=str(root_dir), heavy=HEAVY_MODULES, main=str(MAIN_PATH), body=body)
+    start = time.perf_counter()
+    completed = subprocess.run([sys.executable, "-c", probe] + list(args), capture_output=True, text=True)
+    wall_sec = time.perf_counter() - start
+    # Tracebacks are reported; plain usage exits (status 1) are expected
+    lines = completed.stderr.strip().splitlines()
+    error = next((l for l in reversed(lines) if "Error" in l), None) if "Traceback" in completed.stderr else None
+    for line in lines:
+        if line.startswith("STARTUP_STATS "):
+            return {"wall_sec": wall_sec, "error": error, **json.loads(line[len("STARTUP_STATS "):])}
+    return {"wall_sec": wall_sec, "rss_mb": None, "heavy": [], "modules": 0, "error": error or "no report"}
+
+
+if __name__ == "__main__":
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    with tempfile.TemporaryDirectory() as tmp:
+        sample = Path(tmp) / "00000_0.json"
+        write_sample_result(sample)
+        cases = [
+            ("(no args)", [], RUN_MAIN),
+            ("analyze --help", ["analyze", "--help"], RUN_MAIN),
+            ("email-from-json --help", ["email-from-json", "--help"], RUN_MAIN),
+            ("costs-only (1k roofs)", ["costs-only", str(sample)], RUN_MAIN),
+            ("batch --help", ["batch", "--help"], RUN_MAIN),
+            ("detection stack import", [], IMPORT_STACK),
+        ]
+        print(f"{'case':<26} {'wall (best)':>12} {'peak RSS':>10} {'modules':>8}  heavy imports")
+        for name, args, body in cases:
+            runs = [measure(args, body) for _ in range(repeats)]
+            best = min(runs, key=lambda r: r["wall_sec"])
+            rss = f"{best['rss_mb']:.1f} MB" if best["rss_mb"] is not None else "n/a"
+            heavy = ", ".join(best["heavy"]) or "none"
+            print(f"{name:<26} {best['wall_sec'] * 1000:9.0f} ms {rss:>10} {best['modules']:>8}  {heavy}")
+            if best.get("error"):
+                print(f"{'':<26} ! {best['error']}")
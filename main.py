@@ -2,297 +2,125 @@
 MVP Satellite Roof Damage Detection System
 Simplified version: Image Fetching → Detection → Email with Costs
 Sends separate emails for each property with damage.
+
+Subcommands (see ``python main.py --help``): analyze, email-from-json,
+costs-only, batch. The detection stack (src.pipeline, torch) and the
+production settings are only imported by the subcommands that need them,
+and only those switch into the parent project (mvp_app.bootstrap), so
+``--help`` and ``costs-only`` run without it.
+The stages themselves live in mvp_app; this file is the command line.
 """
+import argparse
 import asyncio
 import sys
 import os
-import random
-from pathlib import Path
-from typing import List, Dict
-from collections import defaultdict
-
-# Add parent AI_Roof_Damage_Detection to path for imports
-parent_dir = Path(__file__).parent.parent / "AI_Roof_Damage_Detection"
-parent_dir = parent_dir.resolve()  # Resolve to absolute path
-
-# Check if parent directory exists
-if not parent_dir.exists():
-    print(f"ERROR: AI_Roof_Damage_Detection directory not found at: {parent_dir}")
-    print("Please ensure AI_Roof_Damage_Detection folder exists in the parent directory.")
-    sys.exit(1)
-
-# Add parent directory to Python path FIRST (before any imports)
-if str(parent_dir) not in sys.path:
-    sys.path.insert(0, str(parent_dir))
+from typing import List, Optional
 
-# Also add current directory for MVP modules
-current_dir = Path(__file__).parent.resolve()
-if str(current_dir) not in sys.path:
-    sys.path.insert(0, str(current_dir))
+from mvp_app import (
+    bootstrap,
+    DEFAULT_EMAILS,
+    DETECTION_BACKEND_ENV,
+    DEFAULT_DETECTION_BACKEND,
+    DETECTION_WORKERS,
+    analyze_and_email_per_property,
+    email_saved_results,
+    print_costs,
+    run_with_profile,
+)
 
-# Change working directory to parent for relative imports
-try:
-    os.chdir(str(parent_dir))
-except Exception as e:
-    print(f"WARNING: Could not change directory to {parent_dir}: {e}")
-    print("Continuing with current directory...")
 
-# Load .env from production project BEFORE importing settings
-from dotenv import load_dotenv
-env_path = parent_dir / ".env"
-if env_path.exists():
-    load_dotenv(env_path)
-    print(f"✓ Loaded .env from: {env_path}")
-else:
-    print(f"⚠ Warning: .env not found at {env_path}")
-
-from src.pipeline import RoofDamagePipeline, PipelineConfig
-from src.utils.logger import setup_logger
-from config.settings import get_settings
-from src.output.json_generator import AnalysisResult
-from mvp_email import send_damage_report_email
-from mvp_costs import calculate_repair_costs
+def print_emails(email_list: List[str], provided: bool) -> None:
+    if provided:
+        print(f"📧 Provided {len(email_list)} email address(es)")
+    else:
+        print("📧 Using default emails for MVP:")
+    for i, email in enumerate(email_list, 1):
+        print(f"   {i}. {email}")
 
 
-def create_roof_specific_result(
-    full_result: AnalysisResult,
-    roof_id: int,
-    roof_damages: List
-) -> AnalysisResult:
-    """
-    Create a filtered AnalysisResult for a specific roof and its damages.
-    
-    Args:
-        full_result: Complete analysis result
-        roof_id: ID of the roof to filter for
-        roof_damages: List of damages for this roof
-        
-    Returns:
-        Filtered AnalysisResult with only this roof and its damages
-    """
-    # Find the roof
-    roof = next((r for r in full_result.roofs if r.id == roof_id), None)
-    if not roof:
-        raise ValueError(f"Roof {roof_id} not found in results")
-    
-    # Create filtered result
-    filtered_result = AnalysisResult(
-        zipcode=full_result.zipcode,
-        timestamp=full_result.timestamp,
-        processing_time_sec=full_result.processing_time_sec,
-        center_lat=full_result.center_lat,
-        center_lng=full_result.center_lng,
-        bounding_box=full_result.bounding_box,
-        image_width=full_result.image_width,
-        image_height=full_result.image_height,
-        tiles_processed=full_result.tiles_processed,
-        roofs=[roof],  # Only this roof
-        damages=roof_damages,  # Only damages for this roof
-        total_roofs=1,
-        roofs_with_damage=1 if roof_damages else 0,
-        total_damage_area_pixels=sum(d.area_pixels for d in roof_damages),
-        performance=full_result.performance
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="main.py",
+        description="MVP satellite roof damage detection",
+        epilog="Legacy form 'python main.py <zipcode> [emails...]' runs 'analyze'."
     )
-    
-    return filtered_result
+    commands = parser.add_subparsers(dest="command", metavar="<command>")
+    
+    analyze = commands.add_parser("analyze", help="Fetch, detect and email reports for a zipcode")
+    analyze.add_argument("zipcode", help="US zipcode (5 digits)")
+    analyze.add_argument("emails", nargs="*", help="Recipients (default: MVP addresses)")
+    analyze.add_argument("--profile", action="store_true",
+                         help="Run under cProfile (output/profiles/<zipcode>_<time>.pstats)")
+    analyze.add_argument("--trace-chrome", action="store_true",
+                         help="Also write trace.chrome.json to the run directory")
+    analyze.add_argument("--backend", choices=("torch", "onnx", "onnx-int8"), default=None,
+                         help=f"Inference backend (default: ${DETECTION_BACKEND_ENV} or {DEFAULT_DETECTION_BACKEND})")
+    analyze.add_argument("--detect-workers", type=int, default=None, metavar="N",
+                         help=f"Detection worker processes (default: {DETECTION_WORKERS}; "
+                              f"0 = pipeline's own detection)")
+    
+    email = commands.add_parser("email-from-json", help="Re-cost and email saved result files (no detection)")
+    email.add_argument("result_json", help="Result JSON, or a directory of result files (searched recursively)")
+    email.add_argument("emails", nargs="*", help="Recipients (default: MVP addresses)")
+    
+    costs = commands.add_parser("costs-only", help="Print repair costs of saved result files")
+    costs.add_argument("result_json", help="Result JSON, or a directory of result files (searched recursively)")
+    
+    batch = commands.add_parser("batch", help="Analyze and email many zipcodes with one pipeline")
+    batch.add_argument("zipcodes", help="File with one zipcode per line, or zip1,zip2,...")
+    batch.add_argument("emails", nargs="*", help="Recipients (default: MVP addresses)")
+    return parser
 
 
-async def analyze_and_email_per_property(
-    zipcode: str,
-    email_list: List[str]
-):
+def main(argv: Optional[List[str]] = None) -> None:
     """
-    Analyze zipcode and send separate email reports for each property with damage.
+    Command-line entry point.
     
-    Args:
-        zipcode: US zipcode (5 digits)
-        email_list: List of email addresses to randomly assign to properties
+    Each subcommand imports only what it needs: only ``analyze`` and
+    ``batch`` load the detection stack and production settings. Those and
+    ``email-from-json`` (production .env and logging) run inside the parent
+    project; CLI paths resolve against the directory main.py was started in.
     """
-    setup_logger()
+    argv = list(sys.argv[1:] if argv is None else argv)
+    parser = build_parser()
+    if not argv:
+        parser.print_help()
+        sys.exit(1)
+    # Legacy form: python main.py <zipcode> [emails...] [--profile] [--trace-chrome]
+    if argv[0] not in ("analyze", "email-from-json", "costs-only", "batch") and not argv[0].startswith("-"):
+        argv.insert(0, "analyze")
+    args = parser.parse_args(argv)
     
-    settings = get_settings()
+    email_list = getattr(args, "emails", None) or DEFAULT_EMAILS
+    provided = bool(getattr(args, "emails", None))
     
-    if not settings.has_maptiler_api_key:
-        print("ERROR: MAPTILER_API_KEY not set in .env file")
+    if args.command == "costs-only":
+        print_costs(args.result_json)
         return
     
-    # Create pipeline config (output to parent project's output directory)
-    output_dir = str(parent_dir / "output")
-    
-    # Use models from production project
-    roof_model = str(parent_dir / "models" / "roof_detector.pt")
-    damage_model = str(parent_dir / "models" / "damage_detector.pt")
-    
-    # Check if models exist, fallback to defaults
-    if not Path(roof_model).exists():
-        roof_model = settings.roof_model_path
-    if not Path(damage_model).exists():
-        damage_model = settings.damage_model_path
-    
-    config = PipelineConfig(
-        tile_size=256,
-        zoom_level=21,
-        roof_confidence=0.2,
-        damage_confidence=0.25,
-        output_dir=output_dir,
-        save_visualization=True,
-        save_heatmap=True,
-        save_json=True,
-        roof_model_path=roof_model,
-        damage_model_path=damage_model
-    )
-    
-    print(f"Analyzing zipcode: {zipcode}")
-    print("Fetching satellite images...")
-    
-    # Run analysis
-    pipeline = RoofDamagePipeline(
-        api_key=settings.maptiler_api_key.get_secret_value(),
-        config=config
-    )
-    
-    try:
-        result = await pipeline.analyze_zipcode(zipcode)
-        
-        print(f"\nAnalysis Complete!")
-        print(f"  - Total roofs: {result.total_roofs}")
-        print(f"  - Roofs with damage: {result.roofs_with_damage}")
-        print(f"  - Total damage area: {result.total_damage_area_pixels} pixels")
-        
-        # Group damages by roof_id - ONLY roofs with damage
-        damages_by_roof: Dict[int, List] = defaultdict(list)
-        for damage in result.damages:
-            if damage.roof_id is not None:
-                damages_by_roof[damage.roof_id].append(damage)
-        
-        if not damages_by_roof:
-            print("\n⚠️  No damages detected on any roofs. No emails to send.")
-            return
-        
-        # Filter: Only process roofs that have damage
-        roofs_with_damage = [roof_id for roof_id in damages_by_roof.keys() if len(damages_by_roof[roof_id]) > 0]
-        
-        if not roofs_with_damage:
-            print("\n⚠️  No roofs with damage found. No emails to send.")
-            return
-        
-        print(f"\n📧 Found {len(roofs_with_damage)} roof(s) with damage")
-        print(f"📧 Will send separate emails ONLY for damaged roofs")
-        
-        # Find output files (use most recent from AI_Roof_Damage_Detection/output)
-        output_base = parent_dir / "output"
-        annotated_file = None
-        heatmap_file = None
-        json_file = None
-        
-        # Get most recent files for this zipcode
-        annotated_files = sorted(output_base.glob(f"{zipcode}_*_annotated.png"), key=lambda p: p.stat().st_mtime, reverse=True)
-        if annotated_files:
-            annotated_file = str(annotated_files[0])
-        
-        heatmap_files = sorted(output_base.glob(f"{zipcode}_*_heatmap.png"), key=lambda p: p.stat().st_mtime, reverse=True)
-        if heatmap_files:
-            heatmap_file = str(heatmap_files[0])
-        
-        json_files = sorted(output_base.glob(f"{zipcode}_*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
-        if json_files:
-            json_file = str(json_files[0])
-        
-        # Send separate email for each roof with damage ONLY
-        emails_sent = 0
-        emails_failed = 0
-        
-        for roof_id in roofs_with_damage:
-            roof_damages = damages_by_roof[roof_id]
-            
-            # Double check: Skip if no damages (shouldn't happen, but safety check)
-            if not roof_damages or len(roof_damages) == 0:
-                print(f"⚠️  Roof {roof_id} has no damages, skipping...")
-                continue
-            # Find the roof
-            roof = next((r for r in result.roofs if r.id == roof_id), None)
-            if not roof:
-                print(f"⚠️  Roof {roof_id} not found, skipping...")
-                continue
-            
-            # Create filtered result for this roof only
-            roof_result = create_roof_specific_result(
-                full_result=result,
-                roof_id=roof_id,
-                roof_damages=roof_damages
-            )
-            
-            # Calculate costs for this roof's damages only
-            roof_costs = calculate_repair_costs(result, damages=roof_damages)
-            
-            print(f"\n📧 Sending emails for Roof #{roof_id}")
-            print(f"   - {len(roof_damages)} damage(s) detected")
-            print(f"   - Total damage area: {roof_result.total_damage_area_pixels} pixels")
-            print(f"   - Estimated cost: ${roof_costs.total_cost:,.2f}")
-            
-            # Send email to ALL recipients in the list (both emails for MVP)
-            for recipient_email in email_list:
-                print(f"   → Sending to: {recipient_email}")
-                
-                # Send email for this specific roof to this recipient
-                success = send_damage_report_email(
-                    recipient_email=recipient_email,
-                    zipcode=zipcode,
-                    result=roof_result,
-                    costs=roof_costs,
-                    annotated_image_path=annotated_file,
-                    heatmap_path=heatmap_file,
-                    roof_info="",  # Will be generated in email template
-                    json_file_path=json_file
-                )
-                
-                if success:
-                    print(f"      ✅ Email sent successfully!")
-                    emails_sent += 1
-                else:
-                    print(f"      ❌ Failed to send email")
-                    emails_failed += 1
-        
-        print(f"\n📊 Email Summary:")
-        print(f"   ✅ Successfully sent: {emails_sent}")
-        print(f"   ❌ Failed: {emails_failed}")
-        print(f"   📧 Total properties notified: {emails_sent}")
-        
-    except Exception as e:
-        print(f"ERROR: {e}")
-        import traceback
-        traceback.print_exc()
-    finally:
-        await pipeline.close()
+    # Parent project on sys.path and as working directory
+    launch_dir = bootstrap()
+    
+    if args.command == "analyze":
+        if args.backend:
+            # Inherited by spawned detection workers
+            os.environ[DETECTION_BACKEND_ENV] = args.backend
+        print_emails(email_list, provided)
+        run = analyze_and_email_per_property(args.zipcode, email_list, chrome_trace=args.trace_chrome,
+                                             detect_workers=args.detect_workers)
+        if args.profile:
+            run_with_profile(run, args.zipcode)
+        else:
+            asyncio.run(run)
+    elif args.command == "email-from-json":
+        print_emails(email_list, provided)
+        asyncio.run(email_saved_results(str(launch_dir / args.result_json), email_list))
+    elif args.command == "batch":
+        from mvp_batch import read_zipcode_list, default_status_path, run_batch
+        zipcodes = read_zipcode_list(args.zipcodes, launch_dir)
+        print(f"📦 Batch of {len(zipcodes)} zipcode(s)")
+        asyncio.run(run_batch(zipcodes, email_list, default_status_path(args.zipcodes, launch_dir)))
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Usage: python main.py <zipcode> [email1] [email2] [email3] ...")
-        print("Example: python main.py 75201 owner1@example.com owner2@example.com")
-        print("Example: python main.py 75201  # Uses default emails")
-        print("\nNote: Emails are randomly assigned to properties with damage.")
-        print("      Each damaged property gets a separate email.")
-        print("      Default emails: aliyannew16@gmail.com, Josecarlos@gpoutsourcing.com")
-        sys.exit(1)
-    
-    zipcode = sys.argv[1]
-    
-    # Get email list from command line arguments
-    # Default emails (always included for MVP)
-    default_emails = ["aliyannew16@gmail.com", "Josecarlos@gpoutsourcing.com"]
-    
-    email_list = []
-    if len(sys.argv) > 2:
-        email_list = sys.argv[2:]
-        print(f"📧 Provided {len(email_list)} email address(es)")
-        for i, email in enumerate(email_list, 1):
-            print(f"   {i}. {email}")
-    else:
-        print("📧 Using default emails for MVP:")
-        for i, email in enumerate(default_emails, 1):
-            print(f"   {i}. {email}")
-        email_list = default_emails
-    
-    asyncio.run(analyze_and_email_per_property(zipcode, email_list))
-
+    main()
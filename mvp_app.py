@@ -0,0 +1,920 @@
+"""
+Shared MVP application layer.
+Paths, settings and the analyze / email stages used by every entry point
+(main.py, mvp_batch.py, mvp_shards.py) and by detection pool workers.
+Importing this module has no side effects and stays light: settings are
+plain values, and each stage imports the modules it runs (HTTP, SQLite
+caches, numpy, the detection stack) on first use. Entry points
+that run against the production project call bootstrap() once to put it on
+sys.path and change into it.
+"""
+import asyncio
+import sys
+import os
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, AsyncIterator, AsyncIterable, Callable, Dict, List, Optional, Tuple, Union
+
+# Parent AI_Roof_Damage_Detection project (detection stack, settings, output)
+parent_dir = (Path(__file__).parent.parent / "AI_Roof_Damage_Detection").resolve()
+
+# This project's directory (MVP modules, caches)
+current_dir = Path(__file__).parent.resolve()
+
+# Where the process was launched from; set by bootstrap()
+launch_dir: Optional[Path] = None
+
+# Light MVP modules only; everything else is imported by the stage that uses it
+from mvp_crops import CropSettings
+from mvp_artifacts import RunManifest, RunArtifacts, TRACE_NAME, CHROME_TRACE_NAME, TILES_DIR
+from mvp_trace import RunTracer, stage
+
+if TYPE_CHECKING:
+    from src.pipeline import RoofDamagePipeline, PipelineConfig
+    from src.output.json_generator import AnalysisResult
+    from mvp_detect_cache import DetectionCache
+    from mvp_detect_pool import DetectionPool
+    from mvp_dispatch import DispatchConfig, DispatchStats, OutgoingEmail, TokenBucket
+    from mvp_geometry import TileKey
+    from mvp_lookup import PropertyLookup, PropertyRecord
+    from mvp_pyramid import PyramidConfig
+    from mvp_tile_cache import TileCache
+
+# Zoom level of the analyzed imagery (PipelineConfig.zoom_level, ShardConfig.zoom_level)
+IMAGERY_ZOOM = 21
+
+# Lowest zoom of the overlay tiles (see mvp_pyramid) written by analyze runs
+# instead of the pipeline's full-size PNGs, which take seconds each to encode.
+# None (default) keeps the PNGs: the pipeline's imagery is not in the tile
+# cache, so email crops cut from tiles would have no imagery under them
+OUTPUT_PYRAMID_MIN_ZOOM: Optional[int] = None
+
+# Per-roof image crops attached to each email instead of the full mosaic
+EMAIL_CROPS = CropSettings(margin_ratio=0.5, max_side_px=1024, image_format="JPEG", quality=80)
+
+# Email dispatch: stay under the 100 emails/day provider free tier (see
+# api_pricing/API_PRICING.md) and keep undeliverable reports on disk. The
+# quota is one bucket per process, persisted so later runs draw from it too.
+# A message that would wait longer than EMAIL_QUOTA_MAX_WAIT_SEC for the quota
+# is dead-lettered as "quota_exhausted" instead of blocking the run
+EMAIL_CONCURRENCY = 2
+EMAIL_QUEUE_SIZE = 100
+EMAIL_DAILY_QUOTA = 100
+EMAIL_MAX_RETRIES = 4
+EMAIL_QUOTA_MAX_WAIT_SEC = 300.0
+EMAIL_RATE_STATE_PATH = parent_dir / "output" / "email_rate_limit.json"
+EMAIL_DEAD_LETTER_PATH = parent_dir / "output" / "email_dead_letter.jsonl"
+
+# email-from-json: result files whose emails are built ahead of sending; each
+# file's messages stream into the dispatcher, so only these files' crops are
+# held in memory at once
+SAVED_RESULTS_BUILD_AHEAD = 2
+
+# Parallel detection: worker processes each holding the roof and damage models
+# (~1 GB RSS per worker with both YOLO models on CPU, on top of the pipeline's
+# own copy). Opt-in with --detect-workers N: for one ~30 s analyze the model
+# loads cost more than the pool saves. 0 keeps the pipeline's own detection
+DETECTION_WORKERS = 0
+DETECTION_CHUNK_PX = 1280
+DETECTION_OVERLAP_PX = 256
+DETECTION_BATCH_SIZE = 2
+# Run the damage model on bucketed roof crops only (False: on whole chunks)
+DETECTION_DAMAGE_ON_ROOFS = True
+
+# Per-chunk detections cached by model and chunk content (see mvp_detect_cache),
+# so re-runs over unchanged imagery skip the models; None disables the cache
+DETECTION_CACHE_DIR: Optional[Path] = current_dir / "cache" / "detections"
+DETECTION_CACHE_MAX_BYTES = 256 * 1024 ** 2
+
+# Detection thresholds (also used when checking ONNX exports)
+ROOF_CONFIDENCE = 0.2
+DAMAGE_CONFIDENCE = 0.25
+
+# Inference backend for the YOLO models: torch, onnx or onnx-int8 (see mvp_onnx).
+# Read from the environment so spawned detection workers use the same backend.
+# The ONNX backends need the optional onnx/onnxruntime packages (requirements.txt).
+DETECTION_BACKEND_ENV = "MVP_DETECTION_BACKEND"
+DEFAULT_DETECTION_BACKEND = "torch"
+
+# Address/owner lookup for damaged roofs before emailing (see mvp_lookup).
+# Provider: google (GOOGLE_MAPS_API_KEY, plus TRACERFY_API_KEY/TRACERFY_LOOKUP_URL
+# for owners), fake (offline, for tests) or off; results are cached per parcel.
+# Off by default: Google and Tracerfy bill per request, so MVP_PROPERTY_LOOKUP=google opts in.
+PROPERTY_LOOKUP_ENV = "MVP_PROPERTY_LOOKUP"
+DEFAULT_PROPERTY_LOOKUP = "off"
+PROPERTY_LOOKUP_CACHE_DIR = current_dir / "cache" / "lookups"
+PROPERTY_LOOKUP_TTL_SEC = 180 * 86400
+PROPERTY_LOOKUP_DEDUPE_M = 8.0
+PROPERTY_LOOKUP_CONCURRENCY = 4
+# Send each report to the looked-up owner instead of the recipient list (MVP: off)
+EMAIL_PROPERTY_OWNERS = False
+
+# Recipients used when none are given on the command line
+DEFAULT_EMAILS = ["aliyannew16@gmail.com", "Josecarlos@gpoutsourcing.com"]
+
+# One stage-timing record per traced run; cProfile dumps from --profile
+TRACE_HISTORY_PATH = parent_dir / "output" / "traces.jsonl"
+PROFILE_DIR = parent_dir / "output" / "profiles"
+
+_environment_loaded = False
+_run_manifest: Optional[RunManifest] = None
+_email_rate_limit: Optional["TokenBucket"] = None
+
+
+def bootstrap() -> Path:
+    """
+    Prepare the process to run against the parent project (once per process).
+    
+    Puts the parent AI_Roof_Damage_Detection project and this directory on
+    sys.path and changes the working directory to the parent project, whose
+    code uses relative paths. Exits if the parent project is missing.
+    
+    Returns:
+        Directory the process was launched from, so CLI paths resolve as
+        the user typed them
+    """
+    global launch_dir
+    if launch_dir is not None:
+        return launch_dir
+    
+    # Check if parent directory exists
+    if not parent_dir.exists():
+        print(f"ERROR: AI_Roof_Damage_Detection directory not found at: {parent_dir}")
+        print("Please ensure AI_Roof_Damage_Detection folder exists in the parent directory.")
+        sys.exit(1)
+    
+    # Add parent directory to Python path FIRST (before any imports)
+    if str(parent_dir) not in sys.path:
+        sys.path.insert(0, str(parent_dir))
+    
+    # Also add current directory for MVP modules
+    if str(current_dir) not in sys.path:
+        sys.path.insert(0, str(current_dir))
+    
+    launch_dir = Path.cwd().resolve()
+    
+    # Change working directory to parent for relative imports
+    try:
+        os.chdir(str(parent_dir))
+    except Exception as e:
+        print(f"WARNING: Could not change directory to {parent_dir}: {e}")
+        print("Continuing with current directory...")
+    return launch_dir
+
+
+def run_manifest() -> RunManifest:
+    """Index of analysis runs; each run writes into its own directory under output/runs."""
+    global _run_manifest
+    if _run_manifest is None:
+        _run_manifest = RunManifest(str(parent_dir / "output"))
+    return _run_manifest
+
+
+def load_environment() -> None:
+    """Load .env from the production project (once) before settings are read."""
+    global _environment_loaded
+    if _environment_loaded:
+        return
+    from dotenv import load_dotenv
+    env_path = parent_dir / ".env"
+    if env_path.exists():
+        load_dotenv(env_path)
+        print(f"✓ Loaded .env from: {env_path}")
+    else:
+        print(f"⚠ Warning: .env not found at {env_path}")
+    _environment_loaded = True
+
+
+def get_settings():
+    """Production project settings (loads .env first)."""
+    load_environment()
+    from config.settings import get_settings as load_settings
+    return load_settings()
+
+
+def setup_logger() -> None:
+    """Configure logging the same way as the production project."""
+    from src.utils.logger import setup_logger as setup_project_logger
+    setup_project_logger()
+
+
+def build_pipeline_config(settings, backend: Optional[str] = None) -> "PipelineConfig":
+    """
+    Build the pipeline configuration used by the MVP.
+    
+    Args:
+        settings: Production project settings
+        backend: Inference backend (torch, onnx, onnx-int8); defaults to
+                 $MVP_DETECTION_BACKEND or DEFAULT_DETECTION_BACKEND
+        
+    Returns:
+        PipelineConfig writing to the parent project's output directory
+    """
+    # Create pipeline config (output to parent project's output directory)
+    output_dir = str(parent_dir / "output")
+    
+    # Use models from production project
+    roof_model = str(parent_dir / "models" / "roof_detector.pt")
+    damage_model = str(parent_dir / "models" / "damage_detector.pt")
+    
+    # Check if models exist, fallback to defaults
+    if not Path(roof_model).exists():
+        roof_model = settings.roof_model_path
+    if not Path(damage_model).exists():
+        damage_model = settings.damage_model_path
+    
+    # ONNX backends: the detectors load the exported .onnx through ONNX Runtime
+    backend = backend or os.environ.get(DETECTION_BACKEND_ENV, DEFAULT_DETECTION_BACKEND)
+    from mvp_onnx import BACKEND_TORCH, OnnxExportConfig, prepare_model, sample_images
+    if backend != BACKEND_TORCH:
+        export_config = OnnxExportConfig(cache_dir=str(parent_dir / "models" / "onnx"))
+        images = sample_images(current_dir / "cache" / "tiles", export_config.check_images)
+        roof_model = prepare_model(roof_model, backend, images, ROOF_CONFIDENCE, export_config)
+        damage_model = prepare_model(damage_model, backend, images, DAMAGE_CONFIDENCE, export_config)
+    
+    from src.pipeline import PipelineConfig
+    return PipelineConfig(
+        tile_size=256,
+        zoom_level=IMAGERY_ZOOM,
+        roof_confidence=ROOF_CONFIDENCE,
+        damage_confidence=DAMAGE_CONFIDENCE,
+        output_dir=output_dir,
+        save_visualization=OUTPUT_PYRAMID_MIN_ZOOM is None,
+        save_heatmap=OUTPUT_PYRAMID_MIN_ZOOM is None,
+        save_json=True,
+        roof_model_path=roof_model,
+        damage_model_path=damage_model
+    )
+
+
+def create_pipeline(settings) -> "RoofDamagePipeline":
+    """
+    Create a pipeline with the MVP configuration.
+    
+    Imports the detection stack (torch, ultralytics) on first call.
+    
+    Args:
+        settings: Production project settings (must have a MapTiler key)
+        
+    Returns:
+        RoofDamagePipeline ready to analyze zipcodes
+    """
+    from src.pipeline import RoofDamagePipeline
+    return RoofDamagePipeline(
+        api_key=settings.maptiler_api_key.get_secret_value(),
+        config=build_pipeline_config(settings)
+    )
+
+
+def detection_model_key(pipeline_config: "PipelineConfig", damage_crops) -> str:
+    """
+    Detection cache key part for the pipeline's models and thresholds.
+    
+    Args:
+        pipeline_config: Config whose model files and confidences are used
+        damage_crops: DamageCropConfig of the pool (None = whole-chunk damage detection)
+        
+    Returns:
+        Key that changes whenever a model file or detection setting changes
+    """
+    from mvp_detect_cache import model_key
+    return model_key(
+        [pipeline_config.roof_model_path, pipeline_config.damage_model_path],
+        roof_confidence=pipeline_config.roof_confidence,
+        damage_confidence=pipeline_config.damage_confidence,
+        damage_crops=damage_crops
+    )
+
+
+def open_detection_cache() -> Optional["DetectionCache"]:
+    """Detection result cache with the MVP settings, or None when disabled."""
+    if DETECTION_CACHE_DIR is None:
+        return None
+    from mvp_detect_cache import DetectCacheConfig, DetectionCache
+    return DetectionCache(DetectCacheConfig(cache_dir=str(DETECTION_CACHE_DIR), max_bytes=DETECTION_CACHE_MAX_BYTES))
+
+
+def create_property_lookup() -> Optional["PropertyLookup"]:
+    """Property lookup with the provider from MVP_PROPERTY_LOOKUP, or None when off / not configured."""
+    load_environment()
+    provider = os.environ.get(PROPERTY_LOOKUP_ENV, DEFAULT_PROPERTY_LOOKUP).lower()
+    if provider == "off":
+        return None
+    from mvp_lookup import (
+        FakePropertyProvider,
+        GoogleReverseGeocoder,
+        JsonOwnerLookup,
+        LookupCache,
+        LookupConfig,
+        PropertyLookup,
+    )
+    config = LookupConfig(
+        cache_dir=str(PROPERTY_LOOKUP_CACHE_DIR),
+        ttl_sec=PROPERTY_LOOKUP_TTL_SEC,
+        dedupe_m=PROPERTY_LOOKUP_DEDUPE_M,
+        concurrency=PROPERTY_LOOKUP_CONCURRENCY
+    )
+    if provider == "fake":
+        fake = FakePropertyProvider()
+        return PropertyLookup(fake, fake, config, LookupCache(config))
+    if provider != "google":
+        raise ValueError(f"Unknown {PROPERTY_LOOKUP_ENV}: {provider} (google, fake or off)")
+    google_key = os.environ.get("GOOGLE_MAPS_API_KEY")
+    if not google_key:
+        print("⚠️  GOOGLE_MAPS_API_KEY not set - skipping property address lookup")
+        return None
+    owners = None
+    tracerfy_key, tracerfy_url = os.environ.get("TRACERFY_API_KEY"), os.environ.get("TRACERFY_LOOKUP_URL")
+    if tracerfy_key and tracerfy_url:
+        owners = JsonOwnerLookup(tracerfy_url, tracerfy_key)
+    return PropertyLookup(GoogleReverseGeocoder(google_key), owners, config, LookupCache(config))
+
+
+async def lookup_damaged_properties(
+    result: "AnalysisResult",
+    roof_ids: List[int]
+) -> Dict[int, "PropertyRecord"]:
+    """
+    Look up the address (and owner) of each damaged roof.
+    
+    Args:
+        result: Analysis result the roofs belong to
+        roof_ids: Damaged roofs
+        
+    Returns:
+        roof_id -> PropertyRecord (empty when lookups are off)
+    """
+    lookup = create_property_lookup()
+    if lookup is None:
+        return {}
+    from mvp_lookup import roof_locations
+    with stage("email.lookup", roofs=len(roof_ids)) as s:
+        try:
+            records = await lookup.lookup_many(roof_locations(result, roof_ids, IMAGERY_ZOOM))
+        finally:
+            await lookup.close()
+        stats = lookup.stats
+        s.count(properties=stats.properties, cache_hits=stats.cache_hits, geocode_requests=stats.geocode_requests,
+                owner_requests=stats.owner_requests, failed=stats.failed)
+    print(f"📍 Looked up {stats.properties} propert(ies) for {stats.roofs} roof(s): {stats.cache_hits} cached, "
+          f"{stats.geocode_requests} geocode + {stats.owner_requests} owner request(s), {stats.failed} failed")
+    return records
+
+
+def start_detection_pool(
+    workers: Optional[int] = None,
+    pipeline_config: Optional["PipelineConfig"] = None
+) -> Optional["DetectionPool"]:
+    """
+    Start a detection pool with the MVP settings.
+    
+    Args:
+        workers: Worker processes (DETECTION_WORKERS if None)
+        pipeline_config: Config of the models the workers load; enables the
+                         detection cache (see DETECTION_CACHE_DIR) when given
+        
+    Returns:
+        Started DetectionPool, or None when workers is 0
+    """
+    workers = DETECTION_WORKERS if workers is None else workers
+    if workers <= 0:
+        return None
+    from mvp_detect_pool import DetectionPool, DetectPoolConfig
+    from mvp_damage_crops import DamageCropConfig
+    damage_crops = DamageCropConfig() if DETECTION_DAMAGE_ON_ROOFS else None
+    cache = open_detection_cache() if pipeline_config is not None else None
+    config = DetectPoolConfig(
+        workers=workers,
+        chunk_px=DETECTION_CHUNK_PX,
+        overlap_px=DETECTION_OVERLAP_PX,
+        batch_size=DETECTION_BATCH_SIZE,
+        damage_crops=damage_crops,
+        model_key=detection_model_key(pipeline_config, damage_crops) if cache is not None else ""
+    )
+    return DetectionPool(config, cache=cache).start()
+
+
+async def analyze_run(
+    pipeline: "RoofDamagePipeline",
+    zipcode: str
+) -> Tuple["AnalysisResult", RunArtifacts]:
+    """
+    Analyze a zipcode into a fresh run directory and record its artifacts.
+    
+    The pipeline's config is never changed, since it may be shared across
+    zipcodes. It keeps writing to its output_dir, and this run's files are
+    moved into the run directory by their name stem afterwards.
+    
+    Args:
+        pipeline: Initialized pipeline (may be shared across zipcodes)
+        zipcode: US zipcode (5 digits)
+        
+    Returns:
+        Tuple of (analysis result, recorded run artifacts)
+    """
+    manifest = run_manifest()
+    artifacts = manifest.new_run(zipcode)
+    # Fetch, stitch, detection and visualization all run inside the pipeline
+    with stage("analyze") as s:
+        result = await pipeline.analyze_zipcode(zipcode)
+        s.count(tiles=result.tiles_processed, roofs=len(result.roofs), damages=len(result.damages))
+        if result.performance:
+            s.details["pipeline_performance"] = result.performance
+    if OUTPUT_PYRAMID_MIN_ZOOM is not None:
+        from mvp_pyramid import PyramidConfig
+        await write_overlay_tiles(result, artifacts, PyramidConfig(min_zoom=OUTPUT_PYRAMID_MIN_ZOOM))
+    with stage("record_artifacts"):
+        config = pipeline.config
+        expected = [attr for attr, enabled in (("json", config.save_json),
+                                               ("annotated", config.save_visualization),
+                                               ("heatmap", config.save_heatmap)) if enabled]
+        manifest.adopt(artifacts, config.output_dir, f"{result.zipcode or zipcode}_{result.timestamp}", expected)
+        artifacts = manifest.record(artifacts)
+    return result, artifacts
+
+
+async def write_overlay_tiles(result: "AnalysisResult", artifacts: RunArtifacts,
+                              config: "PyramidConfig") -> None:
+    """Write the result's overlay tile pyramid into its run directory."""
+    from mvp_pyramid import write_pyramid
+    with stage("pyramid") as s:
+        stats = await asyncio.to_thread(write_pyramid, result, Path(artifacts.run_dir) / TILES_DIR,
+                                        IMAGERY_ZOOM, config)
+        s.count(tiles=sum(stats.tiles.values()), bytes=stats.bytes_written)
+
+
+def cached_imagery(cache: "TileCache") -> Callable[["TileKey"], Optional[bytes]]:
+    """Tile source reading MapTiler imagery from the tile cache (expired tiles included)."""
+    from mvp_tiles import MAPTILER_TILE_URL
+    source = MAPTILER_TILE_URL.split("?", 1)[0]
+    
+    def tile(key: "TileKey") -> Optional[bytes]:
+        entry = cache.lookup(key, source)
+        return entry.data if entry is not None else None
+    return tile
+
+
+async def build_damage_emails(
+    result: "AnalysisResult",
+    zipcode: str,
+    email_list: List[str],
+    artifacts: Optional[RunArtifacts] = None
+) -> List["OutgoingEmail"]:
+    """
+    Build one email per damaged roof per recipient for a result.
+    
+    Costs are computed here with the current cost tables.
+    
+    Args:
+        result: Analysis result for the zipcode
+        zipcode: US zipcode (5 digits)
+        email_list: Email addresses that receive every property report (the
+                    looked-up owner instead when EMAIL_PROPERTY_OWNERS is set)
+        artifacts: Files written by the run (latest recorded run if None)
+        
+    Returns:
+        Messages ready for dispatch_emails
+    """
+    from mvp_crops import render_roof_crops
+    from mvp_dispatch import OutgoingEmail
+    from mvp_email import build_crop_attachments, build_damage_report_message, build_report_attachments
+    from mvp_index import ResultIndex
+    
+    # Index roofs and damages by roof_id in one pass - ONLY roofs with damage
+    with stage("email.index", roofs=len(result.roofs), damages=len(result.damages)):
+        index = ResultIndex(result)
+    
+    if not index.damages_by_roof:
+        print("\n⚠️  No damages detected on any roofs. No emails to send.")
+        return []
+    
+    roofs_with_damage = index.damaged_roof_ids
+    
+    if not roofs_with_damage:
+        print("\n⚠️  No roofs with damage found. No emails to send.")
+        return []
+    
+    print(f"\n📧 Found {len(roofs_with_damage)} roof(s) with damage")
+    print(f"📧 Will send separate emails ONLY for damaged roofs")
+    
+    # Address and owner of each damaged roof (cached per parcel)
+    properties = await lookup_damaged_properties(result, roofs_with_damage)
+    
+    # Output files of this run, straight from the run manifest
+    if artifacts is None:
+        artifacts = run_manifest().latest(zipcode)
+    annotated_file = artifacts.annotated if artifacts else None
+    heatmap_file = artifacts.heatmap if artifacts else None
+    json_file = artifacts.json if artifacts else None
+    pyramid = None
+    if artifacts and artifacts.tiles:
+        from mvp_pyramid import TilePyramid
+        pyramid = TilePyramid(artifacts.tiles)
+    
+    # Encode the JSON once and share it across every message
+    with stage("email.attachments") as s:
+        shared_attachments = build_report_attachments(json_file_path=json_file)
+        s.count(attachments=len(shared_attachments),
+                bytes=sum(len(part.get_payload()) for part in shared_attachments))
+    
+    # Crop annotated image and heatmap around every damaged roof in one pass
+    # (from the overlay tiles, over cached imagery, when the run wrote a pyramid)
+    with stage("email.crops") as s:
+        tile_cache = None
+        if pyramid is not None:
+            from mvp_tile_cache import TileCache
+            tile_cache = TileCache()
+        try:
+            crops = await asyncio.to_thread(
+                render_roof_crops,
+                result,
+                roofs_with_damage,
+                annotated_image_path=annotated_file,
+                heatmap_path=heatmap_file,
+                settings=EMAIL_CROPS,
+                pyramid=pyramid,
+                basemap=cached_imagery(tile_cache) if tile_cache is not None else None
+            )
+        finally:
+            if tile_cache is not None:
+                tile_cache.close()
+        s.count(crops=len(crops))
+    
+    # Build one message per damaged roof per recipient
+    with stage("email.build") as build:
+        emails: List[OutgoingEmail] = []
+    
+        for roof_id in roofs_with_damage:
+            # Skip damages that point at a roof missing from the result
+            if index.roof(roof_id) is None:
+                print(f"⚠️  Roof {roof_id} not found, skipping...")
+                continue
+        
+            # Result view and costs for this roof only
+            roof_result = index.roof_result(roof_id)
+            roof_costs = index.roof_costs(roof_id)
+        
+            print(f"\n📧 Preparing emails for Roof #{roof_id}")
+            print(f"   - {index.aggregates[roof_id].damage_count} damage(s) detected")
+            print(f"   - Total damage area: {roof_result.total_damage_area_pixels} pixels")
+            print(f"   - Estimated cost: ${roof_costs.total_cost:,.2f}")
+        
+            record = properties.get(roof_id)
+            address = record.address if record else None
+            if address:
+                print(f"   - Address: {address}")
+        
+            # Same encoded parts go to every recipient of this roof
+            attachments = build_crop_attachments(crops.get(roof_id)) + shared_attachments
+        
+            # Send email to ALL recipients in the list (both emails for MVP),
+            # or to the property owner when enabled and known
+            recipients = email_list
+            if EMAIL_PROPERTY_OWNERS and record and record.owner_email:
+                recipients = [record.owner_email]
+            for recipient_email in recipients:
+                msg = build_damage_report_message(
+                    recipient_email=recipient_email,
+                    zipcode=zipcode,
+                    result=roof_result,
+                    costs=roof_costs,
+                    roof_info="",  # Will be generated in email template
+                    attachments=attachments,
+                    property_address=address
+                )
+                emails.append(OutgoingEmail(msg=msg, context={"zipcode": zipcode, "roof_id": roof_id,
+                                                              "address": address}))
+            build.count(bytes_attached=len(recipients) * sum(len(part.get_payload()) for part in attachments))
+        build.count(emails=len(emails))
+    
+    return emails
+
+
+def email_dispatch_config() -> "DispatchConfig":
+    """Dispatcher settings from the EMAIL_* settings."""
+    from mvp_dispatch import DispatchConfig
+    return DispatchConfig(
+        concurrency=EMAIL_CONCURRENCY,
+        queue_size=EMAIL_QUEUE_SIZE,
+        rate_per_sec=EMAIL_DAILY_QUOTA / 86400,
+        burst=EMAIL_DAILY_QUOTA,
+        rate_state_path=str(EMAIL_RATE_STATE_PATH),
+        rate_max_wait_sec=EMAIL_QUOTA_MAX_WAIT_SEC,
+        max_retries=EMAIL_MAX_RETRIES,
+        dead_letter_path=str(EMAIL_DEAD_LETTER_PATH)
+    )
+
+
+def email_rate_limit() -> Optional["TokenBucket"]:
+    """The process's email quota, shared by every dispatch (None without a rate limit)."""
+    global _email_rate_limit
+    if _email_rate_limit is None and EMAIL_DAILY_QUOTA:
+        from mvp_dispatch import TokenBucket
+        config = email_dispatch_config()
+        _email_rate_limit = TokenBucket(config.rate_per_sec, config.burst, config.rate_state_path)
+    return _email_rate_limit
+
+
+async def dispatch_emails(
+    emails: Union[List["OutgoingEmail"], AsyncIterable["OutgoingEmail"]],
+    on_sent: Optional[Callable[["OutgoingEmail"], None]] = None
+) -> "DispatchStats":
+    """
+    Send built emails and print a summary.
+    
+    Args:
+        emails: Messages from build_damage_emails (any number of results),
+                or an async stream of them sent while it is still producing
+        on_sent: Called with each message once it was sent
+        
+    Returns:
+        DispatchStats
+    """
+    from mvp_dispatch import DispatchStats, EmailDispatcher
+    from mvp_email import create_smtp_transport
+    
+    if isinstance(emails, list):
+        if not emails:
+            return DispatchStats()
+        print(f"\n📤 Sending {len(emails)} email(s)...")
+    else:
+        print(f"\n📤 Sending emails as they are built...")
+    
+    # Queue every report and send over one pool of authenticated connections
+    config = email_dispatch_config()
+    with stage("email.dispatch") as s:
+        with create_smtp_transport(pool_size=config.concurrency) as transport:
+            stats = await EmailDispatcher(transport, config, email_rate_limit()).dispatch(emails, on_sent)
+        s.count(emails=stats.total, sent=stats.sent, failed=stats.failed, retries=stats.retries)
+    
+    for failure in stats.failures:
+        print(f"   ❌ Roof #{failure['roof_id']} → {failure['to']}: {failure['error']}")
+    
+    print(f"\n📊 Email Summary:")
+    print(f"   ✅ Successfully sent: {stats.sent}")
+    print(f"   ❌ Failed: {stats.failed}")
+    print(f"   🔁 Retries: {stats.retries}")
+    if stats.quota_exhausted:
+        print(f"   ⛔ Quota exhausted: {stats.quota_exhausted} not sent (daily limit {EMAIL_DAILY_QUOTA})")
+    if stats.dead_lettered:
+        print(f"   📥 Dead-lettered: {stats.dead_lettered} ({config.dead_letter_path})")
+    print(f"   📧 Total properties notified: {stats.sent}")
+    print(f"   ⏱️  {stats.elapsed_sec:.1f}s ({stats.messages_per_sec:.2f} emails/s)")
+    
+    return stats
+
+
+async def email_damage_reports(
+    result: "AnalysisResult",
+    zipcode: str,
+    email_list: List[str],
+    artifacts: Optional[RunArtifacts] = None
+) -> "DispatchStats":
+    """
+    Send separate email reports for each roof with damage in a result.
+    
+    Args:
+        result: Analysis result for the zipcode
+        zipcode: US zipcode (5 digits)
+        email_list: Email addresses that receive every property report
+        artifacts: Files written by the run (latest recorded run if None)
+        
+    Returns:
+        DispatchStats for the zipcode's emails
+    """
+    emails = await build_damage_emails(result, zipcode, email_list, artifacts)
+    return await dispatch_emails(emails)
+
+
+async def analyze_and_email_per_property(
+    zipcode: str,
+    email_list: List[str],
+    chrome_trace: bool = False,
+    detect_workers: Optional[int] = None
+):
+    """
+    Analyze zipcode and send separate email reports for each property with damage.
+    
+    Stage timings are printed at the end, appended to output/traces.jsonl
+    and written to the run directory as trace.json.
+    
+    Args:
+        zipcode: US zipcode (5 digits)
+        email_list: List of email addresses to randomly assign to properties
+        chrome_trace: Also write trace.chrome.json (chrome://tracing, Perfetto)
+        detect_workers: Detection worker processes (DETECTION_WORKERS if None,
+                        0 = the pipeline's own sequential detection)
+    """
+    setup_logger()
+    
+    settings = get_settings()
+    
+    if not settings.has_maptiler_api_key:
+        print("ERROR: MAPTILER_API_KEY not set in .env file")
+        return
+    
+    print(f"Analyzing zipcode: {zipcode}")
+    print("Fetching satellite images...")
+    
+    tracer = RunTracer(zipcode, recipients=len(email_list))
+    artifacts = None
+    pool = None
+    
+    with tracer.activate():
+        # Run analysis
+        with stage("setup"):
+            pipeline = create_pipeline(settings)
+        
+        try:
+            # Route the pipeline's roof/damage detection through the worker pool
+            with stage("detection_pool"):
+                pool = await asyncio.to_thread(start_detection_pool, detect_workers, pipeline.config)
+                if pool is not None:
+                    from mvp_detect_pool import ensure_detectors, install_pooled_detectors
+                    await ensure_detectors(pipeline)
+                    install_pooled_detectors(pipeline, pool)
+            
+            result, artifacts = await analyze_run(pipeline, zipcode)
+            if pool is not None:
+                from mvp_detect_pool import check_pooled_run
+                tracer.meta["detection_pool_served"] = check_pooled_run(pipeline, pool)
+            
+            print(f"\nAnalysis Complete!")
+            print(f"  - Total roofs: {result.total_roofs}")
+            print(f"  - Roofs with damage: {result.roofs_with_damage}")
+            print(f"  - Total damage area: {result.total_damage_area_pixels} pixels")
+            
+            with stage("email"):
+                await email_damage_reports(result, zipcode, email_list, artifacts)
+            
+        except Exception as e:
+            print(f"ERROR: {e}")
+            import traceback
+            traceback.print_exc()
+        finally:
+            with stage("close"):
+                if pool is not None:
+                    pool.close()
+                    tracer.meta["detection_pool"] = pool.stats.summary()
+                await pipeline.close()
+    
+    finish_trace(tracer, artifacts, chrome_trace)
+
+
+def finish_trace(tracer: RunTracer, artifacts: Optional[RunArtifacts], chrome_trace: bool = False) -> None:
+    """
+    Print a run's stage timings and store its trace record.
+    
+    Args:
+        tracer: Tracer of the finished run
+        artifacts: The run's artifacts (None if the run failed before recording)
+        chrome_trace: Also write trace.chrome.json to the run directory
+    """
+    tracer.print_summary()
+    if artifacts is not None:
+        tracer.meta["run_id"] = artifacts.run_id
+    tracer.append_jsonl(str(TRACE_HISTORY_PATH))
+    if artifacts is None:
+        return
+    run_dir = Path(artifacts.run_dir)
+    tracer.write_json(str(run_dir / TRACE_NAME))
+    if chrome_trace:
+        tracer.write_chrome_trace(str(run_dir / CHROME_TRACE_NAME))
+        print(f"Chrome trace: {run_dir / CHROME_TRACE_NAME}")
+
+
+def run_with_profile(coro, label: str) -> None:
+    """
+    Run a coroutine under cProfile and print the top functions.
+    
+    Args:
+        coro: Coroutine to run
+        label: Used in the .pstats file name (e.g. the zipcode)
+    """
+    import cProfile
+    import pstats
+    
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    profile_path = PROFILE_DIR / f"{label}_{int(time.time())}.pstats"
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        asyncio.run(coro)
+    finally:
+        profiler.disable()
+        profiler.dump_stats(str(profile_path))
+        print(f"\nProfile written to {profile_path}")
+        pstats.Stats(profiler).sort_stats("cumulative").print_stats(25)
+
+
+def load_saved_results(path: str) -> list:
+    """
+    Load every result file at a path (file or directory) in parallel.
+    
+    Args:
+        path: Result JSON, or a directory searched recursively
+        
+    Returns:
+        List of (path, SavedResult) for the files that loaded
+    """
+    from mvp_results import find_result_files, load_results
+    
+    files = find_result_files(path)
+    if not files:
+        print(f"⚠️  No result files ({{zipcode}}_{{timestamp}}.json) found at {path}")
+        return []
+    
+    start = time.perf_counter()
+    loaded = []
+    for file_path, result in load_results(files):
+        if isinstance(result, Exception):
+            print(f"   ❌ {file_path.name}: {result}")
+            continue
+        loaded.append((file_path, result))
+    print(f"📂 Loaded {len(loaded)}/{len(files)} result file(s) in {time.perf_counter() - start:.2f}s")
+    return loaded
+
+
+async def email_saved_results(path: str, email_list: List[str]) -> "DispatchStats":
+    """
+    Re-cost and email reports from saved result files without running detection.
+    
+    Each file's messages are handed to one dispatcher as soon as they are
+    built, with at most SAVED_RESULTS_BUILD_AHEAD files built ahead of
+    sending, so the rate limit and connection pool are shared and peak
+    memory does not grow with the number of files.
+    
+    Args:
+        path: Result JSON, or a directory of result files
+        email_list: Email addresses that receive every property report
+        
+    Returns:
+        DispatchStats for all files' emails
+    """
+    from mvp_artifacts import artifacts_for_result_file
+    from mvp_dispatch import DispatchStats, OutgoingEmail
+    
+    async def build(file_path: Path, result) -> List[OutgoingEmail]:
+        zipcode = result.zipcode or file_path.stem.split("_")[0]
+        artifacts = artifacts_for_result_file(str(file_path), zipcode)
+        print(f"\n📄 {file_path.name}: {result.total_roofs} roofs, {len(result.damages)} damages")
+        return await build_damage_emails(result, zipcode, email_list, artifacts)
+    
+    async def stream() -> AsyncIterator[OutgoingEmail]:
+        pending: List[asyncio.Task] = []
+        try:
+            for file_path, result in loaded:
+                pending.append(asyncio.create_task(build(file_path, result)))
+                if len(pending) < SAVED_RESULTS_BUILD_AHEAD:
+                    continue
+                for email in await pending.pop(0):
+                    yield email
+            while pending:
+                for email in await pending.pop(0):
+                    yield email
+        finally:
+            for task in pending:
+                task.cancel()
+    
+    loaded = load_saved_results(path)
+    if not loaded:
+        return DispatchStats()
+    return await dispatch_emails(stream())
+
+
+def print_result_costs(result, label: str) -> None:
+    """
+    Print the per-roof repair cost table of one result.
+    
+    Args:
+        result: AnalysisResult or SavedResult
+        label: Shown when the result has no zipcode
+    """
+    from mvp_index import ResultIndex
+    
+    index = ResultIndex(result)
+    costs = index.bulk_costs.to_repair_costs()
+    
+    print(f"\n💰 Repair costs for {result.zipcode or label} "
+          f"({len(costs)} damaged roof(s) of {result.total_roofs})")
+    print(f"   {'Roof':>6} {'Damages':>8} {'Area (sqft)':>12} {'Labor':>12} {'Material':>12} {'Total':>12}")
+    for roof_id, roof_costs in costs.items():
+        print(f"   {roof_id:>6} {index.aggregates[roof_id].damage_count:>8} "
+              f"{roof_costs.damage_area_sqft:>12,.2f} {roof_costs.labor_cost:>12,.2f} "
+              f"{roof_costs.material_cost:>12,.2f} {roof_costs.total_cost:>12,.2f}")
+    total = sum(c.total_cost for c in costs.values())
+    print(f"   {'All':>6} {sum(a.damage_count for a in index.aggregates.values()):>8} "
+          f"{sum(c.damage_area_sqft for c in costs.values()):>12,.2f} "
+          f"{sum(c.labor_cost for c in costs.values()):>12,.2f} "
+          f"{sum(c.material_cost for c in costs.values()):>12,.2f} {total:>12,.2f}")
+
+
+def print_costs(path: str) -> None:
+    """
+    Print per-roof repair costs of saved result files, using the current cost tables.
+    
+    Args:
+        path: Result JSON, or a directory of result files
+    """
+    for file_path, result in load_saved_results(path):
+        print_result_costs(result, file_path.stem)
@@ -0,0 +1,228 @@
+"""
+Run-scoped output artifacts and run manifest.
+Every analysis writes into its own directory, so its files are known exactly
+instead of being found by globbing and mtime-sorting the shared output folder.
+"""
+import json
+import os
+import time
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Iterable, Optional
+
+from loguru import logger
+
+# Suffix -> RunArtifacts field, checked longest first
+ARTIFACT_SUFFIXES = (
+    ("_annotated.png", "annotated"),
+    ("_heatmap.png", "heatmap"),
+    (".geojson", "geojson"),
+    (".json", "json"),
+)
+
+MANIFEST_NAME = "manifest.json"
+LATEST_NAME = "LATEST.json"
+TRACE_NAME = "trace.json"
+CHROME_TRACE_NAME = "trace.chrome.json"
+
+# Directory of the overlay tile pyramid (see mvp_pyramid)
+TILES_DIR = "tiles"
+PYRAMID_NAME = "pyramid.json"
+
+# Bookkeeping files in a run directory that are not pipeline artifacts
+RESERVED_NAMES = {MANIFEST_NAME, TRACE_NAME, CHROME_TRACE_NAME}
+
+
+@dataclass
+class RunArtifacts:
+    """Files written by one analysis run."""
+    zipcode: str
+    run_id: str
+    run_dir: str
+    created_at: float
+    annotated: Optional[str] = None
+    heatmap: Optional[str] = None
+    json: Optional[str] = None
+    geojson: Optional[str] = None
+    tiles: Optional[str] = None     # Overlay tile pyramid directory
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "RunArtifacts":
+        return cls(**data)
+
+
+def artifacts_for_result_file(json_path: str, zipcode: str = "") -> RunArtifacts:
+    """
+    Artifacts belonging to a saved result file.
+
+    Uses the run's manifest when the file sits in a run directory, otherwise
+    the images next to it that share its name stem.
+
+    Args:
+        json_path: Result JSON written by the pipeline
+        zipcode: Zipcode of the result (for RunArtifacts)
+
+    Returns:
+        RunArtifacts with json set to json_path
+    """
+    path = Path(json_path).resolve()
+    manifest_path = path.parent / MANIFEST_NAME
+    if manifest_path.exists():
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            artifacts = RunArtifacts.from_dict(json.load(f))
+    else:
+        artifacts = RunArtifacts(zipcode=zipcode, run_id=path.stem, run_dir=str(path.parent),
+                                 created_at=path.stat().st_mtime)
+        for suffix, attr in ARTIFACT_SUFFIXES:
+            sibling = path.with_name(path.stem + suffix)
+            if attr in ("annotated", "heatmap", "geojson") and sibling.exists():
+                setattr(artifacts, attr, str(sibling))
+    artifacts.json = str(path)
+    return artifacts
+
+
+def _write_json_atomic(path: Path, data: dict) -> None:
+    """Write JSON via a temp file and rename, so readers never see half a file."""
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+class RunManifest:
+    """
+    Index of analysis runs under an output root.
+
+    Layout::
+
+        <root>/runs/<zipcode>/<run_id>/          pipeline output of one run
+        <root>/runs/<zipcode>/<run_id>/manifest.json
+        <root>/runs/<zipcode>/LATEST.json        newest completed run
+        <root>/runs.jsonl                        append-only history
+
+    Lookups by (zipcode, run_id) or latest run are direct path reads and do
+    not depend on how many runs exist.
+    """
+
+    def __init__(self, output_root: str):
+        self.root = Path(output_root)
+        self.runs_dir = self.root / "runs"
+        self.history_path = self.root / "runs.jsonl"
+
+    def new_run(self, zipcode: str) -> RunArtifacts:
+        """
+        Create an empty, unique directory for a new run.
+
+        Args:
+            zipcode: Zipcode being analyzed
+
+        Returns:
+            RunArtifacts with only run_id/run_dir set
+        """
+        created_at = time.time()
+        # Millisecond timestamp + pid keeps concurrent runs of one zipcode apart
+        run_id = f"{int(created_at * 1000)}_{os.getpid()}"
+        run_dir = self.runs_dir / zipcode / run_id
+        suffix = 0
+        while True:
+            try:
+                run_dir.mkdir(parents=True, exist_ok=False)
+                break
+            except FileExistsError:
+                suffix += 1
+                run_dir = self.runs_dir / zipcode / f"{run_id}_{suffix}"
+        return RunArtifacts(
+            zipcode=zipcode,
+            run_id=run_dir.name,
+            run_dir=str(run_dir),
+            created_at=created_at
+        )
+
+    def adopt(
+        self,
+        artifacts: RunArtifacts,
+        source_dir: str,
+        stem: str,
+        expected: Iterable[str] = ("json",)
+    ) -> RunArtifacts:
+        """
+        Move a run's pipeline outputs from a shared directory into its run directory.
+
+        The pipeline writes every output of an analysis under one name stem
+        (``<zipcode>_<result.timestamp>``) into its configured output_dir, so
+        exactly this run's files are picked, whatever else is in that folder.
+        An expected output that is not there is logged as a warning (e.g. the
+        pipeline named it differently, or failed to write it) and left out
+        of the run.
+
+        Args:
+            artifacts: Run returned by new_run
+            source_dir: Directory the pipeline wrote to
+            stem: File name stem of this run's outputs
+            expected: RunArtifacts fields the pipeline was configured to write
+
+        Returns:
+            The same RunArtifacts (call record() to register the files)
+        """
+        run_dir = Path(artifacts.run_dir)
+        expected = set(expected)
+        for suffix, attr in ARTIFACT_SUFFIXES:
+            path = Path(source_dir) / f"{stem}{suffix}"
+            if path.exists():
+                os.replace(path, run_dir / path.name)
+            elif attr in expected:
+                logger.warning(f"Run {artifacts.run_id}: expected {attr} output {path} is missing")
+        return artifacts
+
+    def record(self, artifacts: RunArtifacts) -> RunArtifacts:
+        """
+        Register the files a run wrote and publish it as the zipcode's latest.
+
+        Args:
+            artifacts: Run returned by new_run, after the pipeline finished
+
+        Returns:
+            RunArtifacts with the artifact paths filled in
+        """
+        run_dir = Path(artifacts.run_dir)
+        # The run directory only holds this run's handful of files
+        for path in sorted(run_dir.iterdir()):
+            for suffix, attr in ARTIFACT_SUFFIXES:
+                if path.name.endswith(suffix) and path.name not in RESERVED_NAMES:
+                    setattr(artifacts, attr, str(path))
+                    break
+        if (run_dir / TILES_DIR / PYRAMID_NAME).exists():
+            artifacts.tiles = str(run_dir / TILES_DIR)
+
+        data = artifacts.to_dict()
+        _write_json_atomic(run_dir / MANIFEST_NAME, data)
+        _write_json_atomic(run_dir.parent / LATEST_NAME, data)
+
+        # One short write per line; O_APPEND keeps concurrent appends whole
+        line = (json.dumps(data) + "\n").encode('utf-8')
+        fd = os.open(self.history_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+        return artifacts
+
+    def get(self, zipcode: str, run_id: str) -> Optional[RunArtifacts]:
+        """Load a specific run, or None if it was never recorded."""
+        path = self.runs_dir / zipcode / run_id / MANIFEST_NAME
+        if not path.exists():
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return RunArtifacts.from_dict(json.load(f))
+
+    def latest(self, zipcode: str) -> Optional[RunArtifacts]:
+        """Load the newest recorded run for a zipcode, or None."""
+        path = self.runs_dir / zipcode / LATEST_NAME
+        if not path.exists():
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return RunArtifacts.from_dict(json.load(f))
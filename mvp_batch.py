@@ -0,0 +1,315 @@
+"""
+Batch runner for analyzing many zipcodes in one process.
+Loads the pipeline (and its YOLO models) once, reuses it for every zipcode,
+and records per-zipcode progress so a crashed batch resumes where it stopped.
+A zipcode interrupted while emailing resumes at the email stage from its
+saved result, and messages already sent are not sent again.
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from mvp_app import (
+    bootstrap,
+    DEFAULT_EMAILS,
+    create_pipeline,
+    analyze_run,
+    build_damage_emails,
+    dispatch_emails,
+    load_saved_results,
+    setup_logger,
+    get_settings,
+)
+
+# Status values written to the batch status file
+STATUS_PENDING = "pending"
+STATUS_ANALYZING = "analyzing"
+STATUS_EMAILING = "emailing"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+@dataclass
+class BatchStatus:
+    """Per-zipcode progress of a batch, persisted as JSON after every change."""
+    path: Path
+    entries: Dict[str, Dict] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, path: Path) -> "BatchStatus":
+        """
+        Load a status file, or start an empty one if it does not exist.
+
+        Args:
+            path: Location of the status JSON file
+
+        Returns:
+            BatchStatus with any previously recorded entries
+        """
+        status = cls(path=path)
+        if path.exists():
+            with open(path, 'r', encoding='utf-8') as f:
+                status.entries = json.load(f)
+        return status
+
+    def is_done(self, zipcode: str) -> bool:
+        """Return True if the zipcode already finished in an earlier run."""
+        return self.entries.get(zipcode, {}).get("status") == STATUS_DONE
+
+    def resumes_at_email(self, zipcode: str) -> bool:
+        """Return True if the zipcode was analyzed but stopped while (or before finishing) emailing."""
+        entry = self.entries.get(zipcode, {})
+        if entry.get("status") not in (STATUS_EMAILING, STATUS_FAILED):
+            return False
+        if entry.get("status") == STATUS_FAILED and entry.get("failed_stage") != "email":
+            return False
+        return bool(entry.get("result_json")) and Path(entry["result_json"]).exists()
+
+    def mark(self, zipcode: str, status: str, **details) -> None:
+        """
+        Update a zipcode's status and write the file.
+
+        Args:
+            zipcode: Zipcode being updated
+            status: One of the STATUS_* values
+            **details: Extra fields to record (counts, error message, ...)
+        """
+        entry = self.entries.setdefault(zipcode, {})
+        entry.update(details)
+        entry["status"] = status
+        entry["updated_at"] = time.time()
+        self.save()
+
+    def save(self) -> None:
+        """Write the status file atomically so a crash never leaves it half-written."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def read_zipcode_list(source: str, base_dir: Path) -> List[str]:
+    """
+    Read zipcodes from a file (one per line, '#' comments allowed) or a comma list.
+
+    Args:
+        source: Path to a zipcode file, or e.g. "75201,75202"
+        base_dir: Directory relative paths are resolved against (the launch
+                  directory, since the CLI changes into the parent project)
+
+    Returns:
+        Zipcodes in order, duplicates removed
+    """
+    path = Path(source)
+    if not path.is_absolute():
+        path = base_dir / path
+
+    if path.exists():
+        with open(path, 'r', encoding='utf-8') as f:
+            raw = [line.split('#', 1)[0] for line in f]
+    else:
+        raw = source.split(',')
+
+    zipcodes = []
+    for item in raw:
+        zipcode = item.strip()
+        if zipcode and zipcode not in zipcodes:
+            zipcodes.append(zipcode)
+    return zipcodes
+
+
+def default_status_path(source: str, base_dir: Path) -> Path:
+    """Status file next to the zipcode list, or batch_status.json in base_dir for inline lists."""
+    source_path = Path(source) if Path(source).is_absolute() else base_dir / source
+    if source_path.exists():
+        return source_path.with_suffix(".status.json")
+    return base_dir / "batch_status.json"
+
+
+def _message_key(email) -> str:
+    """Identify a report message across runs: its roof and recipient."""
+    return f"{email.context.get('roof_id')}|{email.msg['To']}"
+
+
+async def _email_zipcode(
+    status: BatchStatus,
+    zipcode: str,
+    result,
+    artifacts,
+    email_list: List[str]
+) -> None:
+    """
+    Send a zipcode's reports and record the outcome.
+
+    Every sent message is recorded in the status file as it goes out, so a
+    resumed batch skips the messages that already reached their recipient.
+    """
+    status.mark(zipcode, STATUS_EMAILING)
+    entry = status.entries[zipcode]
+    sent = set(entry.setdefault("emailed", []))
+
+    def record_sent(email) -> None:
+        entry["emailed"].append(_message_key(email))
+        status.save()
+
+    try:
+        emails = await build_damage_emails(result, zipcode, email_list, artifacts)
+        pending = [email for email in emails if _message_key(email) not in sent]
+        if len(pending) < len(emails):
+            print(f"   ⏭️  {len(emails) - len(pending)} email(s) already sent in an earlier run")
+        stats = await dispatch_emails(pending, on_sent=record_sent)
+    except Exception as e:
+        status.mark(zipcode, STATUS_FAILED, failed_stage="email", error=f"email: {e}")
+        return
+    status.mark(
+        zipcode,
+        STATUS_DONE,
+        emails_sent=len(entry["emailed"]),
+        emails_failed=stats.failed,
+        emails_dead_lettered=stats.dead_lettered,
+        emails_quota_exhausted=stats.quota_exhausted,
+    )
+
+
+async def _resume_email(status: BatchStatus, zipcode: str, email_list: List[str]) -> None:
+    """Email a zipcode from the result its interrupted run saved, without analyzing it again."""
+    from mvp_artifacts import artifacts_for_result_file
+
+    result_json = status.entries[zipcode]["result_json"]
+    loaded = load_saved_results(result_json)
+    if not loaded:
+        status.mark(zipcode, STATUS_FAILED, failed_stage="email", error=f"email: cannot load {result_json}")
+        return
+    file_path, result = loaded[0]
+    artifacts = artifacts_for_result_file(str(file_path), zipcode)
+    await _email_zipcode(status, zipcode, result, artifacts, email_list)
+
+
+async def run_batch(
+    zipcodes: List[str],
+    email_list: List[str],
+    status_path: Path
+) -> BatchStatus:
+    """
+    Analyze and email every zipcode with a single shared pipeline.
+
+    Analyses run one after another on the warm pipeline; each zipcode's fetch
+    and detection happen inside its single analyze_zipcode call, so they do
+    not overlap with other zipcodes. Only the emails for zipcode N are sent
+    while zipcode N+1 is analyzed. Zipcodes that stopped at the email stage
+    are emailed from their saved result first, without the pipeline.
+
+    Args:
+        zipcodes: Zipcodes to process, in order
+        email_list: Recipients for every property report
+        status_path: Status/resume file; zipcodes marked done are skipped
+
+    Returns:
+        Final BatchStatus
+    """
+    setup_logger()
+    settings = get_settings()
+
+    status = BatchStatus.load(status_path)
+    remaining = [z for z in zipcodes if not status.is_done(z)]
+    skipped = len(zipcodes) - len(remaining)
+    if skipped:
+        print(f"⏭️  Resuming batch: {skipped} zipcode(s) already done")
+
+    if not remaining:
+        print("✅ Nothing to do, every zipcode is already done.")
+        return status
+
+    if not settings.has_maptiler_api_key:
+        print("ERROR: MAPTILER_API_KEY not set in .env file")
+        return status
+
+    for zipcode in remaining:
+        if zipcode not in status.entries:
+            status.entries[zipcode] = {"status": STATUS_PENDING}
+    status.save()
+
+    batch_start = time.time()
+    to_email = [z for z in remaining if status.resumes_at_email(z)]
+    to_analyze = [z for z in remaining if z not in to_email]
+    for zipcode in to_email:
+        print(f"\n📧 Resuming {zipcode} at the email stage")
+        await _resume_email(status, zipcode, email_list)
+
+    pipeline = create_pipeline(settings) if to_analyze else None
+    email_task: Optional[asyncio.Task] = None
+
+    try:
+        for index, zipcode in enumerate(to_analyze, 1):
+            print(f"\n[{index}/{len(to_analyze)}] Analyzing zipcode: {zipcode}")
+            # A new analysis gets new messages: forget what an earlier run sent
+            status.mark(zipcode, STATUS_ANALYZING, emailed=[], result_json=None, failed_stage=None)
+            zip_start = time.time()
+
+            try:
+                result, artifacts = await analyze_run(pipeline, zipcode)
+            except Exception as e:
+                print(f"ERROR: {zipcode}: {e}")
+                status.mark(zipcode, STATUS_FAILED, failed_stage="analyze", error=str(e))
+                continue
+
+            status.mark(
+                zipcode,
+                STATUS_ANALYZING,
+                roofs=result.total_roofs,
+                damages=len(result.damages),
+                analysis_sec=round(time.time() - zip_start, 2),
+                run_id=artifacts.run_id,
+                result_json=artifacts.json,
+            )
+
+            # Keep at most one zipcode emailing while the next one is analyzed
+            if email_task is not None:
+                await email_task
+            email_task = asyncio.create_task(
+                _email_zipcode(status, zipcode, result, artifacts, email_list)
+            )
+
+        if email_task is not None:
+            await email_task
+    finally:
+        if pipeline is not None:
+            await pipeline.close()
+
+    counts: Dict[str, int] = {}
+    for zipcode in zipcodes:
+        state = status.entries.get(zipcode, {}).get("status", STATUS_PENDING)
+        counts[state] = counts.get(state, 0) + 1
+
+    print(f"\n📊 Batch Summary ({time.time() - batch_start:.1f}s):")
+    print(f"   ✅ Done: {counts.get(STATUS_DONE, 0)}")
+    print(f"   ❌ Failed: {counts.get(STATUS_FAILED, 0)}")
+    print(f"   📄 Status file: {status_path}")
+
+    return status
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python mvp_batch.py <zipcodes_file|zip1,zip2,...> [email1] [email2] ...")
+        print("Example: python mvp_batch.py zipcodes.txt")
+        print("Example: python mvp_batch.py 75201,75202 owner@example.com")
+        print("\nProgress is saved to <zipcodes_file>.status.json (or batch_status.json)")
+        print("and zipcodes already marked done are skipped on the next run.")
+        sys.exit(1)
+
+    launch_dir = bootstrap()
+    source = sys.argv[1]
+    zipcodes = read_zipcode_list(source, launch_dir)
+    status_path = default_status_path(source, launch_dir)
+
+    email_list = sys.argv[2:] if len(sys.argv) > 2 else DEFAULT_EMAILS
+
+    print(f"📦 Batch of {len(zipcodes)} zipcode(s)")
+    asyncio.run(run_batch(zipcodes, email_list, status_path))
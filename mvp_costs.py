@@ -3,9 +3,14 @@ Mock cost calculation for roof damage repairs.
 Calculates labor and material costs based on damage area and type.
 """
 from dataclasses import dataclass
-from typing import Dict, List, Optional
-from src.output.json_generator import AnalysisResult
-from src.detection.damage_detector import DamageType, DamageSeverity, DamageDetection
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+
+from areas import PixelGrid, detection_rows, pixel_areas_sqft
+
+if TYPE_CHECKING:
+    from src.output.json_generator import AnalysisResult
+    from src.detection.damage_detector import DamageDetection
 
 
 @dataclass
@@ -55,13 +60,31 @@ LABOR_PERCENTAGES = {
     "unknown": 0.50
 }
 
-# Pixel to square feet conversion (approximate for zoom level 21)
-# At zoom 21: ~0.075m per pixel = ~0.25 feet per pixel
-# So 1 pixel² ≈ 0.0625 sqft
-PIXEL_TO_SQFT = 0.0625
+
+def damage_areas_sqft(
+    damages: List["DamageDetection"],
+    result: Optional["AnalysisResult"] = None
+) -> np.ndarray:
+    """
+    Ground area of each damage (see areas.py).
+    
+    Each damage is scaled at its bbox's center row of the result image, so
+    pixels are priced at their true size for the result's latitude; without
+    a result the nominal PIXEL_TO_SQFT is used.
+    
+    Args:
+        damages: Damages of the result
+        result: Result the damages' pixel coordinates belong to
+        
+    Returns:
+        Square feet per damage
+    """
+    grid = PixelGrid.for_result(result) if result is not None else None
+    default_row = result.image_height / 2.0 if result is not None else 0.0
+    return pixel_areas_sqft([d.area_pixels for d in damages], detection_rows(damages, default_row), grid)
 
 
-def calculate_repair_costs(result: AnalysisResult, damages: Optional[List[DamageDetection]] = None) -> RepairCosts:
+def calculate_repair_costs(result: "AnalysisResult", damages: Optional[List["DamageDetection"]] = None) -> RepairCosts:
     """
     Calculate repair costs from analysis result.
     
@@ -86,22 +109,22 @@ def calculate_repair_costs(result: AnalysisResult, damages: Optional[List[Damage
             breakdown_by_type={}
         )
     
-    # Calculate total damage pixels from provided damages
-    total_damage_pixels = sum(d.area_pixels for d in damages_to_calculate)
-    total_damage_sqft = total_damage_pixels * PIXEL_TO_SQFT
+    # Ground area of every damage at the result's latitude
+    areas_sqft = damage_areas_sqft(damages_to_calculate, result).tolist()
+    total_damage_sqft = 0.0
+    for damage_area_sqft in areas_sqft:
+        total_damage_sqft += damage_area_sqft
     
     # Calculate costs by damage type
     breakdown_by_type = {}
     total_cost = 0.0
     
-    for damage in damages_to_calculate:
+    for damage, damage_area_sqft in zip(damages_to_calculate, areas_sqft):
         damage_type = damage.damage_type.value
         severity = damage.severity.value
-        damage_area_pixels = damage.area_pixels
-        damage_area_sqft = damage_area_pixels * PIXEL_TO_SQFT
         
         # Get base cost
-        base_cost_per_sqft = BASE_COSTS_PER_SQFT.get(damage_type, 8.0)
+        base_cost_per_sqft = BASE_COSTS_PER_SQFT.get(damage_type, BASE_COSTS_PER_SQFT["unknown"])
         
         # Apply severity multiplier
         severity_mult = SEVERITY_MULTIPLIERS.get(severity, 1.0)
@@ -139,3 +162,180 @@ def calculate_repair_costs(result: AnalysisResult, damages: Optional[List[Damage
         breakdown_by_type={k: round(v, 2) for k, v in breakdown_by_type.items()}
     )
 
+
+# Column codes for the bulk engine: index into these tuples
+DAMAGE_TYPE_CODES = tuple(BASE_COSTS_PER_SQFT.keys())
+SEVERITY_CODES = tuple(SEVERITY_MULTIPLIERS.keys())
+_DAMAGE_TYPE_INDEX = {name: code for code, name in enumerate(DAMAGE_TYPE_CODES)}
+_SEVERITY_INDEX = {name: code for code, name in enumerate(SEVERITY_CODES)}
+_BASE_COST_TABLE = np.array([BASE_COSTS_PER_SQFT[name] for name in DAMAGE_TYPE_CODES], dtype=np.float64)
+_SEVERITY_TABLE = np.array([SEVERITY_MULTIPLIERS[name] for name in SEVERITY_CODES], dtype=np.float64)
+
+
+@dataclass
+class DamageColumns:
+    """Damages as parallel arrays, one entry per damage."""
+    type_codes: np.ndarray      # index into type_names
+    severity_codes: np.ndarray  # index into SEVERITY_CODES
+    area_pixels: np.ndarray
+    area_sqft: np.ndarray       # ground area (see damage_areas_sqft)
+    roof_ids: np.ndarray        # grouping key (roof id, or a zipcode+roof key)
+    # DAMAGE_TYPE_CODES, then types missing from the cost tables (priced as "unknown")
+    type_names: Tuple[str, ...] = DAMAGE_TYPE_CODES
+
+
+def damages_to_columns(
+    damages: Iterable["DamageDetection"],
+    result: Optional["AnalysisResult"] = None
+) -> DamageColumns:
+    """
+    Convert damage detections to columnar arrays.
+    
+    Damage types missing from the cost tables get codes after
+    DAMAGE_TYPE_CODES and keep their own name, priced as "unknown"; unknown
+    severities map to "low". Both match the scalar path, including its
+    breakdown keys.
+    
+    Args:
+        damages: Damages with a roof_id
+        result: Result the damages belong to (sets the ground scale, as in
+                calculate_repair_costs)
+        
+    Returns:
+        DamageColumns
+    """
+    damages = list(damages)
+    type_names = list(DAMAGE_TYPE_CODES)
+    type_index = dict(_DAMAGE_TYPE_INDEX)
+    low = _SEVERITY_INDEX["low"]
+    type_codes, severity_codes, areas, roof_ids = [], [], [], []
+    for damage in damages:
+        name = damage.damage_type.value
+        code = type_index.get(name)
+        if code is None:
+            code = type_index[name] = len(type_names)
+            type_names.append(name)
+        type_codes.append(code)
+        severity_codes.append(_SEVERITY_INDEX.get(damage.severity.value, low))
+        areas.append(damage.area_pixels)
+        roof_ids.append(damage.roof_id)
+    return DamageColumns(
+        type_codes=np.asarray(type_codes, dtype=np.int16),
+        severity_codes=np.asarray(severity_codes, dtype=np.int16),
+        area_pixels=np.asarray(areas, dtype=np.int64),
+        area_sqft=damage_areas_sqft(damages, result),
+        roof_ids=np.asarray(roof_ids, dtype=np.int64),
+        type_names=tuple(type_names)
+    )
+
+
+@dataclass
+class BulkRepairCosts:
+    """
+    Repair costs for many roofs at once.
+    
+    Per-roof arrays are aligned with ``roof_ids`` and hold unrounded values;
+    ``costs_for``/``to_repair_costs`` round exactly like calculate_repair_costs.
+    """
+    roof_ids: np.ndarray
+    damage_cost: np.ndarray          # per damage, input order
+    total_cost: np.ndarray
+    labor_cost: np.ndarray
+    material_cost: np.ndarray
+    damage_area_sqft: np.ndarray
+    cost_per_sqft: np.ndarray
+    breakdown: np.ndarray            # (roofs, damage types) cost sums
+    breakdown_order: List[List[int]]  # per roof: type codes in first-seen order
+    type_names: Tuple[str, ...] = DAMAGE_TYPE_CODES  # breakdown column names
+    
+    def _repair_costs(self, row: int) -> RepairCosts:
+        breakdown = self.breakdown[row]
+        return RepairCosts(
+            total_cost=round(float(self.total_cost[row]), 2),
+            labor_cost=round(float(self.labor_cost[row]), 2),
+            material_cost=round(float(self.material_cost[row]), 2),
+            damage_area_sqft=round(float(self.damage_area_sqft[row]), 2),
+            cost_per_sqft=round(float(self.cost_per_sqft[row]), 2),
+            breakdown_by_type={
+                self.type_names[code]: round(float(breakdown[code]), 2)
+                for code in self.breakdown_order[row]
+            }
+        )
+    
+    def costs_for(self, roof_id: int) -> RepairCosts:
+        """RepairCosts for one roof (KeyError if it has no damages)."""
+        row = int(np.searchsorted(self.roof_ids, roof_id))
+        if row >= len(self.roof_ids) or self.roof_ids[row] != roof_id:
+            raise KeyError(roof_id)
+        return self._repair_costs(row)
+    
+    def to_repair_costs(self) -> Dict[int, RepairCosts]:
+        """RepairCosts for every roof, keyed by roof id."""
+        return {int(roof_id): self._repair_costs(row) for row, roof_id in enumerate(self.roof_ids)}
+
+
+def calculate_repair_costs_bulk(columns: DamageColumns) -> BulkRepairCosts:
+    """
+    Calculate repair costs for all roofs of one or many zipcodes at once.
+    
+    Uses NumPy group-by reductions instead of a Python loop per damage.
+    Sums accumulate in input order, so every roof's values match
+    calculate_repair_costs on that roof's damages exactly (including the
+    $500 minimum and rounding).
+    
+    Args:
+        columns: All damages as arrays (see damages_to_columns)
+        
+    Returns:
+        BulkRepairCosts with per-damage and per-roof results
+    """
+    n_types = len(columns.type_names)
+    roof_ids, roof_index = np.unique(columns.roof_ids, return_inverse=True)
+    n_roofs = len(roof_ids)
+    
+    # Types missing from the cost tables price as "unknown"
+    base_costs = _BASE_COST_TABLE
+    if n_types > len(DAMAGE_TYPE_CODES):
+        unlisted = np.full(n_types - len(DAMAGE_TYPE_CODES), BASE_COSTS_PER_SQFT["unknown"])
+        base_costs = np.concatenate([_BASE_COST_TABLE, unlisted])
+    
+    # Same operation order as the scalar path: (base * severity) * sqft
+    adjusted_cost_per_sqft = base_costs[columns.type_codes] * _SEVERITY_TABLE[columns.severity_codes]
+    damage_cost = adjusted_cost_per_sqft * columns.area_sqft
+    
+    # bincount adds in input order, matching the scalar running sums
+    total_cost = np.bincount(roof_index, weights=damage_cost, minlength=n_roofs)
+    total_damage_sqft = np.bincount(roof_index, weights=columns.area_sqft, minlength=n_roofs)
+    
+    cell = roof_index * n_types + columns.type_codes
+    breakdown = np.bincount(cell, weights=damage_cost, minlength=n_roofs * n_types).reshape(n_roofs, n_types)
+    
+    # Order each roof's breakdown by first occurrence, like the scalar dict
+    cells, first_seen = np.unique(cell, return_index=True)
+    order = np.lexsort((first_seen, cells // n_types))
+    breakdown_order: List[List[int]] = [[] for _ in range(n_roofs)]
+    for c in cells[order].tolist():
+        breakdown_order[c // n_types].append(c % n_types)
+    
+    # Apply minimum cost threshold
+    total_cost = np.maximum(total_cost, 500.0)
+    
+    avg_labor_pct = sum(LABOR_PERCENTAGES.values()) / len(LABOR_PERCENTAGES)
+    labor_cost = total_cost * avg_labor_pct
+    material_cost = total_cost * (1 - avg_labor_pct)
+    
+    cost_per_sqft = np.zeros(n_roofs)
+    np.divide(total_cost, total_damage_sqft, out=cost_per_sqft, where=total_damage_sqft > 0)
+    
+    return BulkRepairCosts(
+        roof_ids=roof_ids,
+        damage_cost=damage_cost,
+        total_cost=total_cost,
+        labor_cost=labor_cost,
+        material_cost=material_cost,
+        damage_area_sqft=total_damage_sqft,
+        cost_per_sqft=cost_per_sqft,
+        breakdown=breakdown,
+        breakdown_order=breakdown_order,
+        type_names=columns.type_names
+    )
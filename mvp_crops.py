@@ -0,0 +1,181 @@
+"""
+Per-roof image crops for email reports.
+Cuts the annotated image and heatmap around each damaged roof so an email
+carries a small compressed picture of its own property, not the whole mosaic.
+"""
+import copy
+import dataclasses
+import io
+import math
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Optional, Tuple
+from pathlib import Path
+from loguru import logger
+
+if TYPE_CHECKING:
+    from PIL import Image
+    from src.output.json_generator import AnalysisResult
+    from mvp_pyramid import TilePyramid
+
+
+@dataclass
+class CropSettings:
+    """How roof crops are cut and encoded."""
+    margin_ratio: float = 0.5      # Extra context around the roof, relative to its size
+    min_margin_px: int = 48        # Never crop tighter than this around the roof
+    max_side_px: int = 1024        # Downscale so the longest side fits
+    image_format: str = "JPEG"     # JPEG or WEBP
+    quality: int = 80
+
+
+@dataclass
+class RoofCrop:
+    """Encoded crops for one roof."""
+    roof_id: int
+    annotated: Optional[bytes] = None
+    heatmap: Optional[bytes] = None
+    image_format: str = "JPEG"
+
+    @property
+    def extension(self) -> str:
+        return "jpg" if self.image_format.upper() == "JPEG" else self.image_format.lower()
+
+    @property
+    def mime_subtype(self) -> str:
+        return self.image_format.lower()
+
+
+def roof_bbox(roof) -> Tuple[float, float, float, float]:
+    """
+    Get a roof's bounding box (x1, y1, x2, y2) in mosaic pixels.
+
+    Falls back to a square of the roof's area around its center when the
+    detection carries no box.
+    """
+    bbox = getattr(roof, 'bbox', None)
+    if bbox is not None:
+        x1, y1, x2, y2 = bbox[:4]
+        return float(x1), float(y1), float(x2), float(y2)
+    half = math.sqrt(max(roof.area_pixels, 1)) / 2.0
+    cx, cy = roof.center[0], roof.center[1]
+    return cx - half, cy - half, cx + half, cy + half
+
+
+def replace_detection(detection, **changes):
+    """
+    Copy a roof/damage detection with some attributes changed.
+
+    Detections come from the parent project; dataclasses are copied with
+    ``dataclasses.replace``, anything else with a shallow copy.
+    """
+    if dataclasses.is_dataclass(detection):
+        return dataclasses.replace(detection, **changes)
+    replaced = copy.copy(detection)
+    for name, value in changes.items():
+        setattr(replaced, name, value)
+    return replaced
+
+
+def shift_detection(detection, dx: float, dy: float, **changes):
+    """
+    Copy a roof/damage detection moved by (dx, dy) pixels.
+
+    Shifts whichever of ``bbox``, ``center`` and ``polygon`` the detection
+    has; ``changes`` are applied on top (e.g. a new id).
+    """
+    bbox = getattr(detection, 'bbox', None)
+    if bbox is not None:
+        changes.setdefault('bbox', (bbox[0] + dx, bbox[1] + dy, bbox[2] + dx, bbox[3] + dy))
+    center = getattr(detection, 'center', None)
+    if center is not None:
+        changes.setdefault('center', (center[0] + dx, center[1] + dy))
+    polygon = getattr(detection, 'polygon', None)
+    if polygon:
+        changes.setdefault('polygon', [(px + dx, py + dy) for px, py in polygon])
+    return replace_detection(detection, **changes)
+
+
+def _crop_window(
+    bbox: Tuple[float, float, float, float],
+    scale: float,
+    image_size: Tuple[int, int],
+    settings: CropSettings
+) -> Tuple[int, int, int, int]:
+    """Expand a bbox by the margin, scale it to the image and clamp to its bounds."""
+    x1, y1, x2, y2 = (v * scale for v in bbox)
+    margin = max(settings.min_margin_px, settings.margin_ratio * max(x2 - x1, y2 - y1))
+    width, height = image_size
+    left = max(0, int(x1 - margin))
+    top = max(0, int(y1 - margin))
+    right = min(width, int(math.ceil(x2 + margin)))
+    bottom = min(height, int(math.ceil(y2 + margin)))
+    return left, top, max(right, left + 1), max(bottom, top + 1)
+
+
+def _encode(image: "Image.Image", settings: CropSettings) -> bytes:
+    """Downscale and compress a crop."""
+    from PIL import Image
+    if max(image.size) > settings.max_side_px:
+        image.thumbnail((settings.max_side_px, settings.max_side_px), Image.LANCZOS)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, format=settings.image_format, quality=settings.quality, optimize=True)
+    return buffer.getvalue()
+
+
+def render_roof_crops(
+    result: "AnalysisResult",
+    roof_ids: Iterable[int],
+    annotated_image_path: Optional[str] = None,
+    heatmap_path: Optional[str] = None,
+    settings: Optional[CropSettings] = None,
+    pyramid: Optional["TilePyramid"] = None,
+    basemap: Optional[Callable] = None
+) -> Dict[int, RoofCrop]:
+    """
+    Crop the annotated image and heatmap around each roof.
+
+    Each mosaic is decoded once and every roof is cut from it in the same
+    pass. Layers without a full-size image are cut from the tile pyramid
+    instead, reading only the tiles around each roof. PIL is imported on
+    first use.
+
+    Args:
+        result: Analysis result the images belong to
+        roof_ids: Roofs to crop
+        annotated_image_path: Path to annotated image
+        heatmap_path: Path to heatmap
+        settings: Crop settings (defaults if None)
+        pyramid: Overlay tiles of the result (see mvp_pyramid)
+        basemap: Imagery tile source the pyramid overlays are drawn on
+
+    Returns:
+        Dict of roof_id -> RoofCrop
+    """
+    from PIL import Image
+
+    settings = settings or CropSettings()
+    wanted = set(roof_ids)
+    boxes = {roof.id: roof_bbox(roof) for roof in result.roofs if roof.id in wanted}
+    crops = {roof_id: RoofCrop(roof_id, image_format=settings.image_format) for roof_id in boxes}
+
+    for attr, path in (("annotated", annotated_image_path), ("heatmap", heatmap_path)):
+        if not path or not Path(path).exists():
+            if pyramid is not None:
+                size = (result.image_width, result.image_height)
+                for roof_id, bbox in boxes.items():
+                    window = _crop_window(bbox, 1.0, size, settings)
+                    setattr(crops[roof_id], attr, _encode(pyramid.composite(attr, window, basemap), settings))
+                logger.debug(f"Cropped {len(boxes)} roofs from the {attr} tile pyramid")
+            continue
+        with Image.open(path) as mosaic:
+            mosaic.load()
+            # Saved images may be rescaled relative to detection coordinates
+            scale = mosaic.width / result.image_width if result.image_width else 1.0
+            for roof_id, bbox in boxes.items():
+                window = _crop_window(bbox, scale, mosaic.size, settings)
+                setattr(crops[roof_id], attr, _encode(mosaic.crop(window), settings))
+        logger.debug(f"Cropped {len(boxes)} roofs from {Path(path).name}")
+
+    return crops
@@ -0,0 +1,162 @@
+"""
+Damage detection on roof crops only.
+Instead of running the damage model over the whole mosaic, each roof's
+bounding box is cut out, crops are grouped into square size buckets and
+packed side by side onto shared canvases, and the damage model runs once
+per canvas. Only roof boxes (plus a small margin) reach the model; cell
+padding and gutters are black, and every damage comes back tied to the
+roof whose cell it lies in.
+"""
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from mvp_crops import roof_bbox, shift_detection
+
+
+@dataclass
+class DamageCropConfig:
+    """How roof crops are bucketed and packed for the damage model."""
+    margin_px: int = 8                                  # Context kept around each roof box
+    buckets: Tuple[int, ...] = (128, 256, 512, 1024)    # Square cell sides; a crop goes to the smallest that fits
+    canvas_px: int = 1280                               # Canvas edge cells are packed onto (one damage-model call)
+    gutter_px: int = 16                                 # Black gap between cells
+
+
+@dataclass
+class DamageCropStats:
+    """Pixels and calls of roof-crop damage detection."""
+    roofs: int = 0
+    canvases: int = 0
+    oversize_roofs: int = 0             # Larger than the biggest bucket: run on their own
+    roof_pixels: int = 0                # Pixels inside roof crops
+    inferred_pixels: int = 0            # Canvas pixels run through the damage model (crops + padding)
+    image_pixels: int = 0               # Pixels of the images the roofs came from
+    damages_off_roof: int = 0           # Detections in padding/gutters, dropped
+    buckets: Dict[int, int] = field(default_factory=dict)  # Bucket side -> roofs
+
+    def add(self, other: "DamageCropStats") -> None:
+        """Accumulate another call's stats."""
+        for name in ("roofs", "canvases", "oversize_roofs", "roof_pixels", "inferred_pixels",
+                     "image_pixels", "damages_off_roof"):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        for side, count in other.buckets.items():
+            self.buckets[side] = self.buckets.get(side, 0) + count
+
+    @property
+    def inferred_ratio(self) -> float:
+        """Share of the full images' pixels that went through the damage model."""
+        return self.inferred_pixels / self.image_pixels if self.image_pixels else 0.0
+
+
+@dataclass
+class _Cell:
+    roof: object
+    crop: Tuple[int, int, int, int]     # x0, y0, x1, y1 in the source image
+    x: int = 0                          # Cell origin on the canvas
+    y: int = 0
+
+
+def _crop_box(roof, width: int, height: int, margin: int) -> Tuple[int, int, int, int]:
+    x1, y1, x2, y2 = roof_bbox(roof)
+    return (max(0, int(x1) - margin), max(0, int(y1) - margin),
+            min(width, int(np.ceil(x2)) + margin), min(height, int(np.ceil(y2)) + margin))
+
+
+def _bucket(side: int, buckets: Tuple[int, ...]) -> Optional[int]:
+    return next((b for b in sorted(buckets) if side <= b), None)
+
+
+def _pack(cells: List[_Cell], side: int, config: DamageCropConfig) -> List[List[_Cell]]:
+    """Lay cells of one bucket out in rows on canvases; returns cells per canvas."""
+    pitch = side + config.gutter_px
+    per_row = max(1, (config.canvas_px + config.gutter_px) // pitch)
+    per_canvas = per_row * per_row
+    canvases = []
+    for start in range(0, len(cells), per_canvas):
+        batch = cells[start:start + per_canvas]
+        for position, cell in enumerate(batch):
+            cell.x = (position % per_row) * pitch
+            cell.y = (position // per_row) * pitch
+        canvases.append(batch)
+    return canvases
+
+
+def _run_canvas(damage_detector, image: np.ndarray, cells: List[_Cell], width: int, height: int) -> Tuple[List, int]:
+    """Paste cells onto a black canvas, detect, and map damages back to source pixels."""
+    canvas = np.zeros((height, width) + image.shape[2:], dtype=image.dtype)
+    roofs = []
+    for cell in cells:
+        x0, y0, x1, y1 = cell.crop
+        canvas[cell.y:cell.y + y1 - y0, cell.x:cell.x + x1 - x0] = image[y0:y1, x0:x1]
+        roofs.append(shift_detection(cell.roof, cell.x - x0, cell.y - y0))
+
+    damages, off_roof = [], 0
+    for damage in damage_detector.detect(canvas, roofs):
+        bx1, by1, bx2, by2 = roof_bbox(damage)
+        cx, cy = (bx1 + bx2) / 2, (by1 + by2) / 2
+        cell = next((c for c in cells
+                     if c.x <= cx < c.x + c.crop[2] - c.crop[0] and c.y <= cy < c.y + c.crop[3] - c.crop[1]), None)
+        if cell is None:
+            off_roof += 1
+            continue
+        damages.append(shift_detection(damage, cell.crop[0] - cell.x, cell.crop[1] - cell.y, roof_id=cell.roof.id))
+    return damages, off_roof
+
+
+def detect_damage_on_roofs(
+    damage_detector,
+    image: np.ndarray,
+    roofs: List,
+    config: Optional[DamageCropConfig] = None
+) -> Tuple[List, DamageCropStats]:
+    """
+    Run the damage model on roof crops only.
+
+    Args:
+        damage_detector: Detector with ``detect(image, roofs)``
+        image: HxWx3 image the roofs were detected on
+        roofs: Roof detections in image pixels
+        config: Crop settings (defaults if None)
+
+    Returns:
+        (damages in image pixels, each with its roof's id; stats)
+    """
+    config = config or DamageCropConfig()
+    height, width = image.shape[:2]
+    stats = DamageCropStats(roofs=len(roofs), image_pixels=width * height)
+    by_bucket: Dict[int, List[_Cell]] = {}
+    oversize: List[_Cell] = []
+    for roof in roofs:
+        crop = _crop_box(roof, width, height, config.margin_px)
+        if crop[2] <= crop[0] or crop[3] <= crop[1]:
+            continue
+        cell = _Cell(roof=roof, crop=crop)
+        stats.roof_pixels += (crop[2] - crop[0]) * (crop[3] - crop[1])
+        side = _bucket(max(crop[2] - crop[0], crop[3] - crop[1]), config.buckets)
+        if side is None:
+            oversize.append(cell)
+        else:
+            by_bucket.setdefault(side, []).append(cell)
+
+    damages: List = []
+    for side in sorted(by_bucket):
+        stats.buckets[side] = len(by_bucket[side])
+        for cells in _pack(by_bucket[side], side, config):
+            used_w = max(c.x for c in cells) + side
+            used_h = max(c.y for c in cells) + side
+            found, off_roof = _run_canvas(damage_detector, image, cells, used_w, used_h)
+            damages.extend(found)
+            stats.damages_off_roof += off_roof
+            stats.canvases += 1
+            stats.inferred_pixels += used_w * used_h
+    for cell in oversize:
+        crop_w, crop_h = cell.crop[2] - cell.crop[0], cell.crop[3] - cell.crop[1]
+        found, off_roof = _run_canvas(damage_detector, image, [cell], crop_w, crop_h)
+        damages.extend(found)
+        stats.damages_off_roof += off_roof
+        stats.canvases += 1
+        stats.oversize_roofs += 1
+        stats.inferred_pixels += crop_w * crop_h
+    return damages, stats
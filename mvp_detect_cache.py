@@ -0,0 +1,214 @@
+"""
+Detection result cache.
+Roof and damage detections are stored per chunk, keyed by the models and
+detection settings plus a hash of the chunk's imagery, so re-analyzing a
+zipcode only runs the models on chunks whose pixels or models changed.
+Entries live in one SQLite file; the least recently used ones are evicted
+once the cache exceeds its byte budget.
+"""
+import hashlib
+import pickle
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from loguru import logger
+
+from mvp_onnx import model_digest
+
+# Bumped when chunk detection or the stored payload changes shape
+CACHE_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS detections (
+    key TEXT PRIMARY KEY,
+    data BLOB NOT NULL,
+    length INTEGER NOT NULL,
+    latency_sec REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS detections_last_access ON detections (last_access);
+"""
+
+
+@dataclass
+class DetectCacheConfig:
+    """Settings for the detection cache."""
+    cache_dir: str = str(Path(__file__).parent / "cache" / "detections")
+    max_bytes: int = 256 * 1024 ** 2    # LRU byte budget for stored detections
+
+
+@dataclass
+class DetectCacheStats:
+    """Counters for one cache instance (reported in the run summary)."""
+    hits: int = 0
+    misses: int = 0
+    bytes_read: int = 0
+    bytes_written: int = 0
+    saved_sec: float = 0.0      # Detection time the hits took when they were computed
+    evicted: int = 0
+    evicted_bytes: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+def model_key(model_paths: Iterable[str], **settings: Any) -> str:
+    """
+    Identity of the models and settings detections depend on.
+
+    Args:
+        model_paths: Model files (hashed by content)
+        **settings: Anything else that changes detections (thresholds,
+                    backend, crop settings...)
+
+    Returns:
+        Hex digest
+    """
+    sha = hashlib.sha256(f"v{CACHE_VERSION}".encode())
+    for path in model_paths:
+        sha.update((model_digest(path) if Path(path).exists() else str(path)).encode())
+    for name in sorted(settings):
+        sha.update(f"{name}={settings[name]!r}".encode())
+    return sha.hexdigest()[:32]
+
+
+class DetectionCache:
+    """
+    Per-chunk detections in SQLite.
+
+    Keys are opaque strings built by the caller (model key + chunk content
+    hash); values are any picklable payload. Safe to share between the
+    event loop and worker threads.
+    """
+
+    def __init__(self, config: Optional[DetectCacheConfig] = None):
+        """
+        Open (or create) the cache.
+
+        Args:
+            config: Cache settings (defaults if None)
+        """
+        self.config = config or DetectCacheConfig()
+        self.root = Path(self.config.cache_dir)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.stats = DetectCacheStats()
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(str(self.root / "detections.sqlite"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._touched: Dict[str, float] = {}
+        self._total_bytes = self._db.execute("SELECT COALESCE(SUM(length), 0) FROM detections").fetchone()[0]
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        """
+        Look up a chunk's detections.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            (payload, detection seconds when computed), or None on a miss
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT data, length, latency_sec FROM detections WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.stats.misses += 1
+                return None
+            data, length, latency_sec = row
+            # Access times are written back in batches by flush()
+            self._touched[key] = time.time()
+            self.stats.hits += 1
+            self.stats.bytes_read += length
+            self.stats.saved_sec += latency_sec
+        return pickle.loads(data), latency_sec
+
+    def put(self, key: str, payload: Any, latency_sec: float) -> None:
+        """
+        Store a chunk's detections.
+
+        Args:
+            key: Cache key
+            payload: Detections (picklable)
+            latency_sec: Time the detection took (reported as saved on hits)
+        """
+        data = pickle.dumps(payload, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            old = self._db.execute("SELECT length FROM detections WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO detections (key, data, length, latency_sec, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, sqlite3.Binary(data), len(data), latency_sec, time.time())
+            )
+            self._db.commit()
+            self._total_bytes += len(data) - (old[0] if old else 0)
+            self.stats.bytes_written += len(data)
+            if self._total_bytes > self.config.max_bytes:
+                self.evict()
+
+    def flush(self) -> None:
+        """Write pending access times to the index."""
+        with self._lock:
+            if self._touched:
+                self._db.executemany(
+                    "UPDATE detections SET last_access = ? WHERE key = ?",
+                    [(ts, key) for key, ts in self._touched.items()]
+                )
+                self._touched.clear()
+                self._db.commit()
+
+    def evict(self) -> Tuple[int, int]:
+        """
+        Drop least recently used entries until the cache is 10% under budget
+        (so a full cache is not trimmed again on every put).
+
+        Returns:
+            (entries evicted, bytes evicted)
+        """
+        with self._lock:
+            self.flush()
+            excess = self._total_bytes - int(self.config.max_bytes * 0.9)
+            victims = []
+            if excess > 0:
+                for key, length in self._db.execute(
+                    "SELECT key, length FROM detections ORDER BY last_access"
+                ):
+                    victims.append((key, length))
+                    excess -= length
+                    if excess <= 0:
+                        break
+            self._db.executemany("DELETE FROM detections WHERE key = ?", [(key,) for key, _ in victims])
+            self._db.commit()
+
+            freed = sum(length for _, length in victims)
+            self._total_bytes -= freed
+            self.stats.evicted += len(victims)
+            self.stats.evicted_bytes += freed
+            if victims:
+                logger.info(f"Detection cache evicted {len(victims)} chunks ({freed / 1024 ** 2:.1f} MB), "
+                            f"{self._total_bytes / 1024 ** 2:.1f} MB kept")
+            return len(victims), freed
+
+    @property
+    def total_bytes(self) -> int:
+        """Bytes of detections currently stored."""
+        return self._total_bytes
+
+    def close(self) -> None:
+        with self._lock:
+            self.flush()
+            self._db.close()
+
+    def __enter__(self) -> "DetectionCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
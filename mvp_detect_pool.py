@@ -0,0 +1,664 @@
+"""
+Parallel roof and damage detection.
+Cuts a mosaic into overlapping chunks and fans them out over worker
+processes that each load the roof and damage models once. The mosaic is
+placed in shared memory so workers read their chunks without it being
+pickled, and detections from neighbouring chunks are merged with
+cross-chunk non-maximum suppression.
+"""
+import asyncio
+import dataclasses
+import inspect
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from loguru import logger
+
+from mvp_crops import replace_detection, roof_bbox, shift_detection
+from mvp_damage_crops import DamageCropConfig, DamageCropStats, detect_damage_on_roofs
+from mvp_detect_cache import DetectionCache
+from mvp_mosaic import TileMosaic, read_window, window_digest
+from mvp_trace import stage
+
+# (x0, y0, x1, y1) in mosaic pixels, x1/y1 exclusive
+Window = Tuple[int, int, int, int]
+
+
+@dataclass
+class DetectPoolConfig:
+    """Settings for parallel detection."""
+    workers: int = 0               # Worker processes; 0 = detect in-process, one chunk at a time
+    chunk_px: int = 1280           # Chunk edge fed to the detectors
+    overlap_px: int = 256          # Shared pixels between neighbouring chunks (>= a large roof)
+    batch_size: int = 2            # Chunks per task sent to a worker
+    threads_per_worker: int = 0    # Torch/BLAS threads per worker; 0 = cores / workers
+    nms_overlap: float = 0.5       # Share of the smaller box covered by the other -> same object
+    # Damage model on bucketed roof crops only; None runs it on whole chunks
+    damage_crops: Optional[DamageCropConfig] = field(default_factory=DamageCropConfig)
+    # Identity of the models and thresholds (mvp_detect_cache.model_key); required with a cache
+    model_key: str = ""
+
+
+@dataclass
+class ChunkResult:
+    """Detections of one chunk, in chunk pixel coordinates."""
+    window: Window
+    roofs: List
+    damages: List
+    latency_sec: float
+    damage_stats: Optional[DamageCropStats] = None
+
+
+@dataclass
+class DetectPoolStats:
+    """Counters and chunk latencies of one or more detect() calls."""
+    workers: int = 0
+    batch_size: int = 0
+    images: int = 0
+    chunks: int = 0
+    roofs_raw: int = 0
+    roofs_suppressed: int = 0
+    damages_suppressed: int = 0
+    shared_bytes: int = 0          # Mosaic pixels copied into shared memory
+    tile_bytes_sent: int = 0       # Encoded tiles sent to workers (TileMosaic sources)
+    cache_hits: int = 0            # Chunks answered from the detection cache
+    cache_misses: int = 0
+    cache_saved_sec: float = 0.0   # Detection time the cache hits took when first computed
+    wall_sec: float = 0.0
+    chunk_latencies_sec: List[float] = field(default_factory=list)
+    damage_crops: DamageCropStats = field(default_factory=DamageCropStats)
+
+    def add(self, other: "DetectPoolStats") -> None:
+        """Accumulate another call's stats."""
+        for name in ("images", "chunks", "roofs_raw", "roofs_suppressed", "damages_suppressed",
+                     "shared_bytes", "tile_bytes_sent", "cache_hits", "cache_misses", "cache_saved_sec",
+                     "wall_sec"):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.chunk_latencies_sec.extend(other.chunk_latencies_sec)
+        self.damage_crops.add(other.damage_crops)
+
+    def counts(self) -> Dict[str, int]:
+        """Integer counters for a trace stage."""
+        return {"chunks": self.chunks, "roofs_raw": self.roofs_raw,
+                "roofs_suppressed": self.roofs_suppressed, "damages_suppressed": self.damages_suppressed,
+                "damage_canvases": self.damage_crops.canvases,
+                "damage_pixels": self.damage_crops.inferred_pixels,
+                "cache_hits": self.cache_hits, "cache_misses": self.cache_misses}
+
+    def summary(self) -> Dict:
+        """Counters plus chunk latency percentiles and throughput (for result/trace metadata)."""
+        latencies = sorted(self.chunk_latencies_sec)
+
+        def percentile(p: float) -> float:
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(round(p * (len(latencies) - 1))))]
+
+        summary = {k: v for k, v in dataclasses.asdict(self).items() if k != "chunk_latencies_sec"}
+        summary["damage_crops"]["inferred_ratio"] = round(self.damage_crops.inferred_ratio, 4)
+        lookups = self.cache_hits + self.cache_misses
+        summary.update(
+            cache_hit_rate=round(self.cache_hits / lookups, 4) if lookups else 0.0,
+            cache_saved_sec=round(self.cache_saved_sec, 3),
+            wall_sec=round(self.wall_sec, 3),
+            chunk_ms_p50=round(percentile(0.5) * 1000, 1),
+            chunk_ms_p95=round(percentile(0.95) * 1000, 1),
+            chunk_ms_max=round(percentile(1.0) * 1000, 1),
+            chunks_per_sec=round(self.chunks / self.wall_sec, 2) if self.wall_sec > 0 else 0.0
+        )
+        return summary
+
+
+def box_overlap(a: Tuple[float, float, float, float], b: Tuple[float, float, float, float]) -> float:
+    """
+    Intersection over the smaller box's area.
+
+    A roof cut by a block edge lies inside the whole roof seen by the
+    neighbouring block, so this is close to 1 for such pairs even when
+    their IoU is small.
+    """
+    ix = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    if inter <= 0:
+        return 0.0
+    smaller = min((a[2] - a[0]) * (a[3] - a[1]), (b[2] - b[0]) * (b[3] - b[1]))
+    return inter / smaller if smaller > 0 else 0.0
+
+
+def plan_chunks(width: int, height: int, chunk_px: int, overlap_px: int) -> List[Window]:
+    """
+    Overlapping chunk windows covering an image, row by row.
+
+    The last chunk of a row/column is moved back to end at the image edge,
+    so every chunk has full size when the image is at least one chunk big.
+    """
+    def starts(size: int) -> List[int]:
+        if size <= chunk_px:
+            return [0]
+        step = max(1, chunk_px - overlap_px)
+        positions = list(range(0, size - chunk_px + 1, step))
+        if positions[-1] + chunk_px < size:
+            positions.append(size - chunk_px)
+        return positions
+
+    return [(x0, y0, min(x0 + chunk_px, width), min(y0 + chunk_px, height))
+            for y0 in starts(height) for x0 in starts(width)]
+
+
+def cross_chunk_nms(chunks: List[ChunkResult], overlap: float, cell_px: int = 512) -> Tuple[List, List, int, int]:
+    """
+    Merge per-chunk detections into mosaic coordinates without duplicates.
+
+    Roofs are visited by descending confidence; a roof overlapping an
+    already kept one is suppressed and its damages are moved to the kept
+    roof. When the suppressed roof is larger (the kept one was cut by a
+    chunk edge) the kept roof takes its geometry. Damages are then
+    suppressed per roof the same way.
+
+    Args:
+        chunks: Per-chunk detections
+        overlap: box_overlap at or above which two boxes are the same object
+        cell_px: Grid cell used to find candidate neighbours
+
+    Returns:
+        (roofs, damages, roofs_suppressed, damages_suppressed); roof ids are
+        renumbered 1..n
+    """
+    candidates = []
+    for index, chunk in enumerate(chunks):
+        dx, dy = chunk.window[0], chunk.window[1]
+        for roof in chunk.roofs:
+            candidates.append((index, roof.id, shift_detection(roof, dx, dy)))
+    candidates.sort(key=lambda c: -float(getattr(c[2], 'confidence', 0.0) or 0.0))
+
+    kept: List = []
+    cells: Dict[Tuple[int, int], List[int]] = {}
+    roof_map: Dict[Tuple[int, int], int] = {}
+    roofs_suppressed = 0
+
+    def box_cells(box) -> List[Tuple[int, int]]:
+        return [(cx, cy)
+                for cy in range(int(box[1] // cell_px), int(box[3] // cell_px) + 1)
+                for cx in range(int(box[0] // cell_px), int(box[2] // cell_px) + 1)]
+
+    for index, local_id, roof in candidates:
+        box = roof_bbox(roof)
+        duplicate = next((k for cell in box_cells(box) for k in cells.get(cell, ())
+                          if box_overlap(box, roof_bbox(kept[k])) >= overlap), None)
+        if duplicate is not None:
+            roofs_suppressed += 1
+            roof_map[(index, local_id)] = duplicate
+            if roof.area_pixels > kept[duplicate].area_pixels:
+                kept[duplicate] = replace_detection(roof, confidence=kept[duplicate].confidence)
+                for cell in box_cells(box):
+                    cells.setdefault(cell, []).append(duplicate)
+            continue
+        roof_map[(index, local_id)] = len(kept)
+        kept.append(roof)
+        for cell in box_cells(box):
+            cells.setdefault(cell, []).append(len(kept) - 1)
+
+    roofs = [replace_detection(roof, id=position + 1) for position, roof in enumerate(kept)]
+
+    damage_candidates = []
+    for index, chunk in enumerate(chunks):
+        dx, dy = chunk.window[0], chunk.window[1]
+        for damage in chunk.damages:
+            position = roof_map.get((index, damage.roof_id)) if damage.roof_id is not None else None
+            roof_id = position + 1 if position is not None else None
+            damage_candidates.append(shift_detection(damage, dx, dy, roof_id=roof_id))
+    damage_candidates.sort(key=lambda d: -float(getattr(d, 'confidence', 0.0) or 0.0))
+
+    damages: List = []
+    seen: Dict[int, List[Tuple[float, float, float, float]]] = {}
+    damages_suppressed = 0
+    for damage in damage_candidates:
+        box = roof_bbox(damage)
+        boxes = seen.setdefault(damage.roof_id if damage.roof_id is not None else -1, [])
+        if any(box_overlap(box, other) >= overlap for other in boxes):
+            damages_suppressed += 1
+            continue
+        boxes.append(box)
+        damages.append(damage)
+    return roofs, damages, roofs_suppressed, damages_suppressed
+
+
+async def ensure_detectors(pipeline) -> None:
+    """
+    Initialize the pipeline's components (and detectors) if not done yet.
+
+    Goes through the pipeline's public ``initialize()``, so the pool only
+    relies on that and on the ``roof_detector`` / ``damage_detector``
+    attributes it fills.
+
+    Raises:
+        RuntimeError: If the pipeline has no public initialize()
+    """
+    if getattr(pipeline, 'roof_detector', None) is not None:
+        return
+    initialize = getattr(pipeline, 'initialize', None)
+    if initialize is None:
+        raise RuntimeError(f"{type(pipeline).__name__} has no public initialize(); pooled and "
+                           f"sharded detection need its detectors loaded before the analysis")
+    initialized = initialize()
+    if inspect.isawaitable(initialized):
+        await initialized
+
+
+def load_pipeline_detectors() -> Tuple[object, object]:
+    """
+    Load the MVP pipeline's roof and damage detectors (default worker loader).
+
+    Runs in each worker process, so the models are loaded once per worker.
+    """
+    from mvp_app import bootstrap, get_settings, create_pipeline
+    bootstrap()
+    pipeline = create_pipeline(get_settings())
+    asyncio.run(ensure_detectors(pipeline))
+    return pipeline.roof_detector, pipeline.damage_detector
+
+
+def detect_chunk(
+    detectors: Tuple[object, object],
+    source,
+    window: Window,
+    damage_crops: Optional[DamageCropConfig] = None
+) -> ChunkResult:
+    """
+    Run roof then damage detection on one window of a mosaic.
+
+    With ``damage_crops`` the damage model only sees the chunk's roof
+    crops; otherwise it runs on the whole chunk.
+
+    Args:
+        detectors: (roof_detector, damage_detector)
+        source: HxWx3 array or TileMosaic
+        window: Chunk window in mosaic pixels
+        damage_crops: Roof-crop settings for the damage model
+    """
+    roof_detector, damage_detector = detectors
+    chunk = read_window(source, window)
+    start = time.perf_counter()
+    roofs = roof_detector.detect(chunk)
+    damage_stats = None
+    if damage_crops is not None:
+        damages, damage_stats = detect_damage_on_roofs(damage_detector, chunk, roofs, damage_crops)
+    else:
+        damages = damage_detector.detect(chunk, roofs) if roofs else []
+    return ChunkResult(window=window, roofs=list(roofs), damages=list(damages),
+                       latency_sec=time.perf_counter() - start, damage_stats=damage_stats)
+
+
+# Worker process state: detectors loaded by the initializer, current mosaic
+_worker_detectors: Optional[Tuple[object, object]] = None
+_worker_memory: Optional[shared_memory.SharedMemory] = None
+
+
+def _init_worker(loader: Callable[[], Tuple[object, object]], threads: int) -> None:
+    global _worker_detectors
+    # Set before the loader imports torch / numpy BLAS
+    for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[name] = str(threads)
+    _worker_detectors = loader()
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Open the parent's shared mosaic, reusing the mapping across tasks."""
+    global _worker_memory
+    if _worker_memory is not None and _worker_memory.name.lstrip("/") == name.lstrip("/"):
+        return _worker_memory
+    if _worker_memory is not None:
+        _worker_memory.close()
+    # Spawned workers share the parent's resource tracker, so the parent's
+    # unlink() is the only cleanup needed
+    _worker_memory = shared_memory.SharedMemory(name=name)
+    return _worker_memory
+
+
+def _detect_mosaic_chunks(
+    mosaic,
+    windows: List[Window],
+    damage_crops: Optional[DamageCropConfig]
+) -> List[ChunkResult]:
+    return [detect_chunk(_worker_detectors, mosaic, window, damage_crops) for window in windows]
+
+
+def _ping(hold_sec: float) -> int:
+    # Held briefly so every worker gets one and runs its initializer
+    time.sleep(hold_sec)
+    return os.getpid()
+
+
+def _detect_chunks(
+    name: str,
+    shape: Tuple[int, ...],
+    dtype: str,
+    windows: List[Window],
+    damage_crops: Optional[DamageCropConfig]
+) -> List[ChunkResult]:
+    memory = _attach(name)
+    array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=memory.buf)
+    return [detect_chunk(_worker_detectors, array, window, damage_crops) for window in windows]
+
+
+class DetectionPool:
+    """
+    Chunked roof and damage detection over a pool of model-holding workers.
+
+    Usage:
+        with DetectionPool(config) as pool:
+            roofs, damages, stats = pool.detect(mosaic)
+
+    With ``workers=0`` chunks are detected in-process by ``detectors``
+    (or the loader's detectors), with the same chunking and merge.
+
+    With a ``cache``, chunks whose content was already detected with the
+    same models (``config.model_key``) are answered from it and only the
+    remaining chunks reach the models. The pool closes the cache.
+    """
+
+    def __init__(
+        self,
+        config: Optional[DetectPoolConfig] = None,
+        loader: Callable[[], Tuple[object, object]] = load_pipeline_detectors,
+        detectors: Optional[Tuple[object, object]] = None,
+        cache: Optional[DetectionCache] = None
+    ):
+        self.config = config or DetectPoolConfig()
+        if cache is not None and not self.config.model_key:
+            raise ValueError("A detection cache needs DetectPoolConfig.model_key")
+        self.loader = loader
+        self.detectors = detectors
+        self.cache = cache
+        self.stats = DetectPoolStats(workers=self.config.workers, batch_size=self.config.batch_size)
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def start(self) -> "DetectionPool":
+        """Start the workers and wait until each has loaded its models."""
+        workers = self.config.workers
+        if workers <= 0:
+            if self.detectors is None:
+                self.detectors = self.loader()
+            return self
+        if self._executor is not None:
+            return self
+        threads = self.config.threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+        start = time.perf_counter()
+        # spawn: forking a parent that already holds torch state can deadlock
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.loader, threads)
+        )
+        pids = {f.result() for f in [self._executor.submit(_ping, 0.2) for _ in range(workers)]}
+        logger.info(f"Detection pool ready: {len(pids)} worker(s) x {threads} thread(s) "
+                    f"in {time.perf_counter() - start:.1f}s")
+        return self
+
+    def detect(self, image) -> Tuple[List, List, DetectPoolStats]:
+        """
+        Detect roofs and damages on a whole mosaic.
+
+        Tile mosaics are never materialized: chunks are read one window
+        at a time, and workers get the tiles of their windows. In-memory
+        images are copied into shared memory once for the workers. Cached chunks are not
+        dispatched at all.
+
+        Args:
+            image: RGB mosaic (TileMosaic, PIL image or HxWxC array)
+
+        Returns:
+            (roofs, damages, stats of this call) in mosaic pixel coordinates
+        """
+        self.start()
+        config = self.config
+        start = time.perf_counter()
+        windowed = isinstance(image, TileMosaic)
+        source = image if windowed else np.ascontiguousarray(np.asarray(image))
+        height, width = source.shape[:2]
+        windows = plan_chunks(width, height, config.chunk_px, config.overlap_px)
+        stats = DetectPoolStats(workers=config.workers, batch_size=config.batch_size, images=1,
+                                chunks=len(windows))
+
+        cached, keys = self._cached_chunks(source, windows, stats)
+        pending = [window for window in windows if window not in keys or keys[window] not in cached]
+        if not pending:
+            detected = []
+        elif self._executor is None:
+            detected = [detect_chunk(self.detectors, source, window, config.damage_crops) for window in pending]
+        elif windowed:
+            detected, stats.tile_bytes_sent = self._detect_windowed(source, pending)
+        else:
+            detected = self._detect_shared(source, pending)
+            stats.shared_bytes = source.nbytes
+        self._store_chunks(detected, keys)
+        chunks = detected + [dataclasses.replace(cached[keys[window]], window=window)
+                             for window in windows if window not in pending]
+        chunks.sort(key=lambda c: (c.window[1], c.window[0]))
+
+        stats.roofs_raw = sum(len(c.roofs) for c in chunks)
+        # Latencies of chunks that actually ran (cached ones are in cache_saved_sec)
+        stats.chunk_latencies_sec = [c.latency_sec for c in detected]
+        for chunk in chunks:
+            if chunk.damage_stats is not None:
+                stats.damage_crops.add(chunk.damage_stats)
+        # Compare with one damage pass over the mosaic, not the sum of overlapping chunks
+        stats.damage_crops.image_pixels = width * height
+        roofs, damages, stats.roofs_suppressed, stats.damages_suppressed = cross_chunk_nms(chunks, config.nms_overlap)
+        stats.wall_sec = time.perf_counter() - start
+        self.stats.add(stats)
+        damage_share = (f", damage model on {stats.damage_crops.inferred_ratio:.1%} of the pixels"
+                        if config.damage_crops is not None else "")
+        cache_share = (f", {stats.cache_hits} cached, {stats.cache_saved_sec:.1f}s saved"
+                       if self.cache is not None else "")
+        logger.info(f"Detected {len(roofs)} roofs, {len(damages)} damages in {len(windows)} chunks "
+                    f"({stats.roofs_suppressed} cross-chunk duplicates{damage_share}{cache_share}) "
+                    f"in {stats.wall_sec:.1f}s")
+        return roofs, damages, stats
+
+    def _cached_chunks(
+        self,
+        source,
+        windows: List[Window],
+        stats: DetectPoolStats
+    ) -> Tuple[Dict[str, ChunkResult], Dict[Window, str]]:
+        """Look every window up in the cache; returns (hits by key, key per window)."""
+        if self.cache is None:
+            return {}, {}
+        keys = {window: f"{self.config.model_key}:{window_digest(source, window)}" for window in windows}
+        cached: Dict[str, ChunkResult] = {}
+        for window, key in keys.items():
+            if key in cached:
+                # Same content twice in one mosaic (e.g. blank chunks): one lookup
+                stats.cache_hits += 1
+                continue
+            hit = self.cache.get(key)
+            if hit is None:
+                stats.cache_misses += 1
+                continue
+            (roofs, damages, damage_stats), latency_sec = hit
+            cached[key] = ChunkResult(window=window, roofs=roofs, damages=damages, latency_sec=latency_sec,
+                                      damage_stats=damage_stats)
+            stats.cache_hits += 1
+            stats.cache_saved_sec += latency_sec
+        return cached, keys
+
+    def _store_chunks(self, chunks: List[ChunkResult], keys: Dict[Window, str]) -> None:
+        if self.cache is None:
+            return
+        for chunk in chunks:
+            self.cache.put(keys[chunk.window], (chunk.roofs, chunk.damages, chunk.damage_stats), chunk.latency_sec)
+
+    def _detect_windowed(self, mosaic, windows: List[Window]) -> Tuple[List[ChunkResult], int]:
+        size = max(1, self.config.batch_size)
+        futures, sent = [], 0
+        for i in range(0, len(windows), size):
+            batch = windows[i:i + size]
+            # Only the tiles this batch reads travel to the worker
+            part = mosaic.subset(batch) if isinstance(mosaic, TileMosaic) else mosaic
+            sent += part.encoded_bytes if isinstance(part, TileMosaic) else 0
+            futures.append(self._executor.submit(_detect_mosaic_chunks, part, batch, self.config.damage_crops))
+        chunks: List[ChunkResult] = []
+        for future in as_completed(futures):
+            chunks.extend(future.result())
+        return chunks, sent
+
+    def _detect_shared(self, array: np.ndarray, windows: List[Window]) -> List[ChunkResult]:
+        memory = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+        try:
+            np.ndarray(array.shape, dtype=array.dtype, buffer=memory.buf)[...] = array
+            size = max(1, self.config.batch_size)
+            futures = [self._executor.submit(_detect_chunks, memory.name, array.shape, array.dtype.str,
+                                             windows[i:i + size], self.config.damage_crops)
+                       for i in range(0, len(windows), size)]
+            chunks: List[ChunkResult] = []
+            for future in as_completed(futures):
+                chunks.extend(future.result())
+            return chunks
+        finally:
+            memory.close()
+            memory.unlink()
+
+    def close(self) -> None:
+        """Stop the workers and close the cache."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        if self.cache is not None:
+            self.cache.close()
+            self.cache = None
+
+    def __enter__(self) -> "DetectionPool":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+def image_key(image) -> str:
+    """Content hash identifying an image passed to the pooled detectors."""
+    source = image if isinstance(image, TileMosaic) else np.asarray(image)
+    height, width = source.shape[:2]
+    return window_digest(source, (0, 0, width, height))
+
+
+def roofs_key(roofs: List) -> Tuple:
+    """Ids and boxes of a roof list; equal for copies of the same detections."""
+    return tuple((getattr(roof, 'id', None), roof_bbox(roof)) for roof in roofs)
+
+
+@dataclass
+class PooledDetections:
+    """Damages detected by the pool, keyed by the image and roofs they belong to."""
+    image_key: str
+    roofs_key: Tuple
+    damages: List
+
+
+class PooledRoofDetector:
+    """
+    Stands in for ``pipeline.roof_detector`` so the pipeline's own analysis
+    detects through a DetectionPool.
+
+    Roofs and damages are detected together in the pool; the damages are
+    handed to PooledDamageDetector when the pipeline asks for the damages
+    of the same image and the same roofs (compared by content, not object
+    identity). Other attributes go to the original detector.
+    """
+
+    def __init__(self, pool: DetectionPool, original):
+        self.pool = pool
+        self.original = original
+        self.last: Optional[PooledDetections] = None
+        self.calls = 0
+
+    def detect(self, image, *args, **kwargs) -> List:
+        self.calls += 1
+        with stage("detect.pool") as s:
+            roofs, damages, stats = self.pool.detect(image)
+            s.count(**stats.counts())
+            s.details.update(stats.summary())
+        self.last = PooledDetections(image_key(image), roofs_key(roofs), damages)
+        return roofs
+
+    def __getattr__(self, name):
+        return getattr(self.original, name)
+
+
+class PooledDamageDetector:
+    """Returns the pool's damages for the pool's roofs; anything else goes to the original detector."""
+
+    def __init__(self, roof_detector: PooledRoofDetector, original):
+        self.roof_detector = roof_detector
+        self.original = original
+        self.fallbacks = 0
+
+    def detect(self, image, roofs, *args, **kwargs) -> List:
+        last = self.roof_detector.last
+        if last is not None and last.roofs_key == roofs_key(roofs) and last.image_key == image_key(image):
+            return list(last.damages)
+        self.fallbacks += 1
+        return self.original.detect(image, roofs, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.original, name)
+
+
+def install_pooled_detectors(pipeline, pool: DetectionPool) -> None:
+    """
+    Route an initialized pipeline's detection through a pool.
+
+    Args:
+        pipeline: RoofDamagePipeline whose detectors are loaded
+        pool: Started DetectionPool
+    """
+    if isinstance(pipeline.roof_detector, PooledRoofDetector):
+        return
+    roof_detector = PooledRoofDetector(pool, pipeline.roof_detector)
+    pipeline.damage_detector = PooledDamageDetector(roof_detector, pipeline.damage_detector)
+    pipeline.roof_detector = roof_detector
+
+
+def check_pooled_run(pipeline, pool: DetectionPool) -> bool:
+    """
+    Whether a pipeline run was actually detected by the pool.
+
+    install_pooled_detectors only reaches detection that goes through the
+    pipeline's ``roof_detector`` / ``damage_detector`` attributes. If the
+    pipeline replaced them or detected some other way, the run used its own
+    models while the workers sat idle; that is logged as a warning rather
+    than passed over.
+
+    Args:
+        pipeline: Pipeline the pooled detectors were installed on
+        pool: The pool they route to
+
+    Returns:
+        True when the pool served the roof detection (and every damage request)
+    """
+    roof_detector = getattr(pipeline, 'roof_detector', None)
+    damage_detector = getattr(pipeline, 'damage_detector', None)
+    if not isinstance(roof_detector, PooledRoofDetector) or roof_detector.calls == 0 or pool.stats.chunks == 0:
+        logger.warning(f"Detection pool served no chunks: {type(pipeline).__name__} detected without "
+                       f"its roof_detector attribute, so {pool.config.workers} worker(s) sat idle. "
+                       f"Run with --detect-workers 0 for this pipeline.")
+        return False
+    if not isinstance(damage_detector, PooledDamageDetector) or damage_detector.fallbacks:
+        fallbacks = damage_detector.fallbacks if isinstance(damage_detector, PooledDamageDetector) else "all"
+        logger.warning(f"Detection pool found the roofs, but {fallbacks} damage detection(s) ran on the "
+                       f"pipeline's own model (different image or roofs than the pool saw)")
+        return False
+    return True
@@ -0,0 +1,370 @@
+"""
+Asyncio email dispatch stage.
+Queues built messages and sends them concurrently through an SMTPTransport,
+with a token-bucket rate limit, retries on transient SMTP errors and a
+dead-letter file for messages that cannot be delivered or that would wait
+too long for the rate limit.
+"""
+import asyncio
+import json
+import os
+import random
+import smtplib
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from email.message import Message
+from pathlib import Path
+from typing import Any, AsyncIterable, Callable, Dict, Iterable, Iterator, List, Optional, Union
+from loguru import logger
+
+try:
+    import fcntl
+except ImportError:  # Windows: the rate limit state is not locked across processes
+    fcntl = None
+
+from mvp_smtp import SMTPTransport, CONNECTION_ERRORS, smtp_error_code
+
+
+@dataclass
+class DispatchConfig:
+    """Settings for the dispatch stage."""
+    concurrency: int = 2
+    queue_size: int = 100
+    rate_per_sec: Optional[float] = None  # None = no rate limit
+    burst: int = 10
+    rate_state_path: Optional[str] = None  # Keeps the rate limit's tokens across dispatchers and runs
+    rate_max_wait_sec: Optional[float] = None  # Longer waits dead-letter the message instead; None = wait
+    max_retries: int = 4
+    backoff_base_sec: float = 1.0
+    backoff_max_sec: float = 60.0
+    dead_letter_path: Optional[str] = None
+
+
+@dataclass
+class OutgoingEmail:
+    """A message plus context kept for logging and the dead-letter file."""
+    msg: Message
+    context: Dict[str, Any] = field(default_factory=dict)
+    attempts: int = 0
+
+
+@dataclass
+class DispatchStats:
+    """Outcome of dispatching a batch of emails."""
+    sent: int = 0
+    failed: int = 0
+    retries: int = 0
+    dead_lettered: int = 0
+    quota_exhausted: int = 0
+    rate_limited_sec: float = 0.0
+    elapsed_sec: float = 0.0
+    failures: List[Dict[str, Any]] = field(default_factory=list)
+
+    @property
+    def total(self) -> int:
+        return self.sent + self.failed
+
+    @property
+    def messages_per_sec(self) -> float:
+        return self.total / self.elapsed_sec if self.elapsed_sec > 0 else 0.0
+
+
+class QuotaExhausted(Exception):
+    """The rate limit has no token for longer than the caller will wait."""
+
+    def __init__(self, retry_after_sec: float):
+        super().__init__(f"Email quota exhausted; next send allowed in {retry_after_sec:.0f}s")
+        self.retry_after_sec = retry_after_sec
+
+
+class TokenBucket:
+    """
+    Async token bucket: ``rate`` tokens per second, up to ``capacity`` stored.
+
+    With a ``state_path`` the level is kept in a small JSON file, read
+    before and written after every take under an exclusive lock on a
+    sidecar ``.lock`` file, so a quota such as 100/day holds across
+    dispatchers, runs and concurrent processes instead of each starting
+    with a full bucket.
+    """
+
+    def __init__(self, rate: float, capacity: int, state_path: Optional[str] = None):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self.state_path = Path(state_path) if state_path else None
+        self._tokens = float(self.capacity)
+        # Wall clock, so a persisted level refills correctly in a later process
+        self._updated = time.time()
+        self._lock = asyncio.Lock()
+
+    def _load(self) -> None:
+        """Take over the persisted level (a missing file means a full bucket)."""
+        if self.state_path is None or not self.state_path.exists():
+            return
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            self._tokens = min(float(self.capacity), float(state["tokens"]))
+            self._updated = float(state["updated"])
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable rate limit state {self.state_path}: {e}")
+
+    @contextmanager
+    def _state_lock(self) -> Iterator[None]:
+        """Hold the persisted level for one read-modify-write (no-op without a state file)."""
+        if self.state_path is None or fcntl is None:
+            yield
+            return
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        lock_path = self.state_path.with_name(f".{self.state_path.name}.lock")
+        with open(lock_path, 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _take(self) -> float:
+        """
+        Take one token if one is available.
+
+        Returns:
+            0.0 when a token was taken, else seconds until the next one
+        """
+        with self._state_lock():
+            self._load()
+            now = time.time()
+            self._tokens = min(self.capacity, self._tokens + max(0.0, now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                self._save()
+                return 0.0
+            return (1.0 - self._tokens) / self.rate
+
+    def _save(self) -> None:
+        """Write the level via a temp file and rename."""
+        if self.state_path is None:
+            return
+        self.state_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_path.with_name(f".{self.state_path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"tokens": self._tokens, "updated": self._updated,
+                       "rate_per_sec": self.rate, "capacity": self.capacity}, f)
+        os.replace(tmp_path, self.state_path)
+
+    async def acquire(self, max_wait: Optional[float] = None) -> float:
+        """
+        Wait for one token.
+
+        Args:
+            max_wait: Longest total wait in seconds; None waits as long as
+                      the rate requires
+
+        Returns:
+            Seconds spent waiting
+
+        Raises:
+            QuotaExhausted: The next token is further away than max_wait
+                            allows (raised without sleeping)
+        """
+        start = time.monotonic()
+        while True:
+            async with self._lock:
+                delay = self._take()
+            waited = time.monotonic() - start
+            if delay <= 0.0:
+                return waited
+            if max_wait is not None and waited + delay > max_wait:
+                raise QuotaExhausted(delay)
+            await asyncio.sleep(delay)
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """
+    Decide whether a send failure is worth retrying.
+
+    4xx replies (greylisting, rate limits, mailbox busy) and dropped
+    connections are transient; 5xx replies such as bad credentials or
+    unknown recipients are permanent.
+    """
+    code = smtp_error_code(error)
+    if code is not None:
+        return 400 <= code < 500
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(error, smtplib.SMTPException):
+        return False
+    return isinstance(error, CONNECTION_ERRORS)
+
+
+class EmailDispatcher:
+    """Sends queued emails with bounded concurrency, rate limiting and retries."""
+
+    def __init__(
+        self,
+        transport: SMTPTransport,
+        config: Optional[DispatchConfig] = None,
+        bucket: Optional[TokenBucket] = None
+    ):
+        """
+        Initialize dispatcher.
+
+        Args:
+            transport: Pooled SMTP transport used for sending
+            config: Dispatch settings (defaults if None)
+            bucket: Rate limit shared with other dispatchers; when None one
+                    is made from the config's rate settings
+        """
+        self.transport = transport
+        self.config = config or DispatchConfig()
+        self._bucket = bucket
+        if self._bucket is None and self.config.rate_per_sec:
+            self._bucket = TokenBucket(self.config.rate_per_sec, self.config.burst, self.config.rate_state_path)
+
+    def _backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter for the given attempt number."""
+        ceiling = min(self.config.backoff_max_sec, self.config.backoff_base_sec * (2 ** (attempt - 1)))
+        return random.uniform(0, ceiling)
+
+    def _dead_letter(self, item: OutgoingEmail, error: BaseException, status: str = "failed") -> None:
+        """Append an unsent message to the dead-letter file with its status ("failed" or "quota_exhausted")."""
+        if not self.config.dead_letter_path:
+            return
+        record = {
+            "timestamp": time.time(),
+            "status": status,
+            "to": item.msg['To'],
+            "subject": item.msg['Subject'],
+            "attempts": item.attempts,
+            "smtp_code": smtp_error_code(error),
+            "error": str(error),
+            "context": item.context,
+        }
+        path = Path(self.config.dead_letter_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, default=str) + "\n")
+
+    async def _deliver(
+        self,
+        item: OutgoingEmail,
+        stats: DispatchStats,
+        on_sent: Optional[Callable[[OutgoingEmail], None]] = None
+    ) -> None:
+        """Send one message, retrying transient failures."""
+        while True:
+            if self._bucket is not None:
+                try:
+                    stats.rate_limited_sec += await self._bucket.acquire(self.config.rate_max_wait_sec)
+                except QuotaExhausted as e:
+                    logger.error(f"Not sending to {item.msg['To']}: {e}")
+                    stats.failed += 1
+                    stats.quota_exhausted += 1
+                    stats.failures.append({
+                        "to": item.msg['To'],
+                        "smtp_code": None,
+                        "error": str(e),
+                        "status": "quota_exhausted",
+                        **item.context,
+                    })
+                    if self.config.dead_letter_path:
+                        self._dead_letter(item, e, status="quota_exhausted")
+                        stats.dead_lettered += 1
+                    return
+
+            item.attempts += 1
+            try:
+                await asyncio.to_thread(self.transport.send, item.msg)
+            except Exception as e:
+                if is_transient_error(e) and item.attempts <= self.config.max_retries:
+                    delay = self._backoff(item.attempts)
+                    stats.retries += 1
+                    logger.warning(
+                        f"Transient error sending to {item.msg['To']} "
+                        f"(attempt {item.attempts}): {e}; retrying in {delay:.1f}s"
+                    )
+                    await asyncio.sleep(delay)
+                    continue
+
+                logger.error(f"Failed to send email to {item.msg['To']}: {e}")
+                stats.failed += 1
+                stats.failures.append({
+                    "to": item.msg['To'],
+                    "smtp_code": smtp_error_code(e),
+                    "error": str(e),
+                    "status": "failed",
+                    **item.context,
+                })
+                if self.config.dead_letter_path:
+                    self._dead_letter(item, e)
+                    stats.dead_lettered += 1
+                return
+
+            stats.sent += 1
+            logger.info(f"Email sent successfully to {item.msg['To']}")
+            if on_sent is not None:
+                on_sent(item)
+            return
+
+    async def dispatch(
+        self,
+        emails: Union[Iterable[OutgoingEmail], AsyncIterable[OutgoingEmail]],
+        on_sent: Optional[Callable[[OutgoingEmail], None]] = None
+    ) -> DispatchStats:
+        """
+        Send every email and wait for the queue to drain.
+
+        Args:
+            emails: Messages to send, consumed lazily into a bounded queue;
+                    an async iterable is read while earlier messages send,
+                    so its producer only runs as far ahead as the queue
+            on_sent: Called with each message right after it was accepted,
+                     e.g. to record progress that survives a crash
+
+        Returns:
+            DispatchStats for the batch
+        """
+        stats = DispatchStats()
+        start = time.perf_counter()
+        email_queue: "asyncio.Queue[Optional[OutgoingEmail]]" = asyncio.Queue(
+            maxsize=self.config.queue_size
+        )
+
+        async def worker() -> None:
+            while True:
+                item = await email_queue.get()
+                try:
+                    if item is None:
+                        return
+                    await self._deliver(item, stats, on_sent)
+                finally:
+                    email_queue.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(max(1, self.config.concurrency))]
+        try:
+            if isinstance(emails, AsyncIterable):
+                async for item in emails:
+                    await email_queue.put(item)
+            else:
+                for item in emails:
+                    await email_queue.put(item)
+            for _ in workers:
+                await email_queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+
+        stats.elapsed_sec = time.perf_counter() - start
+        logger.info(
+            f"Dispatched {stats.total} emails in {stats.elapsed_sec:.1f}s: "
+            f"{stats.sent} sent, {stats.failed} failed, {stats.retries} retries"
+        )
+        if stats.quota_exhausted:
+            logger.warning(
+                f"{stats.quota_exhausted} email(s) not sent: quota exhausted "
+                f"(waits over {self.config.rate_max_wait_sec:.0f}s are not taken)"
+            )
+        return stats
@@ -2,33 +2,211 @@
 Email service for sending damage reports.
 Uses SMTP with email login credentials.
 """
-import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.image import MIMEImage
 from email.mime.base import MIMEBase
 from email import encoders
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Dict, List, Optional
+import html
 import os
+import re
 from loguru import logger
 
-from src.output.json_generator import AnalysisResult
 from mvp_costs import RepairCosts
+from mvp_smtp import SMTPTransport
+from mvp_crops import RoofCrop
 
+if TYPE_CHECKING:
+    from src.output.json_generator import AnalysisResult
 
-def send_damage_report_email(
+# Email credentials (hardcoded for testing)
+# NOTE: Gmail requires App Password, not regular password
+SMTP_SERVER = "smtp.gmail.com"
+SMTP_PORT = 587
+EMAIL_USER = "aaliyanahmedrajput@gmail.com"
+# Gmail App Password (16 characters, spaces removed)
+EMAIL_PASSWORD = "kdqwrsjwquvqlkjw"
+
+# Default recipient
+DEFAULT_RECIPIENT = "aliyannew16@gmail.com"
+
+# HTML report template and the placeholders it contains
+TEMPLATE_PATH = Path(__file__).parent / "email_template.html"
+TEMPLATE_PLACEHOLDERS = (
+    "zipcode",
+    "total_roofs",
+    "roofs_with_damage",
+    "total_damages",
+    "damage_area_sqft",
+    "total_cost",
+    "labor_cost",
+    "material_cost",
+    "cost_per_sqft",
+    "damage_breakdown_rows",
+    "severity_cards",
+    "roof_info_section",
+)
+
+
+class CompiledTemplate:
+    """
+    HTML template pre-split on its placeholders.
+    
+    Only the known ``{name}`` placeholders are substituted, so CSS braces in
+    the template are left alone, and rendering is a single join instead of
+    one full-string replace per placeholder.
+    """
+    
+    def __init__(self, source: str, placeholders=TEMPLATE_PLACEHOLDERS):
+        pattern = re.compile(r"\{(" + "|".join(re.escape(p) for p in placeholders) + r")\}")
+        parts = pattern.split(source)
+        # split() alternates literal text and captured placeholder names
+        self._literals = parts[0::2]
+        self._names = parts[1::2]
+    
+    def render(self, values: Dict[str, str]) -> str:
+        """
+        Render the template.
+        
+        Args:
+            values: Text for every placeholder name
+            
+        Returns:
+            Rendered HTML
+        """
+        out = [self._literals[0]]
+        for name, literal in zip(self._names, self._literals[1:]):
+            out.append(values[name])
+            out.append(literal)
+        return "".join(out)
+
+
+@lru_cache(maxsize=None)
+def load_template(template_path: str = str(TEMPLATE_PATH)) -> CompiledTemplate:
+    """
+    Read and compile the email template once per process.
+    
+    Args:
+        template_path: Path to the HTML template
+        
+    Returns:
+        CompiledTemplate
+    """
+    path = Path(template_path)
+    if path.exists():
+        with open(path, 'r', encoding='utf-8') as f:
+            return CompiledTemplate(f.read())
+    logger.warning("Template not found, using fallback")
+    return CompiledTemplate("<html><body><h1>Report</h1></body></html>")
+
+
+def build_report_attachments(
+    annotated_image_path: Optional[str] = None,
+    heatmap_path: Optional[str] = None,
+    json_file_path: Optional[str] = None
+) -> List[MIMEBase]:
+    """
+    Read and base64-encode report attachments once.
+    
+    The returned parts can be attached to every message of a zipcode;
+    they are already encoded, so sending does not re-encode them.
+    
+    Args:
+        annotated_image_path: Path to annotated image
+        heatmap_path: Path to heatmap
+        json_file_path: Path to JSON result
+        
+    Returns:
+        List of MIME parts for the files that exist
+    """
+    parts: List[MIMEBase] = []
+    
+    # Attach images if available
+    if annotated_image_path and Path(annotated_image_path).exists():
+        with open(annotated_image_path, 'rb') as f:
+            img = MIMEImage(f.read())
+            img.add_header('Content-Disposition', 'attachment', filename='annotated_detection.png')
+            parts.append(img)
+    
+    if heatmap_path and Path(heatmap_path).exists():
+        with open(heatmap_path, 'rb') as f:
+            img = MIMEImage(f.read())
+            img.add_header('Content-Disposition', 'attachment', filename='damage_heatmap.png')
+            parts.append(img)
+    
+    # Attach JSON file if available
+    if json_file_path and Path(json_file_path).exists():
+        with open(json_file_path, 'rb') as f:
+            part = MIMEBase('application', 'json')
+            part.set_payload(f.read())
+            encoders.encode_base64(part)
+            part.add_header('Content-Disposition', 'attachment', filename=Path(json_file_path).name)
+            parts.append(part)
+    
+    return parts
+
+
+def build_crop_attachments(crop: Optional[RoofCrop]) -> List[MIMEBase]:
+    """
+    Wrap a roof's encoded crops as MIME image parts.
+    
+    Args:
+        crop: Crops from mvp_crops.render_roof_crops (None for no images)
+        
+    Returns:
+        List of MIME parts for the crops that were rendered
+    """
+    parts: List[MIMEBase] = []
+    if crop is None:
+        return parts
+    
+    for data, name in ((crop.annotated, 'annotated'), (crop.heatmap, 'heatmap')):
+        if data:
+            img = MIMEImage(data, _subtype=crop.mime_subtype)
+            img.add_header('Content-Disposition', 'attachment',
+                           filename=f'roof_{crop.roof_id}_{name}.{crop.extension}')
+            parts.append(img)
+    
+    return parts
+
+
+def create_smtp_transport(pool_size: int = 2) -> SMTPTransport:
+    """
+    Create a pooled SMTP transport using the configured credentials.
+    
+    Args:
+        pool_size: Number of authenticated connections to keep open
+        
+    Returns:
+        SMTPTransport (use as a context manager to close connections)
+    """
+    return SMTPTransport(
+        host=SMTP_SERVER,
+        port=SMTP_PORT,
+        username=EMAIL_USER,
+        password=EMAIL_PASSWORD,
+        use_tls=True,
+        pool_size=pool_size
+    )
+
+
+def build_damage_report_message(
     recipient_email: str,
     zipcode: str,
-    result: AnalysisResult,
+    result: "AnalysisResult",
     costs: RepairCosts,
     annotated_image_path: Optional[str] = None,
     heatmap_path: Optional[str] = None,
     roof_info: str = "",
-    json_file_path: Optional[str] = None
-) -> bool:
+    json_file_path: Optional[str] = None,
+    attachments: Optional[List[MIMEBase]] = None,
+    property_address: Optional[str] = None
+) -> MIMEMultipart:
     """
-    Send damage report email with costs and images.
+    Build damage report email with costs and images.
     
     Args:
         recipient_email: Email address to send to
@@ -37,162 +215,183 @@ def send_damage_report_email(
         costs: Repair costs
         annotated_image_path: Path to annotated image
         heatmap_path: Path to heatmap
+        attachments: Pre-encoded parts from build_report_attachments; when
+                     given, the path arguments are not read
+        property_address: Street address of the roof (from mvp_lookup), shown
+                          in the subject and the report
         
     Returns:
-        True if email sent successfully, False otherwise
+        Message ready to hand to an SMTPTransport
     """
-    # Email credentials (hardcoded for testing)
-    # NOTE: Gmail requires App Password, not regular password
-    smtp_server = "smtp.gmail.com"
-    smtp_port = 587
-    email_user = "aaliyanahmedrajput@gmail.com"
-    # Gmail App Password (16 characters, spaces removed)
-    email_password = "kdqwrsjwquvqlkjw"
-    
     # Default recipient
     if not recipient_email:
-        recipient_email = "aliyannew16@gmail.com"
+        recipient_email = DEFAULT_RECIPIENT
     
-    try:
-        # Create message
-        msg = MIMEMultipart('related')
-        msg['From'] = email_user
-        msg['To'] = recipient_email
+    # Create message
+    msg = MIMEMultipart('related')
+    msg['From'] = EMAIL_USER
+    msg['To'] = recipient_email
+    if property_address:
+        msg['Subject'] = f"🏠 Roof Damage Report - {property_address}"
+    else:
         msg['Subject'] = f"🏠 Roof Damage Report - Zipcode {zipcode}"
-        
-        # Load email template
-        template_path = Path(__file__).parent / "email_template.html"
-        if template_path.exists():
-            with open(template_path, 'r', encoding='utf-8') as f:
-                html_template = f.read()
-        else:
-            logger.warning("Template not found, using fallback")
-            html_template = "<html><body><h1>Report</h1></body></html>"
-        
-        # Prepare data for template
-        total_damages = len(result.damages)
-        damage_area_sqft = f"{costs.damage_area_sqft:.2f}"
-        
-        # Build damage breakdown rows
-        damage_breakdown_rows = ""
-        if costs.breakdown_by_type:
-            for damage_type, cost in costs.breakdown_by_type.items():
-                damage_name = damage_type.replace('_', ' ').title()
-                damage_breakdown_rows += f"""
-                <tr>
-                    <td><strong>{damage_name}</strong></td>
-                    <td style="color: #667eea; font-weight: 600;">${cost:,.2f}</td>
-                </tr>
-                """
-        else:
-            damage_breakdown_rows = "<tr><td colspan='2' style='text-align: center; color: #999;'>No damage breakdown available</td></tr>"
-        
-        # Build severity cards
-        severity_cards = ""
-        severity_classes = {
-            'critical': 'severity-critical',
-            'high': 'severity-high',
-            'medium': 'severity-medium',
-            'low': 'severity-low'
-        }
-        
-        for severity, count in result.damage_summary.items():
-            if count > 0:
-                severity_class = severity_classes.get(severity, 'severity-low')
-                severity_cards += f"""
-                <div class="stat-card">
-                    <div class="stat-value">{count}</div>
-                    <div class="stat-label">
-                        <span class="severity-badge {severity_class}">{severity}</span>
-                    </div>
+    
+    # Prepare data for template
+    total_damages = len(result.damages)
+    damage_area_sqft = f"{costs.damage_area_sqft:.2f}"
+    
+    # Build damage breakdown rows
+    damage_breakdown_rows = ""
+    if costs.breakdown_by_type:
+        for damage_type, cost in costs.breakdown_by_type.items():
+            damage_name = damage_type.replace('_', ' ').title()
+            damage_breakdown_rows += f"""
+            <tr>
+                <td><strong>{damage_name}</strong></td>
+                <td style="color: #667eea; font-weight: 600;">${cost:,.2f}</td>
+            </tr>
+            """
+    else:
+        damage_breakdown_rows = "<tr><td colspan='2' style='text-align: center; color: #999;'>No damage breakdown available</td></tr>"
+    
+    # Build severity cards
+    severity_cards = ""
+    severity_classes = {
+        'critical': 'severity-critical',
+        'high': 'severity-high',
+        'medium': 'severity-medium',
+        'low': 'severity-low'
+    }
+    
+    for severity, count in result.damage_summary.items():
+        if count > 0:
+            severity_class = severity_classes.get(severity, 'severity-low')
+            severity_cards += f"""
+            <div class="stat-card">
+                <div class="stat-value">{count}</div>
+                <div class="stat-label">
+                    <span class="severity-badge {severity_class}">{severity}</span>
                 </div>
-                """
-        
-        if not severity_cards:
-            severity_cards = '<div class="stat-card"><div class="stat-value">0</div><div class="stat-label">No Damage Detected</div></div>'
-        
-        # Build roof info section
-        roof_info_section = ""
-        if roof_info and result.roofs:
-            first_roof = result.roofs[0]
-            roof_info_section = f"""
-                <div class="divider"></div>
-                <div class="section">
-                    <h2 class="section-title">🏛️ First Roof Detection Details</h2>
-                    <div class="roof-info-card">
-                        <h4>Roof #{first_roof.id}</h4>
-                        <div class="roof-info-grid">
-                            <div class="info-item">
-                                <div class="info-label">Confidence</div>
-                                <div class="info-value">{first_roof.confidence:.1%}</div>
-                            </div>
-                            <div class="info-item">
-                                <div class="info-label">Area (Pixels)</div>
-                                <div class="info-value">{first_roof.area_pixels:,}</div>
-                            </div>
-                            <div class="info-item">
-                                <div class="info-label">Center X</div>
-                                <div class="info-value">{first_roof.center[0]:.1f}</div>
-                            </div>
-                            <div class="info-item">
-                                <div class="info-label">Center Y</div>
-                                <div class="info-value">{first_roof.center[1]:.1f}</div>
-                            </div>
+            </div>
+            """
+    
+    if not severity_cards:
+        severity_cards = '<div class="stat-card"><div class="stat-value">0</div><div class="stat-label">No Damage Detected</div></div>'
+    
+    # Build roof info section
+    roof_info_section = ""
+    if roof_info and result.roofs:
+        first_roof = result.roofs[0]
+        roof_info_section = f"""
+            <div class="divider"></div>
+            <div class="section">
+                <h2 class="section-title">🏛️ First Roof Detection Details</h2>
+                <div class="roof-info-card">
+                    <h4>Roof #{first_roof.id}</h4>
+                    <div class="roof-info-grid">
+                        <div class="info-item">
+                            <div class="info-label">Confidence</div>
+                            <div class="info-value">{first_roof.confidence:.1%}</div>
+                        </div>
+                        <div class="info-item">
+                            <div class="info-label">Area (Pixels)</div>
+                            <div class="info-value">{first_roof.area_pixels:,}</div>
+                        </div>
+                        <div class="info-item">
+                            <div class="info-label">Center X</div>
+                            <div class="info-value">{first_roof.center[0]:.1f}</div>
+                        </div>
+                        <div class="info-item">
+                            <div class="info-label">Center Y</div>
+                            <div class="info-value">{first_roof.center[1]:.1f}</div>
                         </div>
                     </div>
                 </div>
-            """
-        
-        # Replace template placeholders
-        html_body = html_template.replace('{zipcode}', str(zipcode))
-        html_body = html_body.replace('{total_roofs}', str(result.total_roofs))
-        html_body = html_body.replace('{roofs_with_damage}', str(result.roofs_with_damage))
-        html_body = html_body.replace('{total_damages}', str(total_damages))
-        html_body = html_body.replace('{damage_area_sqft}', damage_area_sqft)
-        html_body = html_body.replace('{total_cost}', f"{costs.total_cost:,.2f}")
-        html_body = html_body.replace('{labor_cost}', f"{costs.labor_cost:,.2f}")
-        html_body = html_body.replace('{material_cost}', f"{costs.material_cost:,.2f}")
-        html_body = html_body.replace('{cost_per_sqft}', f"{costs.cost_per_sqft:.2f}")
-        html_body = html_body.replace('{damage_breakdown_rows}', damage_breakdown_rows)
-        html_body = html_body.replace('{severity_cards}', severity_cards)
-        html_body = html_body.replace('{roof_info_section}', roof_info_section)
-        
-        # Attach HTML body
-        msg.attach(MIMEText(html_body, 'html'))
-        
-        # Attach images if available
-        if annotated_image_path and Path(annotated_image_path).exists():
-            with open(annotated_image_path, 'rb') as f:
-                img = MIMEImage(f.read())
-                img.add_header('Content-Disposition', 'attachment', filename='annotated_detection.png')
-                msg.attach(img)
-        
-        if heatmap_path and Path(heatmap_path).exists():
-            with open(heatmap_path, 'rb') as f:
-                img = MIMEImage(f.read())
-                img.add_header('Content-Disposition', 'attachment', filename='damage_heatmap.png')
-                msg.attach(img)
-        
-        # Attach JSON file if available
-        if json_file_path and Path(json_file_path).exists():
-            with open(json_file_path, 'rb') as f:
-                part = MIMEBase('application', 'json')
-                part.set_payload(f.read())
-                encoders.encode_base64(part)
-                part.add_header('Content-Disposition', 'attachment', filename=Path(json_file_path).name)
-                msg.attach(part)
+            </div>
+        """
+    
+    if property_address:
+        roof_info_section = f"""
+            <div class="divider"></div>
+            <div class="section">
+                <h2 class="section-title">📍 Property</h2>
+                <div class="roof-info-card">
+                    <h4>{html.escape(property_address)}</h4>
+                </div>
+            </div>
+        """ + roof_info_section
+    
+    # Fill template placeholders in a single pass
+    html_body = load_template().render({
+        'zipcode': str(zipcode),
+        'total_roofs': str(result.total_roofs),
+        'roofs_with_damage': str(result.roofs_with_damage),
+        'total_damages': str(total_damages),
+        'damage_area_sqft': damage_area_sqft,
+        'total_cost': f"{costs.total_cost:,.2f}",
+        'labor_cost': f"{costs.labor_cost:,.2f}",
+        'material_cost': f"{costs.material_cost:,.2f}",
+        'cost_per_sqft': f"{costs.cost_per_sqft:.2f}",
+        'damage_breakdown_rows': damage_breakdown_rows,
+        'severity_cards': severity_cards,
+        'roof_info_section': roof_info_section,
+    })
+    
+    # Attach HTML body
+    msg.attach(MIMEText(html_body, 'html'))
+    
+    if attachments is None:
+        attachments = build_report_attachments(annotated_image_path, heatmap_path, json_file_path)
+    for part in attachments:
+        msg.attach(part)
+    
+    return msg
+
+
+def send_damage_report_email(
+    recipient_email: str,
+    zipcode: str,
+    result: "AnalysisResult",
+    costs: RepairCosts,
+    annotated_image_path: Optional[str] = None,
+    heatmap_path: Optional[str] = None,
+    roof_info: str = "",
+    json_file_path: Optional[str] = None
+) -> bool:
+    """
+    Send a single damage report email with costs and images.
+    
+    Opens a dedicated connection; use build_damage_report_message with a
+    shared SMTPTransport when sending more than one report.
+    
+    Args:
+        recipient_email: Email address to send to
+        zipcode: Zipcode analyzed
+        result: Analysis result
+        costs: Repair costs
+        annotated_image_path: Path to annotated image
+        heatmap_path: Path to heatmap
         
-        # Send email
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()
-        server.login(email_user, email_password)
-        server.send_message(msg)
-        server.quit()
+    Returns:
+        True if email sent successfully, False otherwise
+    """
+    try:
+        msg = build_damage_report_message(
+            recipient_email=recipient_email,
+            zipcode=zipcode,
+            result=result,
+            costs=costs,
+            annotated_image_path=annotated_image_path,
+            heatmap_path=heatmap_path,
+            roof_info=roof_info,
+            json_file_path=json_file_path
+        )
+        with create_smtp_transport(pool_size=1) as transport:
+            transport.send(msg)
         
-        logger.info(f"Email sent successfully to {recipient_email}")
+        logger.info(f"Email sent successfully to {msg['To']}")
         return True
         
     except Exception as e:
         logger.error(f"Failed to send email: {e}")
         return False
-
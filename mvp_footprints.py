@@ -0,0 +1,249 @@
+"""
+Building-footprint prefilter.
+Marks which tiles of a zipcode contain buildings, using a local footprint
+dataset, so empty tiles (parks, roads, water) are never fetched or run
+through detection.
+
+Footprints are always read through an R-tree: a GeoPackage's own, or for
+GeoJSON a sidecar ``<file>.rtree.sqlite`` built on first use (GeoJSONL is
+streamed into it; a FeatureCollection is loaded once) and rebuilt when the
+file changes. Each run then reads only the boxes inside its zipcode.
+"""
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Set, Tuple
+from loguru import logger
+
+from mvp_geometry import Bounds, TileKey, lat_lng_to_tile
+
+# (west, south, east, north) in degrees
+BBox = Tuple[float, float, float, float]
+
+# Sidecar index next to a GeoJSON footprint file
+RTREE_SUFFIX = ".rtree.sqlite"
+
+RTREE_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS footprints USING rtree(id, minx, maxx, miny, maxy);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def _coordinates_bbox(coordinates) -> BBox:
+    """Bounding box of a (nested) GeoJSON coordinate array."""
+    west = south = float("inf")
+    east = north = float("-inf")
+    stack = [coordinates]
+    while stack:
+        item = stack.pop()
+        if item and isinstance(item[0], (int, float)):
+            lng, lat = item[0], item[1]
+            west, east = min(west, lng), max(east, lng)
+            south, north = min(south, lat), max(north, lat)
+        else:
+            stack.extend(item)
+    return west, south, east, north
+
+
+def read_geojson_features(path: Path) -> Iterator[Tuple[Dict, Dict]]:
+    """
+    (geometry, properties) of each feature in GeoJSON (FeatureCollection) or
+    line-delimited GeoJSON; features without coordinates are skipped.
+
+    Args:
+        path: .geojson / .geojsonl / .geojsons / .ndjson / .jsonl file in EPSG:4326
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.suffix.lower() in (".geojsonl", ".geojsons", ".ndjson", ".jsonl"):
+            features = (json.loads(line) for line in f if line.strip())
+        else:
+            data = json.load(f)
+            features = data.get("features", [data])
+        for feature in features:
+            geometry = feature.get("geometry") if feature.get("type") == "Feature" else feature
+            if not geometry or not geometry.get("coordinates"):
+                continue
+            yield geometry, feature.get("properties") or {}
+
+
+def rtree_path(path: Path) -> Path:
+    """Sidecar R-tree index of a GeoJSON footprint file."""
+    return path.with_name(path.name + RTREE_SUFFIX)
+
+
+def _source_version(path: Path) -> Dict[str, str]:
+    stat = path.stat()
+    return {"source_size": str(stat.st_size), "source_mtime_ns": str(stat.st_mtime_ns)}
+
+
+def _rtree_is_current(index_path: Path, source: Path) -> bool:
+    """True if the sidecar exists and was built from the file as it is now."""
+    if not index_path.exists():
+        return False
+    try:
+        connection = sqlite3.connect(f"file:{index_path}?mode=ro", uri=True)
+        try:
+            meta = dict(connection.execute("SELECT key, value FROM meta"))
+        finally:
+            connection.close()
+    except sqlite3.Error:
+        return False
+    return all(meta.get(key) == value for key, value in _source_version(source).items())
+
+
+def build_footprint_rtree(source: Path, target: Path) -> int:
+    """
+    Write an R-tree of every footprint's bounding box.
+
+    Args:
+        source: GeoJSON / line-delimited GeoJSON footprints (EPSG:4326)
+        target: SQLite file to write (replaced)
+
+    Returns:
+        Number of footprints indexed
+    """
+    tmp_path = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+    tmp_path.unlink(missing_ok=True)
+    start = time.perf_counter()
+    connection = sqlite3.connect(str(tmp_path))
+    try:
+        connection.executescript(RTREE_SCHEMA)
+        rows = (
+            (bbox[0], bbox[2], bbox[1], bbox[3])
+            for bbox in (_coordinates_bbox(geometry["coordinates"])
+                         for geometry, _ in read_geojson_features(source))
+        )
+        connection.executemany("INSERT INTO footprints (minx, maxx, miny, maxy) VALUES (?, ?, ?, ?)", rows)
+        count = connection.execute("SELECT COUNT(*) FROM footprints").fetchone()[0]
+        connection.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                               list(_source_version(source).items()))
+        connection.commit()
+    finally:
+        connection.close()
+    tmp_path.replace(target)
+    logger.info(f"Footprint index: {count} footprints from {source.name} -> {target.name} "
+                f"in {time.perf_counter() - start:.1f}s")
+    return count
+
+
+def read_geojson_bboxes(path: Path, bounds: Bounds) -> Iterator[BBox]:
+    """
+    Footprint boxes from GeoJSON (FeatureCollection) or line-delimited GeoJSON.
+
+    Reads the file's sidecar R-tree, building it first when it is missing
+    or older than the file. Like a GeoPackage's, the R-tree rounds boxes
+    outward to 32-bit floats (under a metre), which can only keep an extra tile.
+
+    Args:
+        path: .geojson / .geojsonl / .ndjson file in EPSG:4326
+        bounds: Only footprints intersecting these bounds are returned
+    """
+    index_path = rtree_path(path)
+    if not _rtree_is_current(index_path, path):
+        build_footprint_rtree(path, index_path)
+    connection = sqlite3.connect(f"file:{index_path}?mode=ro", uri=True)
+    try:
+        for minx, maxx, miny, maxy in connection.execute(
+            "SELECT minx, maxx, miny, maxy FROM footprints "
+            "WHERE maxx >= ? AND minx <= ? AND maxy >= ? AND miny <= ?",
+            (bounds.west, bounds.east, bounds.south, bounds.north)
+        ):
+            yield minx, miny, maxx, maxy
+    finally:
+        connection.close()
+
+
+def read_geopackage_bboxes(path: Path, bounds: Bounds) -> Iterator[BBox]:
+    """
+    Footprint boxes from a GeoPackage, using its built-in R-tree index.
+
+    Args:
+        path: .gpkg file whose first feature layer is in EPSG:4326
+        bounds: Only footprints intersecting these bounds are returned
+
+    Raises:
+        ValueError: If the layer has no spatial index or is not EPSG:4326
+    """
+    connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        row = connection.execute(
+            "SELECT table_name, column_name, srs_id FROM gpkg_geometry_columns LIMIT 1"
+        ).fetchone()
+        if row is None:
+            raise ValueError(f"{path} has no feature layer")
+        table, column, srs_id = row
+        if srs_id != 4326:
+            raise ValueError(f"{path} layer {table} is EPSG:{srs_id}, expected EPSG:4326")
+        rtree = f"rtree_{table}_{column}"
+        has_rtree = connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (rtree,)
+        ).fetchone()
+        if not has_rtree:
+            raise ValueError(f"{path} layer {table} has no spatial index")
+        query = (f'SELECT minx, miny, maxx, maxy FROM "{rtree}" '
+                 "WHERE maxx >= ? AND minx <= ? AND maxy >= ? AND miny <= ?")
+        for minx, miny, maxx, maxy in connection.execute(
+            query, (bounds.west, bounds.east, bounds.south, bounds.north)
+        ):
+            yield minx, miny, maxx, maxy
+    finally:
+        connection.close()
+
+
+class FootprintIndex:
+    """
+    Set of tiles at one zoom level that contain at least one building.
+
+    Every tile a footprint's bounding box touches is marked, so a building
+    split across tiles keeps all of its tiles.
+    """
+
+    def __init__(self, zoom: int):
+        self.zoom = zoom
+        self.occupied: Set[Tuple[int, int]] = set()
+        self.footprints = 0
+
+    @classmethod
+    def from_file(cls, path: str, bounds: Bounds, zoom: int) -> "FootprintIndex":
+        """
+        Build the index for an area from a footprint file on disk.
+
+        Args:
+            path: GeoJSON, line-delimited GeoJSON or GeoPackage (EPSG:4326)
+            bounds: Area being analyzed
+            zoom: Tile zoom level
+
+        Returns:
+            FootprintIndex
+        """
+        file_path = Path(path)
+        if file_path.suffix.lower() == ".gpkg":
+            bboxes = read_geopackage_bboxes(file_path, bounds)
+        else:
+            bboxes = read_geojson_bboxes(file_path, bounds)
+
+        index = cls(zoom)
+        index.add_bboxes(bboxes)
+        logger.info(f"Footprint index: {index.footprints} buildings on {len(index.occupied)} tiles "
+                    f"(zoom {zoom}) from {file_path.name}")
+        return index
+
+    def add_bboxes(self, bboxes: Iterable[BBox]) -> None:
+        """Mark the tiles covered by each (west, south, east, north) box."""
+        for west, south, east, north in bboxes:
+            fx0, fy0 = lat_lng_to_tile(north, west, self.zoom)
+            fx1, fy1 = lat_lng_to_tile(south, east, self.zoom)
+            for y in range(int(fy0), int(fy1) + 1):
+                for x in range(int(fx0), int(fx1) + 1):
+                    self.occupied.add((x, y))
+            self.footprints += 1
+
+    def has_buildings(self, key: TileKey) -> bool:
+        """True if the (z, x, y) tile contains part of a building."""
+        z, x, y = key
+        return z == self.zoom and (x, y) in self.occupied
@@ -0,0 +1,414 @@
+"""
+Offline zipcode gazetteer.
+ZCTA (ZIP Code Tabulation Area) boundary polygons are packed into one
+SQLite file: per zipcode its bounding box, centroid and its rings as
+delta-encoded microdegree integers, zlib-compressed. Resolving a zipcode
+is one primary-key lookup with no network, and the tiles a zipcode covers
+are rasterized from its polygon instead of its bounding box, so tiles
+outside the zipcode are never fetched or run through detection.
+
+Build the index once from the Census ZCTA boundaries converted to GeoJSON
+(e.g. ``ogr2ogr -f GeoJSONSeq -t_srs EPSG:4326 zcta.geojsonl cb_2020_us_zcta520_500k.shp``):
+
+    python mvp_gazetteer.py build zcta.geojsonl data/zcta.sqlite
+    python mvp_gazetteer.py lookup data/zcta.sqlite 75201
+"""
+import bisect
+import math
+import sqlite3
+import sys
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+from loguru import logger
+
+from mvp_footprints import read_geojson_features
+from mvp_geometry import Bounds, TileKey
+
+# Bumped when the ring encoding changes
+GAZETTEER_VERSION = 1
+
+# Coordinates are stored as integer microdegrees (~0.1 m)
+COORD_SCALE = 1_000_000
+
+# Property names holding the zipcode in Census ZCTA files (2020 and 2010) and common extracts
+ZIP_FIELDS = ("ZCTA5CE20", "ZCTA5CE10", "GEOID20", "GEOID10", "ZCTA5", "zipcode", "ZIP", "zip")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS zctas (
+    zipcode TEXT PRIMARY KEY,
+    west REAL NOT NULL,
+    south REAL NOT NULL,
+    east REAL NOT NULL,
+    north REAL NOT NULL,
+    lat REAL NOT NULL,
+    lng REAL NOT NULL,
+    rings BLOB NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def encode_rings(rings: List[np.ndarray]) -> bytes:
+    """
+    Pack (lng, lat) rings into a compact blob.
+
+    Layout (little-endian int32, zlib-compressed): ring count, each ring's
+    point count, then all points as microdegree deltas from the previous
+    point (the first from 0).
+    """
+    points = np.concatenate([np.round(ring * COORD_SCALE).astype(np.int64) for ring in rings])
+    deltas = np.diff(points, axis=0, prepend=np.zeros((1, 2), dtype=np.int64))
+    header = np.array([len(rings)] + [len(ring) for ring in rings], dtype=np.int64)
+    return zlib.compress(np.concatenate([header, deltas.ravel()]).astype("<i4").tobytes(), 9)
+
+
+def decode_rings(blob: bytes) -> List[np.ndarray]:
+    """Inverse of encode_rings: (lng, lat) float rings."""
+    values = np.frombuffer(zlib.decompress(blob), dtype="<i4").astype(np.int64)
+    count = int(values[0])
+    lengths = values[1:1 + count]
+    points = np.cumsum(values[1 + count:].reshape(-1, 2), axis=0) / COORD_SCALE
+    return np.split(points, np.cumsum(lengths)[:-1])
+
+
+def _geometry_rings(geometry: Dict) -> List[np.ndarray]:
+    """All rings (outer and holes) of a Polygon / MultiPolygon, as (lng, lat) arrays."""
+    if geometry.get("type") == "Polygon":
+        polygons = [geometry["coordinates"]]
+    elif geometry.get("type") == "MultiPolygon":
+        polygons = geometry["coordinates"]
+    else:
+        return []
+    rings = []
+    for polygon in polygons:
+        for ring in polygon:
+            points = np.asarray(ring, dtype=np.float64)[:, :2]
+            # Drop points that collapse onto their predecessor once quantized
+            quantized = np.round(points * COORD_SCALE)
+            keep = np.ones(len(points), dtype=bool)
+            keep[1:] = np.any(quantized[1:] != quantized[:-1], axis=1)
+            points = points[keep]
+            if len(points) >= 3:
+                rings.append(points)
+    return rings
+
+
+def _ring_area_centroid(ring: np.ndarray) -> Tuple[float, float, float]:
+    """Signed shoelace area and centroid of a ring (planar, in degrees)."""
+    x, y = ring[:, 0], ring[:, 1]
+    xn, yn = np.roll(x, -1), np.roll(y, -1)
+    cross = x * yn - xn * y
+    area = cross.sum() / 2
+    if area == 0:
+        return 0.0, float(x.mean()), float(y.mean())
+    return float(area), float(((x + xn) * cross).sum() / (6 * area)), float(((y + yn) * cross).sum() / (6 * area))
+
+
+def _centroid(rings: List[np.ndarray]) -> Tuple[float, float]:
+    """(lat, lng) area-weighted centroid; holes count negatively when wound opposite to their shell."""
+    parts = [_ring_area_centroid(ring) for ring in rings]
+    total = sum(area for area, _, _ in parts)
+    if total == 0:
+        points = np.concatenate(rings)
+        return float(points[:, 1].mean()), float(points[:, 0].mean())
+    lng = sum(area * cx for area, cx, _ in parts) / total
+    lat = sum(area * cy for area, _, cy in parts) / total
+    return lat, lng
+
+
+def build_gazetteer(
+    source: Union[str, Path],
+    target: Union[str, Path],
+    field: Optional[str] = None
+) -> int:
+    """
+    Build the gazetteer index from ZCTA polygons.
+
+    Args:
+        source: GeoJSON / line-delimited GeoJSON of ZCTA polygons (EPSG:4326)
+        target: SQLite file to write (replaced)
+        field: Property holding the zipcode (first of ZIP_FIELDS found if None)
+
+    Returns:
+        Number of zipcodes written
+    """
+    source, target = Path(source), Path(target)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = target.with_suffix(target.suffix + ".tmp")
+    tmp_path.unlink(missing_ok=True)
+    start = time.perf_counter()
+    connection = sqlite3.connect(str(tmp_path))
+    count = 0
+    try:
+        connection.executescript(SCHEMA)
+        for geometry, properties in read_geojson_features(source):
+            name = field or next((f for f in ZIP_FIELDS if f in properties), None)
+            if name is None or properties.get(name) is None:
+                continue
+            rings = _geometry_rings(geometry)
+            if not rings:
+                continue
+            points = np.concatenate(rings)
+            lat, lng = _centroid(rings)
+            connection.execute(
+                "INSERT OR REPLACE INTO zctas (zipcode, west, south, east, north, lat, lng, rings) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (str(properties[name]).zfill(5), float(points[:, 0].min()), float(points[:, 1].min()),
+                 float(points[:, 0].max()), float(points[:, 1].max()), lat, lng, encode_rings(rings))
+            )
+            count += 1
+        connection.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", [
+            ("version", str(GAZETTEER_VERSION)), ("source", source.name), ("built_at", str(int(time.time())))
+        ])
+        connection.commit()
+        connection.execute("VACUUM")
+    finally:
+        connection.close()
+    tmp_path.replace(target)
+    logger.info(f"Gazetteer: {count} zipcodes from {source.name} -> {target} "
+                f"({target.stat().st_size / 1024 ** 2:.1f} MB) in {time.perf_counter() - start:.1f}s")
+    return count
+
+
+class TileMask:
+    """
+    Tiles at one zoom level covered by an area, as merged x spans per row.
+
+    Much smaller than a set of tile keys for large areas; a lookup is a
+    bisect in one row.
+    """
+
+    def __init__(self, zoom: int, rows: Dict[int, List[Tuple[int, int]]]):
+        self.zoom = zoom
+        self.rows = rows    # y -> sorted, disjoint, inclusive (x0, x1) spans
+        self._starts = {y: [span[0] for span in spans] for y, spans in rows.items()}
+
+    def has_tile(self, key: TileKey) -> bool:
+        """True if the (z, x, y) tile intersects the area."""
+        z, x, y = key
+        starts = self._starts.get(y)
+        if z != self.zoom or not starts:
+            return False
+        i = bisect.bisect_right(starts, x) - 1
+        return i >= 0 and x <= self.rows[y][i][1]
+
+    def count(self, grid: Optional[Tuple[int, int, int, int]] = None) -> int:
+        """Tiles in the mask, optionally only those inside an (x0, y0, x1, y1) grid (x1/y1 exclusive)."""
+        total = 0
+        for y, spans in self.rows.items():
+            if grid is not None and not grid[1] <= y < grid[3]:
+                continue
+            for x0, x1 in spans:
+                if grid is not None:
+                    x0, x1 = max(x0, grid[0]), min(x1, grid[2] - 1)
+                total += max(0, x1 - x0 + 1)
+        return total
+
+    def __len__(self) -> int:
+        return self.count()
+
+
+def _to_tile_coords(ring: np.ndarray, zoom: int) -> np.ndarray:
+    """(lng, lat) degrees -> fractional Web-Mercator tile (x, y), vectorized."""
+    n = 2 ** zoom
+    lat = np.radians(np.clip(ring[:, 1], -85.05112878, 85.05112878))
+    x = (ring[:, 0] + 180.0) / 360.0 * n
+    y = (1.0 - np.arcsinh(np.tan(lat)) / math.pi) / 2.0 * n
+    return np.stack([x, y], axis=1)
+
+
+def _merge(spans: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    merged: List[Tuple[int, int]] = []
+    for x0, x1 in sorted(spans):
+        if merged and x0 <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], x1))
+        else:
+            merged.append((x0, x1))
+    return merged
+
+
+def polygon_tiles(rings: List[np.ndarray], zoom: int) -> TileMask:
+    """
+    Tiles intersecting a polygon (even-odd over all rings, so holes and
+    multipolygons work).
+
+    A tile intersects the polygon when a boundary edge passes through it
+    or it lies inside; edge tiles are traced row by row along each edge,
+    and interior tiles are filled between the boundary crossings of each
+    row's center line.
+
+    Args:
+        rings: (lng, lat) rings
+        zoom: Tile zoom level
+
+    Returns:
+        TileMask
+    """
+    rows: Dict[int, List[Tuple[int, int]]] = {}
+    edges = []
+    for ring in rings:
+        points = _to_tile_coords(ring, zoom)
+        edges.append(np.concatenate([points, np.roll(points, -1, axis=0)], axis=1))
+    edges = np.concatenate(edges)   # x0, y0, x1, y1
+    edges = edges[np.any(edges[:, :2] != edges[:, 2:], axis=1)]
+
+    # Boundary: the x range each edge sweeps within each tile row it crosses
+    for x0, y0, x1, y1 in edges:
+        top, bottom = min(y0, y1), max(y0, y1)
+        first_row = int(math.floor(top))
+        last_row = max(first_row, int(math.ceil(bottom)) - 1)
+        for row in range(first_row, last_row + 1):
+            if y0 == y1:
+                xa, xb = x0, x1
+            else:
+                ta = (min(max(row, top), bottom) - y0) / (y1 - y0)
+                tb = (min(max(row + 1, top), bottom) - y0) / (y1 - y0)
+                xa, xb = x0 + ta * (x1 - x0), x0 + tb * (x1 - x0)
+            rows.setdefault(row, []).append((int(math.floor(min(xa, xb))), int(math.floor(max(xa, xb)))))
+
+    # Interior: even-odd crossings of each row's center line
+    ex0, ey0, ex1, ey1 = edges.T
+    for row in range(int(math.floor(edges[:, [1, 3]].min())), int(math.floor(edges[:, [1, 3]].max())) + 1):
+        center = row + 0.5
+        crossing = (ey0 <= center) != (ey1 <= center)
+        if not crossing.any():
+            continue
+        xs = np.sort(ex0[crossing] + (center - ey0[crossing]) * (ex1[crossing] - ex0[crossing])
+                     / (ey1[crossing] - ey0[crossing]))
+        for xa, xb in zip(xs[0::2], xs[1::2]):
+            rows.setdefault(row, []).append((int(math.floor(xa)), int(math.floor(xb))))
+
+    return TileMask(zoom, {row: _merge(spans) for row, spans in rows.items()})
+
+
+@dataclass
+class ZipArea:
+    """A zipcode's boundary from the gazetteer."""
+    zipcode: str
+    bounds: Bounds
+    center: Tuple[float, float]     # (lat, lng) area-weighted centroid
+    rings: List[np.ndarray]         # (lng, lat) rings, even-odd
+
+    def tiles(self, zoom: int) -> TileMask:
+        """Tiles intersecting the zipcode at a zoom level."""
+        return polygon_tiles(self.rings, zoom)
+
+
+class Gazetteer:
+    """
+    Read-only zipcode -> boundary index.
+
+    Usage:
+        with Gazetteer("data/zcta.sqlite") as gazetteer:
+            area = gazetteer.area("75201")
+            mask = area.tiles(21)
+    """
+
+    def __init__(self, path: Union[str, Path], cache_areas: int = 64):
+        """
+        Open an index built by build_gazetteer.
+
+        Args:
+            path: Gazetteer SQLite file
+            cache_areas: Decoded areas kept in memory
+        """
+        self.path = Path(path)
+        if not self.path.exists():
+            raise FileNotFoundError(f"Gazetteer index not found: {self.path}")
+        self._db = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        version = self._db.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        if version is None or int(version[0]) != GAZETTEER_VERSION:
+            raise ValueError(f"{self.path} is gazetteer version {version[0] if version else '?'}, "
+                             f"expected {GAZETTEER_VERSION}; rebuild it")
+        self.cache_areas = cache_areas
+        self._areas: "OrderedDict[str, ZipArea]" = OrderedDict()
+
+    def bounds(self, zipcode: str) -> Optional[Bounds]:
+        """Bounding box of a zipcode (no polygon decoding), or None if unknown."""
+        row = self._db.execute(
+            "SELECT west, south, east, north FROM zctas WHERE zipcode = ?", (zipcode,)
+        ).fetchone()
+        if row is None:
+            return None
+        west, south, east, north = row
+        return Bounds(south=south, west=west, north=north, east=east)
+
+    def area(self, zipcode: str) -> Optional[ZipArea]:
+        """Boundary of a zipcode, or None if unknown."""
+        if zipcode in self._areas:
+            self._areas.move_to_end(zipcode)
+            return self._areas[zipcode]
+        row = self._db.execute(
+            "SELECT west, south, east, north, lat, lng, rings FROM zctas WHERE zipcode = ?", (zipcode,)
+        ).fetchone()
+        if row is None:
+            return None
+        west, south, east, north, lat, lng, blob = row
+        area = ZipArea(zipcode=zipcode, bounds=Bounds(south=south, west=west, north=north, east=east),
+                       center=(lat, lng), rings=decode_rings(blob))
+        self._areas[zipcode] = area
+        if len(self._areas) > self.cache_areas:
+            self._areas.popitem(last=False)
+        return area
+
+    def zipcodes(self) -> Iterator[str]:
+        """Every zipcode in the index, in order."""
+        for (zipcode,) in self._db.execute("SELECT zipcode FROM zctas ORDER BY zipcode"):
+            yield zipcode
+
+    def __contains__(self, zipcode: str) -> bool:
+        return self._db.execute("SELECT 1 FROM zctas WHERE zipcode = ?", (zipcode,)).fetchone() is not None
+
+    def __len__(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM zctas").fetchone()[0]
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __enter__(self) -> "Gazetteer":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+if __name__ == "__main__":
+    usage = ("Usage:\n"
+             "  python mvp_gazetteer.py build <zcta.geojson[l]> <index.sqlite> [--field NAME]\n"
+             "  python mvp_gazetteer.py lookup <index.sqlite> <zipcode> [zoom]")
+    args = sys.argv[1:]
+    if len(args) >= 3 and args[0] == "build":
+        zip_field = args[args.index("--field") + 1] if "--field" in args[:-1] else None
+        build_gazetteer(args[1], args[2], zip_field)
+    elif len(args) >= 3 and args[0] == "lookup":
+        with Gazetteer(args[1]) as gazetteer:
+            start = time.perf_counter()
+            zip_area = gazetteer.area(args[2])
+            lookup_ms = (time.perf_counter() - start) * 1000
+            if zip_area is None:
+                print(f"Zipcode {args[2]} not in {args[1]}")
+                sys.exit(1)
+            zoom_level = int(args[3]) if len(args) > 3 else 21
+            start = time.perf_counter()
+            tile_mask = zip_area.tiles(zoom_level)
+            mask_ms = (time.perf_counter() - start) * 1000
+            b = zip_area.bounds
+            from mvp_geometry import tile_range
+            grid = tile_range(b, zoom_level)
+            grid_tiles = (grid[2] - grid[0]) * (grid[3] - grid[1])
+            print(f"{args[2]}: bbox S{b.south:.5f} W{b.west:.5f} N{b.north:.5f} E{b.east:.5f}, "
+                  f"center {zip_area.center[0]:.5f}, {zip_area.center[1]:.5f} ({lookup_ms:.2f} ms)")
+            print(f"zoom {zoom_level}: {len(tile_mask)} of {grid_tiles} bbox tiles inside the polygon "
+                  f"({len(tile_mask) / max(1, grid_tiles):.0%}, {mask_ms:.0f} ms)")
+    else:
+        print(usage)
+        sys.exit(1)
@@ -0,0 +1,158 @@
+"""
+Web-Mercator geometry.
+Converts between lat/lng, XYZ tiles and global pixel coordinates, and ties
+result images to global pixels. Pure math: no HTTP or imaging dependencies,
+so the area and cost engines can use it without the fetch stack.
+"""
+import math
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional, Tuple
+
+if TYPE_CHECKING:
+    from src.output.json_generator import AnalysisResult
+
+# Tile edge in pixels (matches PipelineConfig.tile_size in mvp_app.py)
+TILE_SIZE = 256
+
+# WGS84 equatorial radius used by Web-Mercator
+EARTH_RADIUS_M = 6378137.0
+
+TileKey = Tuple[int, int, int]  # (z, x, y)
+
+
+@dataclass(frozen=True)
+class Bounds:
+    """Geographic bounding box in degrees."""
+    south: float
+    west: float
+    north: float
+    east: float
+
+    @property
+    def center(self) -> Tuple[float, float]:
+        return (self.south + self.north) / 2.0, (self.west + self.east) / 2.0
+
+
+def lat_lng_to_tile(lat: float, lng: float, zoom: int) -> Tuple[float, float]:
+    """
+    Convert lat/lng to fractional tile coordinates.
+
+    Args:
+        lat: Latitude in degrees
+        lng: Longitude in degrees
+        zoom: Zoom level
+
+    Returns:
+        (x, y) in tiles; the integer part is the tile index
+    """
+    lat = max(min(lat, 85.05112878), -85.05112878)
+    n = 2 ** zoom
+    x = (lng + 180.0) / 360.0 * n
+    lat_rad = math.radians(lat)
+    y = (1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n
+    return x, y
+
+
+def tile_to_lat_lng(x: float, y: float, zoom: int) -> Tuple[float, float]:
+    """
+    Convert (fractional) tile coordinates to lat/lng of that point.
+
+    Args:
+        x: Tile x (fractions allowed)
+        y: Tile y (fractions allowed)
+        zoom: Zoom level
+
+    Returns:
+        (lat, lng) in degrees
+    """
+    n = 2 ** zoom
+    lng = x / n * 360.0 - 180.0
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    return lat, lng
+
+
+def pixel_to_lat_lng(px: float, py: float, zoom: int, tile_size: int = TILE_SIZE) -> Tuple[float, float]:
+    """Convert global pixel coordinates at a zoom level to lat/lng."""
+    return tile_to_lat_lng(px / tile_size, py / tile_size, zoom)
+
+
+def tile_range(bounds: Bounds, zoom: int) -> Tuple[int, int, int, int]:
+    """
+    Tiles covering a bounding box.
+
+    Returns:
+        (x0, y0, x1, y1) with x1/y1 exclusive
+    """
+    fx0, fy0 = lat_lng_to_tile(bounds.north, bounds.west, zoom)
+    fx1, fy1 = lat_lng_to_tile(bounds.south, bounds.east, zoom)
+    return int(fx0), int(fy0), int(math.floor(fx1)) + 1, int(math.floor(fy1)) + 1
+
+
+def tile_bounds(x: int, y: int, zoom: int) -> Bounds:
+    """Geographic bounds of one tile."""
+    north, west = tile_to_lat_lng(x, y, zoom)
+    south, east = tile_to_lat_lng(x + 1, y + 1, zoom)
+    return Bounds(south=south, west=west, north=north, east=east)
+
+
+def meters_per_pixel(lat: float, zoom: int, tile_size: int = TILE_SIZE) -> float:
+    """Ground resolution of a Web-Mercator pixel at a latitude."""
+    return math.cos(math.radians(lat)) * 2 * math.pi * EARTH_RADIUS_M / (tile_size * 2 ** zoom)
+
+
+@dataclass(frozen=True)
+class MosaicGeoref:
+    """
+    Where a result image sits in the Web-Mercator world.
+
+    Image pixel (x, y) is global pixel (origin_x + x * scale,
+    origin_y + y * scale) at the georeference's zoom. ``scale`` is global
+    pixels per image pixel: above 1 when the stitcher shrank its output
+    (e.g. "Scaling output by 0.97x").
+    """
+    origin_x: float
+    origin_y: float
+    scale: float = 1.0
+
+    @property
+    def origin(self) -> Tuple[float, float]:
+        return self.origin_x, self.origin_y
+
+    def to_global(self, x, y):
+        """Global pixel coordinates of image pixels (scalars or arrays)."""
+        return self.origin_x + x * self.scale, self.origin_y + y * self.scale
+
+
+def _uniform_scale(span_w: float, span_h: float, width: int, height: int) -> Optional[float]:
+    """Scale that maps a global-pixel span onto width x height image pixels, if one does (±1 px)."""
+    if width <= 0 or height <= 0 or span_w <= 0 or span_h <= 0:
+        return None
+    scale = span_w / width
+    return scale if abs(span_h / scale - height) <= 1.0 else None
+
+
+def mosaic_georef(result: "AnalysisResult", zoom: int, tile_size: int = TILE_SIZE) -> MosaicGeoref:
+    """
+    Georeference of a result image from its bounding box and size.
+
+    The stitcher covers the tile range of the bounding box (or the box
+    itself) and may rescale its output to a size cap, so the image is
+    matched against both spans: the one it fits at a uniform scale gives
+    origin and scale. Results without a usable box are taken to be
+    unscaled and centered on the result's center.
+    """
+    width, height = result.image_width, result.image_height
+    box = result.bounding_box
+    if isinstance(box, (list, tuple)) and len(box) == 4:
+        bounds = Bounds(*map(float, box))
+        x0, y0, x1, y1 = tile_range(bounds, zoom)
+        scale = _uniform_scale((x1 - x0) * tile_size, (y1 - y0) * tile_size, width, height)
+        if scale is not None:
+            return MosaicGeoref(float(x0 * tile_size), float(y0 * tile_size), scale)
+        west, north = lat_lng_to_tile(bounds.north, bounds.west, zoom)
+        east, south = lat_lng_to_tile(bounds.south, bounds.east, zoom)
+        scale = _uniform_scale((east - west) * tile_size, (south - north) * tile_size, width, height)
+        if scale is not None:
+            return MosaicGeoref(west * tile_size, north * tile_size, scale)
+    cx, cy = lat_lng_to_tile(result.center_lat, result.center_lng, zoom)
+    return MosaicGeoref(cx * tile_size - width / 2, cy * tile_size - height / 2)
@@ -0,0 +1,127 @@
+"""
+Single-pass index over an AnalysisResult.
+Groups roofs and damages by roof id once, so per-roof views and costs are
+lookups instead of repeated scans of the full roof and damage lists.
+"""
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from mvp_costs import RepairCosts, BulkRepairCosts, calculate_repair_costs_bulk, damages_to_columns
+
+if TYPE_CHECKING:
+    from src.output.json_generator import AnalysisResult
+    from src.detection.damage_detector import DamageDetection
+
+
+@dataclass
+class RoofAggregate:
+    """Damage totals for one roof."""
+    roof_id: int
+    damage_count: int = 0
+    damage_area_pixels: int = 0
+    severity_counts: Dict[str, int] = field(default_factory=dict)
+
+
+class ResultIndex:
+    """
+    roof_id -> roof, roof_id -> damages and per-roof aggregates for a result.
+
+    Built in one pass over ``result.roofs`` and one over ``result.damages``.
+    Damage lists are stored once and handed out by reference.
+    """
+
+    def __init__(self, result: "AnalysisResult"):
+        """
+        Build the index.
+
+        Args:
+            result: Complete analysis result
+        """
+        self.result = result
+        self.roofs_by_id = {roof.id: roof for roof in result.roofs}
+        self.damages_by_roof: Dict[int, List["DamageDetection"]] = {}
+        self.aggregates: Dict[int, RoofAggregate] = {}
+        self.unassigned_damages = 0
+        self._bulk_costs: Optional[BulkRepairCosts] = None
+
+        for damage in result.damages:
+            roof_id = damage.roof_id
+            if roof_id is None:
+                self.unassigned_damages += 1
+                continue
+            damages = self.damages_by_roof.get(roof_id)
+            if damages is None:
+                damages = self.damages_by_roof[roof_id] = []
+                self.aggregates[roof_id] = RoofAggregate(roof_id)
+            damages.append(damage)
+
+            aggregate = self.aggregates[roof_id]
+            aggregate.damage_count += 1
+            aggregate.damage_area_pixels += damage.area_pixels
+            severity = damage.severity.value
+            aggregate.severity_counts[severity] = aggregate.severity_counts.get(severity, 0) + 1
+
+    @property
+    def damaged_roof_ids(self) -> List[int]:
+        """Ids of roofs with at least one damage, in detection order."""
+        return list(self.damages_by_roof.keys())
+
+    def roof(self, roof_id: int):
+        """Return the roof with this id, or None."""
+        return self.roofs_by_id.get(roof_id)
+
+    def damages(self, roof_id: int) -> List["DamageDetection"]:
+        """Return the roof's damages (shared list, do not modify)."""
+        return self.damages_by_roof.get(roof_id, [])
+
+    def roof_result(self, roof_id: int) -> "AnalysisResult":
+        """
+        Create an AnalysisResult for a single roof and its damages.
+
+        Args:
+            roof_id: ID of the roof
+
+        Returns:
+            AnalysisResult with only this roof and its damages
+
+        Raises:
+            ValueError: If the roof is not in the result
+        """
+        roof = self.roofs_by_id.get(roof_id)
+        if roof is None:
+            raise ValueError(f"Roof {roof_id} not found in results")
+
+        full_result = self.result
+        roof_damages = self.damages(roof_id)
+        aggregate = self.aggregates.get(roof_id)
+
+        # Same class as the full result (pipeline or reloaded from JSON)
+        return type(full_result)(
+            zipcode=full_result.zipcode,
+            timestamp=full_result.timestamp,
+            processing_time_sec=full_result.processing_time_sec,
+            center_lat=full_result.center_lat,
+            center_lng=full_result.center_lng,
+            bounding_box=full_result.bounding_box,
+            image_width=full_result.image_width,
+            image_height=full_result.image_height,
+            tiles_processed=full_result.tiles_processed,
+            roofs=[roof],  # Only this roof
+            damages=roof_damages,  # Only damages for this roof
+            total_roofs=1,
+            roofs_with_damage=1 if roof_damages else 0,
+            total_damage_area_pixels=aggregate.damage_area_pixels if aggregate else 0,
+            performance=full_result.performance
+        )
+
+    @property
+    def bulk_costs(self) -> BulkRepairCosts:
+        """Repair costs of every damaged roof, computed once in bulk."""
+        if self._bulk_costs is None:
+            assigned = [d for damages in self.damages_by_roof.values() for d in damages]
+            self._bulk_costs = calculate_repair_costs_bulk(damages_to_columns(assigned, self.result))
+        return self._bulk_costs
+
+    def roof_costs(self, roof_id: int) -> RepairCosts:
+        """Repair costs for one roof's damages (same values as calculate_repair_costs)."""
+        return self.bulk_costs.costs_for(roof_id)
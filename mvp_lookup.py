@@ -0,0 +1,544 @@
+"""
+Property address and owner lookup for damaged roofs.
+Each damaged roof's pixel center is converted to lat/lng, roofs whose
+centers are within a few metres of each other share one lookup, and the
+remaining properties are looked up concurrently (bounded) through
+pluggable providers: reverse geocoding for the address, then an owner
+lookup for it. Results are kept in a geohash-keyed SQLite cache with a
+TTL, so re-scanning a zipcode does not pay for the same parcel twice
+(both Google geocoding and Tracerfy bill per request, see
+api_pricing/API_PRICING.md).
+"""
+import asyncio
+import json
+import math
+import random
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Protocol, Tuple
+import httpx
+from loguru import logger
+
+from mvp_geometry import EARTH_RADIUS_M, TILE_SIZE, mosaic_georef, pixel_to_lat_lng
+from mvp_tiles import RETRY_STATUSES
+
+if TYPE_CHECKING:
+    from src.output.json_generator import AnalysisResult
+
+# Google reverse geocoding (1 billed request per property)
+GOOGLE_GEOCODE_URL = "https://maps.googleapis.com/maps/api/geocode/json"
+
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS properties (
+    geohash TEXT PRIMARY KEY,
+    lat REAL NOT NULL,
+    lng REAL NOT NULL,
+    found INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    stored_at REAL NOT NULL
+);
+"""
+
+# PRAGMA user_version of the cache; older caches are emptied on open.
+# 1: roof centers located without the mosaic's scale (off by up to ~3% of
+#    the distance from the image origin)
+CACHE_VERSION = 2
+
+
+@dataclass
+class LookupConfig:
+    """Settings for property lookups."""
+    cache_dir: str = str(Path(__file__).parent / "cache" / "lookups")
+    ttl_sec: float = 180 * 86400            # Found addresses/owners are reused this long
+    negative_ttl_sec: float = 30 * 86400    # "Nothing found" is retried sooner
+    dedupe_m: float = 8.0                   # Roof centers closer than this share one lookup
+    geohash_precision: int = 9              # ~5 m cells for cache keys
+    concurrency: int = 4                    # Properties looked up at once
+    max_retries: int = 3                    # Per provider request (429/5xx/timeouts)
+    backoff_base_sec: float = 0.5
+    backoff_max_sec: float = 8.0
+    timeout: float = 15.0
+
+
+@dataclass
+class PropertyRecord:
+    """What is known about the property at a point."""
+    lat: float
+    lng: float
+    address: Optional[str] = None
+    owner_name: Optional[str] = None
+    owner_email: Optional[str] = None
+    owner_phone: Optional[str] = None
+    source: str = ""            # Providers that produced the record
+    looked_up_at: float = 0.0
+
+    @property
+    def found(self) -> bool:
+        return self.address is not None
+
+
+@dataclass
+class LookupStats:
+    """Counters for one lookup run (reported in the run trace)."""
+    roofs: int = 0
+    properties: int = 0         # After merging nearby roofs
+    roofs_merged: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    geocode_requests: int = 0   # Billed provider calls, retries included
+    owner_requests: int = 0
+    retries: int = 0
+    failed: int = 0             # Properties whose lookup errored (not cached)
+    not_found: int = 0
+    elapsed_sec: float = 0.0
+
+    def summary(self) -> Dict:
+        summary = asdict(self)
+        summary["elapsed_sec"] = round(self.elapsed_sec, 3)
+        lookups = self.cache_hits + self.cache_misses
+        summary["cache_hit_rate"] = round(self.cache_hits / lookups, 3) if lookups else 0.0
+        return summary
+
+
+class ProviderError(Exception):
+    """A provider request failed; ``retryable`` errors are retried with backoff."""
+
+    def __init__(self, message: str, retryable: bool = False):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class AddressProvider(Protocol):
+    """Reverse geocoder: point -> street address."""
+    name: str
+
+    async def reverse_geocode(self, client: httpx.AsyncClient, lat: float, lng: float) -> Optional[str]:
+        ...
+
+
+class OwnerProvider(Protocol):
+    """Owner lookup: street address -> owner fields (owner_name, owner_email, owner_phone)."""
+    name: str
+
+    async def lookup_owner(self, client: httpx.AsyncClient, address: str) -> Optional[Dict[str, str]]:
+        ...
+
+
+def _check_status(response: httpx.Response, provider: str) -> None:
+    if response.status_code in RETRY_STATUSES:
+        raise ProviderError(f"{provider}: HTTP {response.status_code}", retryable=True)
+    if response.status_code >= 400:
+        raise ProviderError(f"{provider}: HTTP {response.status_code}")
+
+
+class GoogleReverseGeocoder:
+    """Google Geocoding API, restricted to street addresses and premises."""
+    name = "google"
+
+    def __init__(self, api_key: str, url: str = GOOGLE_GEOCODE_URL):
+        self.api_key = api_key
+        self.url = url
+
+    async def reverse_geocode(self, client: httpx.AsyncClient, lat: float, lng: float) -> Optional[str]:
+        response = await client.get(self.url, params={
+            "latlng": f"{lat:.7f},{lng:.7f}",
+            "result_type": "street_address|premise",
+            "key": self.api_key,
+        })
+        _check_status(response, self.name)
+        data = response.json()
+        status = data.get("status")
+        if status == "ZERO_RESULTS":
+            return None
+        if status in ("OVER_QUERY_LIMIT", "UNKNOWN_ERROR"):
+            raise ProviderError(f"{self.name}: {status}", retryable=True)
+        if status != "OK":
+            raise ProviderError(f"{self.name}: {status} {data.get('error_message', '')}".strip())
+        results = data.get("results") or []
+        return results[0].get("formatted_address") if results else None
+
+
+class JsonOwnerLookup:
+    """
+    Owner lookup over a JSON HTTP endpoint (e.g. a Tracerfy account's lookup URL).
+
+    POSTs ``{"address": ...}`` with a bearer token and reads owner fields
+    from the response object (or its first "results" entry).
+    """
+
+    # Response keys tried for each PropertyRecord field, in order
+    FIELDS = {
+        "owner_name": ("owner_name", "name", "full_name"),
+        "owner_email": ("owner_email", "email", "emails"),
+        "owner_phone": ("owner_phone", "phone", "phones"),
+    }
+
+    def __init__(self, url: str, api_key: str, name: str = "tracerfy"):
+        self.url = url
+        self.api_key = api_key
+        self.name = name
+
+    async def lookup_owner(self, client: httpx.AsyncClient, address: str) -> Optional[Dict[str, str]]:
+        response = await client.post(self.url, json={"address": address},
+                                     headers={"Authorization": f"Bearer {self.api_key}"})
+        if response.status_code == 404:
+            return None
+        _check_status(response, self.name)
+        data = response.json()
+        if isinstance(data, dict) and isinstance(data.get("results"), list):
+            data = data["results"][0] if data["results"] else None
+        if not isinstance(data, dict):
+            return None
+        owner = {}
+        for target, keys in self.FIELDS.items():
+            for key in keys:
+                value = data.get(key)
+                if isinstance(value, list):
+                    value = value[0] if value else None
+                if isinstance(value, dict):
+                    value = next(iter(value.values()), None)
+                if value:
+                    owner[target] = str(value)
+                    break
+        return owner or None
+
+
+class FakePropertyProvider:
+    """
+    Offline address and owner provider (tests, dry runs).
+
+    Answers from the point itself after an optional delay and counts its
+    calls; ``misses`` is the share of points with no address.
+    """
+    name = "fake"
+
+    def __init__(self, latency_sec: float = 0.0, misses: float = 0.0, seed: int = 0):
+        self.latency_sec = latency_sec
+        self.misses = misses
+        self._random = random.Random(seed)
+        self.geocode_calls = 0
+        self.owner_calls = 0
+
+    async def reverse_geocode(self, client: httpx.AsyncClient, lat: float, lng: float) -> Optional[str]:
+        self.geocode_calls += 1
+        await asyncio.sleep(self.latency_sec)
+        if self._random.random() < self.misses:
+            return None
+        cell = geohash_encode(lat, lng, 8)
+        number = 100 + GEOHASH_ALPHABET.index(cell[-2]) * 32 + GEOHASH_ALPHABET.index(cell[-1])
+        return f"{number} {cell[:6].upper()} St"
+
+    async def lookup_owner(self, client: httpx.AsyncClient, address: str) -> Optional[Dict[str, str]]:
+        self.owner_calls += 1
+        await asyncio.sleep(self.latency_sec)
+        slug = address.split()[0] + address.split()[1].lower()
+        return {"owner_name": f"Owner {address.split()[0]}", "owner_email": f"owner+{slug}@example.com"}
+
+
+def geohash_encode(lat: float, lng: float, precision: int) -> str:
+    """Geohash of a point (``precision`` base32 characters)."""
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        bounds, coord = (lng_range, lng) if even else (lat_range, lat)
+        mid = (bounds[0] + bounds[1]) / 2
+        if coord >= mid:
+            value = (value << 1) | 1
+            bounds[0] = mid
+        else:
+            value <<= 1
+            bounds[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits, value = 0, 0
+    return "".join(chars)
+
+
+def geohash_cell_m(precision: int, lat: float) -> Tuple[float, float]:
+    """(height, width) in metres of a geohash cell at a latitude."""
+    lng_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    degree_m = math.pi * EARTH_RADIUS_M / 180
+    return 180 / 2 ** lat_bits * degree_m, 360 / 2 ** lng_bits * degree_m * math.cos(math.radians(lat))
+
+
+def distance_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Ground distance between two nearby points (equirectangular)."""
+    x = math.radians(lng2 - lng1) * math.cos(math.radians((lat1 + lat2) / 2))
+    y = math.radians(lat2 - lat1)
+    return math.hypot(x, y) * EARTH_RADIUS_M
+
+
+def _neighbour_prefixes(lat: float, lng: float, radius_m: float) -> List[str]:
+    """Geohash prefixes whose cells cover every point within radius_m of (lat, lng)."""
+    precision = 1
+    while precision < 12 and min(geohash_cell_m(precision + 1, lat)) >= radius_m:
+        precision += 1
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    dlng = dlat / max(math.cos(math.radians(lat)), 1e-6)
+    return sorted({geohash_encode(lat + sy * dlat, lng + sx * dlng, precision)
+                   for sy in (-1, 0, 1) for sx in (-1, 0, 1)})
+
+
+def roof_locations(
+    result: "AnalysisResult",
+    roof_ids: Iterable[int],
+    zoom: int,
+    tile_size: int = TILE_SIZE
+) -> Dict[int, Tuple[float, float]]:
+    """
+    Lat/lng of roof centers.
+
+    Args:
+        result: Analysis result the roofs belong to
+        roof_ids: Roofs to locate (unknown ids are skipped)
+        zoom: Zoom level of the result's imagery
+
+    Returns:
+        roof_id -> (lat, lng)
+    """
+    georef = mosaic_georef(result, zoom, tile_size)
+    roofs = {roof.id: roof for roof in result.roofs}
+    locations = {}
+    for roof_id in roof_ids:
+        roof = roofs.get(roof_id)
+        if roof is not None:
+            locations[roof_id] = pixel_to_lat_lng(*georef.to_global(roof.center[0], roof.center[1]), zoom, tile_size)
+    return locations
+
+
+def group_nearby(
+    locations: Dict[int, Tuple[float, float]],
+    radius_m: float
+) -> List[Tuple[Tuple[float, float], List[int]]]:
+    """
+    Merge points closer than radius_m to a group's first point.
+
+    Returns:
+        [(representative point, roof ids)] in input order
+    """
+    groups: List[Tuple[Tuple[float, float], List[int]]] = []
+    buckets: Dict[Tuple[int, int], List[int]] = {}
+    for roof_id, (lat, lng) in locations.items():
+        # Grid buckets of radius_m so only the 3x3 neighbourhood is compared
+        y_m = math.radians(lat) * EARTH_RADIUS_M
+        x_m = math.radians(lng) * math.cos(math.radians(lat)) * EARTH_RADIUS_M
+        cell = (math.floor(y_m / radius_m), math.floor(x_m / radius_m))
+        match = None
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                for index in buckets.get((cell[0] + dy, cell[1] + dx), ()):
+                    point = groups[index][0]
+                    if distance_m(lat, lng, *point) < radius_m:
+                        match = index
+                        break
+                if match is not None:
+                    break
+            if match is not None:
+                break
+        if match is None:
+            buckets.setdefault(cell, []).append(len(groups))
+            groups.append(((lat, lng), [roof_id]))
+        else:
+            groups[match][1].append(roof_id)
+    return groups
+
+
+class LookupCache:
+    """
+    Looked-up properties in SQLite, keyed by geohash.
+
+    ``nearest`` returns the closest unexpired record within a radius, so a
+    re-scan whose roof center moved by a pixel or two still hits.
+    """
+
+    def __init__(self, config: Optional[LookupConfig] = None):
+        self.config = config or LookupConfig()
+        self.root = Path(self.config.cache_dir)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(str(self.root / "properties.sqlite"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._upgrade()
+        self.purge()
+
+    def _upgrade(self) -> None:
+        """Drop records stored by an older CACHE_VERSION."""
+        with self._lock:
+            version = self._db.execute("PRAGMA user_version").fetchone()[0]
+            if version < CACHE_VERSION:
+                deleted = self._db.execute("DELETE FROM properties").rowcount
+                self._db.execute(f"PRAGMA user_version = {CACHE_VERSION}")
+                self._db.commit()
+                if deleted:
+                    logger.info(f"Property cache v{version} -> v{CACHE_VERSION}: dropped {deleted} records")
+
+    def nearest(self, lat: float, lng: float, radius_m: float) -> Optional[PropertyRecord]:
+        """Closest fresh record within radius_m of a point, or None."""
+        now = time.time()
+        best, best_distance = None, radius_m
+        with self._lock:
+            for prefix in _neighbour_prefixes(lat, lng, radius_m):
+                rows = self._db.execute(
+                    "SELECT lat, lng, found, data, stored_at FROM properties WHERE geohash >= ? AND geohash < ?",
+                    (prefix, prefix + "~")
+                ).fetchall()
+                for row_lat, row_lng, found, data, stored_at in rows:
+                    ttl = self.config.ttl_sec if found else self.config.negative_ttl_sec
+                    distance = distance_m(lat, lng, row_lat, row_lng)
+                    if stored_at + ttl > now and distance <= best_distance:
+                        best, best_distance = data, distance
+        if best is None:
+            return None
+        known = {f.name for f in fields(PropertyRecord)}
+        return PropertyRecord(**{k: v for k, v in json.loads(best).items() if k in known})
+
+    def put(self, record: PropertyRecord) -> None:
+        """Store a record at its point (replacing one in the same geohash cell)."""
+        key = geohash_encode(record.lat, record.lng, self.config.geohash_precision)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO properties (geohash, lat, lng, found, data, stored_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, record.lat, record.lng, int(record.found), json.dumps(asdict(record)), record.looked_up_at)
+            )
+            self._db.commit()
+
+    def purge(self) -> int:
+        """Delete expired records; returns how many."""
+        now = time.time()
+        with self._lock:
+            deleted = self._db.execute(
+                "DELETE FROM properties WHERE (found = 1 AND stored_at < ?) OR (found = 0 AND stored_at < ?)",
+                (now - self.config.ttl_sec, now - self.config.negative_ttl_sec)
+            ).rowcount
+            self._db.commit()
+        return deleted
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM properties").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class PropertyLookup:
+    """
+    Looks up the properties under damaged roofs.
+
+    One shared httpx client; ``close()`` when done (also closes the cache).
+    """
+
+    def __init__(
+        self,
+        addresses: AddressProvider,
+        owners: Optional[OwnerProvider] = None,
+        config: Optional[LookupConfig] = None,
+        cache: Optional[LookupCache] = None
+    ):
+        """
+        Args:
+            addresses: Reverse geocoder
+            owners: Owner lookup (addresses only if None)
+            config: Lookup settings (defaults if None)
+            cache: Persistent cache (every run pays for every property if None)
+        """
+        self.addresses = addresses
+        self.owners = owners
+        self.config = config or LookupConfig()
+        self.cache = cache
+        self.stats = LookupStats()
+        self._client = httpx.AsyncClient(timeout=self.config.timeout)
+
+    async def _call(self, counter: str, request):
+        """Run one provider request with full-jitter retries."""
+        for attempt in range(self.config.max_retries + 1):
+            setattr(self.stats, counter, getattr(self.stats, counter) + 1)
+            try:
+                return await request()
+            except (ProviderError, httpx.TransportError) as e:
+                retryable = getattr(e, "retryable", True)
+                if not retryable or attempt == self.config.max_retries:
+                    raise
+                self.stats.retries += 1
+                delay = min(self.config.backoff_max_sec, self.config.backoff_base_sec * 2 ** attempt)
+                await asyncio.sleep(random.uniform(0, delay))
+
+    async def _lookup(self, lat: float, lng: float) -> PropertyRecord:
+        record = PropertyRecord(lat=lat, lng=lng, looked_up_at=time.time())
+        record.address = await self._call(
+            "geocode_requests", lambda: self.addresses.reverse_geocode(self._client, lat, lng))
+        sources = [self.addresses.name]
+        if record.address and self.owners is not None:
+            owner = await self._call("owner_requests", lambda: self.owners.lookup_owner(self._client, record.address))
+            for name, value in (owner or {}).items():
+                setattr(record, name, value)
+            sources.append(self.owners.name)
+        record.source = "+".join(sources)
+        return record
+
+    async def lookup_many(self, locations: Dict[int, Tuple[float, float]]) -> Dict[int, PropertyRecord]:
+        """
+        Look up the property under each roof.
+
+        Args:
+            locations: roof_id -> (lat, lng), e.g. from roof_locations
+
+        Returns:
+            roof_id -> PropertyRecord; roofs whose lookup failed are missing
+        """
+        start = time.perf_counter()
+        groups = group_nearby(locations, self.config.dedupe_m)
+        self.stats.roofs += len(locations)
+        self.stats.properties += len(groups)
+        self.stats.roofs_merged += len(locations) - len(groups)
+        semaphore = asyncio.Semaphore(self.config.concurrency)
+        records: Dict[int, PropertyRecord] = {}
+
+        async def resolve(point: Tuple[float, float], roof_ids: List[int]) -> None:
+            record = None
+            if self.cache is not None:
+                record = await asyncio.to_thread(self.cache.nearest, *point, self.config.dedupe_m)
+            if record is not None:
+                self.stats.cache_hits += 1
+            else:
+                self.stats.cache_misses += 1
+                async with semaphore:
+                    try:
+                        record = await self._lookup(*point)
+                    except (ProviderError, httpx.HTTPError, ValueError) as e:
+                        self.stats.failed += 1
+                        logger.warning(f"Property lookup failed at {point[0]:.6f},{point[1]:.6f}: {e}")
+                        return
+                if self.cache is not None:
+                    await asyncio.to_thread(self.cache.put, record)
+            if not record.found:
+                self.stats.not_found += 1
+            for roof_id in roof_ids:
+                records[roof_id] = record
+
+        await asyncio.gather(*(resolve(point, roof_ids) for point, roof_ids in groups))
+        self.stats.elapsed_sec += time.perf_counter() - start
+        return records
+
+    async def close(self) -> None:
+        await self._client.aclose()
+        if self.cache is not None:
+            self.cache.close()
+
+    async def __aenter__(self) -> "PropertyLookup":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
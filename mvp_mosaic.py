@@ -0,0 +1,154 @@
+"""
+Windowed mosaics.
+Sharded runs (mvp_shards) detect on a TileMosaic, which assembles any
+chunk window from the encoded tiles on demand, so the block's full-size
+RGB canvas never exists in memory. It pickles as the tiles a window needs,
+so detection workers read their own windows. main.py analyze detects on the
+image the pipeline stitched in memory and does not use this module.
+"""
+import hashlib
+import io
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from mvp_geometry import TileKey, TILE_SIZE
+
+# (x0, y0, x1, y1) in mosaic pixels, x1/y1 exclusive
+Window = Tuple[int, int, int, int]
+
+
+class TileMosaic:
+    """
+    Virtual mosaic over a rectangle of encoded tiles.
+
+    Only the tiles a window touches are decoded, and only the last
+    ``cache_tiles`` decoded tiles are kept, so memory is bounded by the
+    window size, not by the mosaic size. Missing tiles read as black.
+    """
+
+    def __init__(
+        self,
+        tiles: Dict[TileKey, Optional[bytes]],
+        zoom: int,
+        x0: int,
+        y0: int,
+        cols: int,
+        rows: int,
+        tile_size: int = TILE_SIZE,
+        cache_tiles: int = 64
+    ):
+        self.tiles = tiles
+        self.zoom = zoom
+        self.x0 = x0
+        self.y0 = y0
+        self.cols = cols
+        self.rows = rows
+        self.tile_size = tile_size
+        self.cache_tiles = cache_tiles
+        self._decoded: "OrderedDict[TileKey, np.ndarray]" = OrderedDict()
+
+    @property
+    def width(self) -> int:
+        return self.cols * self.tile_size
+
+    @property
+    def height(self) -> int:
+        return self.rows * self.tile_size
+
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        return self.height, self.width, 3
+
+    def _keys(self, window: Window) -> Iterable[TileKey]:
+        x0, y0, x1, y1 = window
+        size = self.tile_size
+        for ty in range(y0 // size, min(self.rows, -(-y1 // size))):
+            for tx in range(x0 // size, min(self.cols, -(-x1 // size))):
+                yield self.zoom, self.x0 + tx, self.y0 + ty
+
+    def _tile(self, key: TileKey) -> Optional[np.ndarray]:
+        if key in self._decoded:
+            self._decoded.move_to_end(key)
+            return self._decoded[key]
+        data = self.tiles.get(key)
+        if not data:
+            return None
+        from PIL import Image
+        with Image.open(io.BytesIO(data)) as tile:
+            # Convert first: palette tiles would otherwise be resized nearest-neighbour
+            tile = tile.convert("RGB")
+            if tile.size != (self.tile_size, self.tile_size):
+                tile = tile.resize((self.tile_size, self.tile_size))
+            pixels = np.asarray(tile)
+        self._decoded[key] = pixels
+        if len(self._decoded) > self.cache_tiles:
+            self._decoded.popitem(last=False)
+        return pixels
+
+    def read(self, window: Window) -> np.ndarray:
+        """Pixels of a window as an HxWx3 uint8 array."""
+        x0, y0, x1, y1 = window
+        out = np.zeros((y1 - y0, x1 - x0, 3), dtype=np.uint8)
+        size = self.tile_size
+        for key in self._keys(window):
+            pixels = self._tile(key)
+            if pixels is None:
+                continue
+            left, top = (key[1] - self.x0) * size, (key[2] - self.y0) * size
+            ix0, iy0 = max(x0, left), max(y0, top)
+            ix1, iy1 = min(x1, left + size), min(y1, top + size)
+            out[iy0 - y0:iy1 - y0, ix0 - x0:ix1 - x0] = pixels[iy0 - top:iy1 - top, ix0 - left:ix1 - left]
+        return out
+
+    def subset(self, windows: Iterable[Window]) -> "TileMosaic":
+        """Same mosaic holding only the tiles the windows touch (to send to a worker)."""
+        keys = {key for window in windows for key in self._keys(window)}
+        tiles = {key: self.tiles[key] for key in keys if self.tiles.get(key)}
+        return TileMosaic(tiles, self.zoom, self.x0, self.y0, self.cols, self.rows, self.tile_size, self.cache_tiles)
+
+    def digest(self, window: Window) -> str:
+        """
+        Content hash of a window, without decoding it.
+
+        Covers the encoded tiles the window touches (by position relative
+        to the window's first tile), the window's offset in that tile and
+        its size, so equal pixels hash equally wherever the block starts.
+        """
+        x0, y0, x1, y1 = window
+        size = self.tile_size
+        first_x, first_y = self.x0 + x0 // size, self.y0 + y0 // size
+        h = hashlib.blake2b(f"tiles:{size}:{x0 % size}:{y0 % size}:{x1 - x0}:{y1 - y0}".encode(), digest_size=16)
+        for key in self._keys(window):
+            data = self.tiles.get(key) or b""
+            h.update(f"|{key[1] - first_x},{key[2] - first_y},{len(data)}|".encode())
+            h.update(data)
+        return h.hexdigest()
+
+    @property
+    def encoded_bytes(self) -> int:
+        return sum(len(data) for data in self.tiles.values() if data)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_decoded"] = OrderedDict()
+        return state
+
+
+def window_digest(source, window: Window) -> str:
+    """Content hash of a window of any read_window source (tile bytes for TileMosaic, pixels otherwise)."""
+    if isinstance(source, TileMosaic):
+        return source.digest(window)
+    pixels = read_window(source, window)
+    h = hashlib.blake2b(f"pixels:{pixels.shape}:{pixels.dtype.str}".encode(), digest_size=16)
+    h.update(memoryview(pixels).cast("B"))
+    return h.hexdigest()
+
+
+def read_window(source, window: Window) -> np.ndarray:
+    """Window of a TileMosaic or an in-memory HxWx3 array."""
+    if hasattr(source, "read"):
+        return source.read(window)
+    x0, y0, x1, y1 = window
+    return np.ascontiguousarray(source[y0:y1, x0:x1])
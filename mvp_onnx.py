@@ -0,0 +1,261 @@
+"""
+ONNX Runtime inference backend for the YOLO models.
+Exports roof_detector.pt / damage_detector.pt to ONNX once (optionally
+INT8-quantized), caches the exported files by model content, and checks
+them against the PyTorch outputs before use. The pipeline's detectors
+load models through ultralytics, which runs an .onnx path with ONNX
+Runtime, so pointing PipelineConfig's model paths at the export switches
+the backend.
+"""
+import hashlib
+import json
+import shutil
+import time
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import List, Optional, Sequence, Union
+
+from loguru import logger
+
+BACKEND_TORCH = "torch"
+BACKEND_ONNX = "onnx"
+BACKEND_ONNX_INT8 = "onnx-int8"
+BACKENDS = (BACKEND_TORCH, BACKEND_ONNX, BACKEND_ONNX_INT8)
+
+# Bumped when the export settings change, so stale exports are not reused
+EXPORT_VERSION = 1
+
+
+@dataclass
+class OnnxExportConfig:
+    """How models are exported and checked."""
+    cache_dir: str = "models/onnx"
+    imgsz: int = 640
+    opset: int = 17
+    dynamic_batch: bool = True      # Batch dimension left free for batched chunks
+    check_iou: float = 0.5          # Boxes matching at this IoU count as the same detection
+    min_recall: float = 0.95        # Share of PyTorch detections the export must reproduce
+    max_conf_delta: float = 0.05    # Mean confidence difference allowed on matched boxes
+    check_images: int = 16          # Sample images used by the accuracy check
+
+
+@dataclass
+class ExportCheck:
+    """Accuracy of an exported model against its PyTorch original."""
+    reference_boxes: int
+    matched_boxes: int
+    extra_boxes: int
+    recall: float
+    mean_conf_delta: float
+    torch_ms_per_image: float
+    onnx_ms_per_image: float
+    passed: bool
+
+
+def model_digest(path: Union[str, Path]) -> str:
+    """SHA-256 of a model file (first 16 hex digits)."""
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            sha.update(block)
+    return sha.hexdigest()[:16]
+
+
+def export_path(model_path: Union[str, Path], config: OnnxExportConfig, int8: bool) -> Path:
+    """Cache location of a model's export; changes whenever the model or export settings change."""
+    model_path = Path(model_path)
+    suffix = "-int8" if int8 else ""
+    key = f"{model_digest(model_path)}-{config.imgsz}-op{config.opset}-v{EXPORT_VERSION}"
+    return Path(config.cache_dir) / f"{model_path.stem}-{key}{suffix}.onnx"
+
+
+def export_model(model_path: Union[str, Path], config: Optional[OnnxExportConfig] = None, int8: bool = False) -> Path:
+    """
+    Export a YOLO .pt model to ONNX, reusing a cached export.
+
+    Args:
+        model_path: Ultralytics .pt weights
+        config: Export settings (defaults if None)
+        int8: Also quantize the weights to INT8 (dynamic quantization)
+
+    Returns:
+        Path of the (cached) .onnx file
+    """
+    config = config or OnnxExportConfig()
+    target = export_path(model_path, config, int8)
+    if target.exists():
+        return target
+    target.parent.mkdir(parents=True, exist_ok=True)
+
+    fp32_target = export_path(model_path, config, int8=False)
+    if not fp32_target.exists():
+        from ultralytics import YOLO
+        start = time.perf_counter()
+        exported = YOLO(str(model_path)).export(
+            format="onnx", imgsz=config.imgsz, opset=config.opset, dynamic=config.dynamic_batch, simplify=True
+        )
+        # Export lands next to the weights; move it into the cache atomically
+        tmp_path = fp32_target.with_suffix(".onnx.tmp")
+        shutil.move(str(exported), tmp_path)
+        tmp_path.replace(fp32_target)
+        logger.info(f"Exported {Path(model_path).name} to ONNX in {time.perf_counter() - start:.1f}s")
+
+    if int8:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        tmp_path = target.with_suffix(".onnx.tmp")
+        quantize_dynamic(str(fp32_target), str(tmp_path), weight_type=QuantType.QUInt8)
+        tmp_path.replace(target)
+        logger.info(f"Quantized {fp32_target.name} to INT8")
+    return target
+
+
+def _boxes(results) -> List[tuple]:
+    """(x1, y1, x2, y2, conf, cls) per detection of one ultralytics result."""
+    boxes = results.boxes
+    if boxes is None or len(boxes) == 0:
+        return []
+    xyxy = boxes.xyxy.cpu().numpy()
+    conf = boxes.conf.cpu().numpy()
+    cls = boxes.cls.cpu().numpy()
+    return [(*map(float, xyxy[i]), float(conf[i]), int(cls[i])) for i in range(len(conf))]
+
+
+def _iou(a: tuple, b: tuple) -> float:
+    ix = max(0.0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0.0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def check_export(
+    model_path: Union[str, Path],
+    onnx_path: Union[str, Path],
+    images: Sequence,
+    confidence: float = 0.25,
+    config: Optional[OnnxExportConfig] = None
+) -> ExportCheck:
+    """
+    Compare an export's detections with the PyTorch model's on sample images.
+
+    Both models see the same batch; a PyTorch box counts as reproduced when
+    the export has a box of the same class at check_iou or more.
+
+    Args:
+        model_path: Original .pt weights
+        onnx_path: Exported model
+        images: Sample images (paths or HxWx3 arrays)
+        confidence: Detection threshold used for both
+        config: Thresholds (defaults if None)
+
+    Returns:
+        ExportCheck
+    """
+    from ultralytics import YOLO
+    config = config or OnnxExportConfig()
+    images = list(images)
+
+    timings = {}
+    outputs = {}
+    for name, path in (("torch", model_path), ("onnx", onnx_path)):
+        model = YOLO(str(path))
+        model.predict(images[:1], imgsz=config.imgsz, conf=confidence, verbose=False)  # Warm-up
+        start = time.perf_counter()
+        outputs[name] = [_boxes(r) for r in model.predict(images, imgsz=config.imgsz, conf=confidence,
+                                                          verbose=False)]
+        timings[name] = (time.perf_counter() - start) * 1000 / max(1, len(images))
+
+    reference = matched = extra = 0
+    deltas = []
+    for expected, actual in zip(outputs["torch"], outputs["onnx"]):
+        reference += len(expected)
+        unused = list(actual)
+        for box in expected:
+            best = max(((_iou(box, other), other) for other in unused if other[5] == box[5]),
+                       default=(0.0, None), key=lambda pair: pair[0])
+            if best[1] is not None and best[0] >= config.check_iou:
+                matched += 1
+                deltas.append(abs(box[4] - best[1][4]))
+                unused.remove(best[1])
+        extra += len(unused)
+
+    recall = matched / reference if reference else 1.0
+    mean_delta = sum(deltas) / len(deltas) if deltas else 0.0
+    return ExportCheck(
+        reference_boxes=reference,
+        matched_boxes=matched,
+        extra_boxes=extra,
+        recall=round(recall, 4),
+        mean_conf_delta=round(mean_delta, 4),
+        torch_ms_per_image=round(timings["torch"], 1),
+        onnx_ms_per_image=round(timings["onnx"], 1),
+        passed=recall >= config.min_recall and mean_delta <= config.max_conf_delta
+    )
+
+
+def sample_images(tile_dir: Union[str, Path], limit: int) -> List[str]:
+    """Up to `limit` cached tile images to check exports on."""
+    tile_dir = Path(tile_dir)
+    if not tile_dir.is_dir():
+        return []
+    return [str(p) for p in sorted(tile_dir.glob("*.png"))[:limit]]
+
+
+def prepare_model(
+    model_path: Union[str, Path],
+    backend: str,
+    images: Sequence = (),
+    confidence: float = 0.25,
+    config: Optional[OnnxExportConfig] = None
+) -> str:
+    """
+    Model path to load for a backend.
+
+    Exports (once) and checks the model for the ONNX backends. The check
+    result is stored next to the export, so it also runs once. Falls back
+    to the .pt weights when the export fails or does not pass the check.
+
+    Args:
+        model_path: Original .pt weights
+        backend: One of BACKENDS
+        images: Sample images for the accuracy check (skipped if empty)
+        confidence: Detection threshold used in the check
+        config: Export settings (defaults if None)
+
+    Returns:
+        Path of the model file the detectors should load
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}' (expected one of {', '.join(BACKENDS)})")
+    if backend == BACKEND_TORCH or not str(model_path).endswith(".pt") or not Path(model_path).exists():
+        return str(model_path)
+    config = config or OnnxExportConfig()
+    try:
+        onnx_path = export_model(model_path, config, int8=backend == BACKEND_ONNX_INT8)
+    except Exception as e:
+        logger.warning(f"ONNX export of {Path(model_path).name} failed ({e}); using PyTorch")
+        return str(model_path)
+
+    check_path = onnx_path.with_suffix(".check.json")
+    if check_path.exists():
+        with open(check_path, 'r', encoding='utf-8') as f:
+            check = ExportCheck(**json.load(f))
+    elif images:
+        try:
+            check = check_export(model_path, onnx_path, images, confidence, config)
+        except Exception as e:
+            logger.warning(f"Could not run {onnx_path.name} ({e}); using PyTorch")
+            return str(model_path)
+        with open(check_path, 'w', encoding='utf-8') as f:
+            json.dump(asdict(check), f, indent=2)
+    else:
+        logger.warning(f"No sample images to check {onnx_path.name}; using it unchecked")
+        return str(onnx_path)
+
+    logger.info(f"{onnx_path.name}: recall {check.recall:.1%} of {check.reference_boxes} PyTorch boxes, "
+                f"conf delta {check.mean_conf_delta:.3f}, "
+                f"{check.torch_ms_per_image:.0f} -> {check.onnx_ms_per_image:.0f} ms/image")
+    if not check.passed:
+        logger.warning(f"{onnx_path.name} failed the accuracy check; using PyTorch")
+        return str(model_path)
+    return str(onnx_path)
@@ -0,0 +1,359 @@
+"""
+Tiled output of the annotated layer and damage heatmap.
+Instead of two full-size PNGs, detections are rendered straight into XYZ
+overlay tiles (transparent PNG, Web-Mercator, same grid as the imagery) for
+every zoom from the imagery's down to ``min_zoom``. Only tiles a detection
+touches are rendered, and tiles are drawn and encoded on a thread pool, so
+the cost follows the damage found rather than the mosaic size. Viewers can
+load the pyramid as an overlay (tilejson.json per layer), and email crops
+read just the tiles around one roof.
+"""
+import io
+import json
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from loguru import logger
+
+from mvp_artifacts import PYRAMID_NAME
+from mvp_crops import roof_bbox
+from mvp_costs import SEVERITY_MULTIPLIERS
+from mvp_geometry import TILE_SIZE, MosaicGeoref, TileKey, mosaic_georef, pixel_to_lat_lng
+
+if TYPE_CHECKING:
+    from PIL import Image
+    from src.output.json_generator import AnalysisResult
+
+LAYERS = ("annotated", "heatmap")
+
+# Overlay colours (RGBA)
+ROOF_COLOR = (0, 200, 83, 255)
+SEVERITY_COLORS = {
+    "low": (41, 121, 255, 255),
+    "medium": (255, 214, 0, 255),
+    "high": (255, 109, 0, 255),
+    "critical": (213, 0, 0, 255),
+}
+# Heatmap ramp: intensity 0..1 -> yellow -> orange -> red
+HEAT_STOPS = np.array([0.0, 0.5, 1.0])
+HEAT_RGB = np.array([[255, 235, 59], [255, 152, 0], [211, 47, 47]], dtype=np.float64)
+
+
+@dataclass
+class PyramidConfig:
+    """Settings for the tiled output."""
+    min_zoom: int = 16              # Lowest overview level (zoom 16 tile ~ 32 zoom-21 tiles across)
+    workers: int = max(1, min(8, os.cpu_count() or 1))   # Threads drawing/encoding tiles
+    compress_level: int = 6         # PNG zlib level
+    line_px: float = 2.0            # Outline width at the imagery zoom
+    heat_saturation: float = 3.0    # Severity weight at which the heatmap is fully red
+    heat_alpha: float = 0.6
+
+
+@dataclass
+class PyramidStats:
+    """What write_pyramid produced."""
+    tiles: Dict[str, int] = field(default_factory=dict)    # Per layer
+    tiles_per_zoom: Dict[int, int] = field(default_factory=dict)
+    bytes_written: int = 0
+    elapsed_sec: float = 0.0
+
+
+@dataclass
+class _Shape:
+    """A detection in global pixels at the imagery zoom."""
+    box: Tuple[float, float, float, float]
+    polygon: Optional[List[Tuple[float, float]]] = None
+    color: Tuple[int, int, int, int] = ROOF_COLOR
+    weight: float = 0.0             # Heatmap weight (damages only)
+
+
+def _global_box(georef: MosaicGeoref, box: Tuple[float, float, float, float]) -> Tuple[float, float, float, float]:
+    return (*georef.to_global(box[0], box[1]), *georef.to_global(box[2], box[3]))
+
+
+def _shapes(result: "AnalysisResult", georef: MosaicGeoref) -> Tuple[List[_Shape], List[_Shape]]:
+    """(roof outlines, damages) of a result in global pixels."""
+    roofs = []
+    for roof in result.roofs:
+        polygon = getattr(roof, 'polygon', None)
+        roofs.append(_Shape(
+            box=_global_box(georef, roof_bbox(roof)),
+            polygon=[georef.to_global(px, py) for px, py in polygon] if polygon and len(polygon) >= 3 else None
+        ))
+    damages = []
+    for damage in result.damages:
+        severity = damage.severity.value
+        damages.append(_Shape(
+            box=_global_box(georef, roof_bbox(damage)),
+            color=SEVERITY_COLORS.get(severity, SEVERITY_COLORS["low"]),
+            weight=SEVERITY_MULTIPLIERS.get(severity, 1.0)
+        ))
+    return roofs, damages
+
+
+def _tile_index(shapes: List[_Shape], scale: float, pad: float) -> Dict[Tuple[int, int], List[int]]:
+    """(x, y) tile -> indices of the shapes touching it, at a zoom ``scale`` times the imagery's."""
+    index: Dict[Tuple[int, int], List[int]] = {}
+    for i, shape in enumerate(shapes):
+        x1, y1, x2, y2 = (v * scale for v in shape.box)
+        for ty in range(int((y1 - pad) // TILE_SIZE), int((y2 + pad) // TILE_SIZE) + 1):
+            for tx in range(int((x1 - pad) // TILE_SIZE), int((x2 + pad) // TILE_SIZE) + 1):
+                index.setdefault((tx, ty), []).append(i)
+    return index
+
+
+def _encode(image: "Image.Image", compress_level: int) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", compress_level=compress_level)
+    return buffer.getvalue()
+
+
+def _render_annotated(shapes: List[_Shape], indices: List[int], tx: int, ty: int, scale: float,
+                      config: PyramidConfig) -> "Image.Image":
+    from PIL import Image, ImageDraw
+    tile = Image.new("RGBA", (TILE_SIZE, TILE_SIZE), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(tile)
+    width = max(1, round(config.line_px * max(scale, 0.5)))
+    left, top = tx * TILE_SIZE, ty * TILE_SIZE
+    for i in indices:
+        shape = shapes[i]
+        if shape.polygon is not None:
+            draw.polygon([(px * scale - left, py * scale - top) for px, py in shape.polygon],
+                         outline=shape.color, width=width)
+        else:
+            x1, y1, x2, y2 = shape.box
+            draw.rectangle((x1 * scale - left, y1 * scale - top, x2 * scale - left, y2 * scale - top),
+                           outline=shape.color, width=width)
+    return tile
+
+
+def _render_heatmap(shapes: List[_Shape], indices: List[int], tx: int, ty: int, scale: float,
+                    config: PyramidConfig) -> Optional["Image.Image"]:
+    from PIL import Image
+    heat = np.zeros((TILE_SIZE, TILE_SIZE), dtype=np.float32)
+    left, top = tx * TILE_SIZE, ty * TILE_SIZE
+    for i in indices:
+        x1, y1, x2, y2 = shapes[i].box
+        # Pixels whose centre is inside the box; at least one pixel when zoomed out
+        c0 = min(max(int(math.floor(x1 * scale - left + 0.5)), 0), TILE_SIZE)
+        r0 = min(max(int(math.floor(y1 * scale - top + 0.5)), 0), TILE_SIZE)
+        c1 = min(max(int(math.floor(x2 * scale - left + 0.5)), c0 + 1), TILE_SIZE)
+        r1 = min(max(int(math.floor(y2 * scale - top + 0.5)), r0 + 1), TILE_SIZE)
+        if c1 > c0 and r1 > r0:
+            heat[r0:r1, c0:c1] += shapes[i].weight
+    if not heat.any():
+        return None
+    intensity = np.clip(heat / config.heat_saturation, 0.0, 1.0)
+    rgba = np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8)
+    for channel in range(3):
+        rgba[..., channel] = np.interp(intensity, HEAT_STOPS, HEAT_RGB[:, channel]).astype(np.uint8)
+    rgba[..., 3] = np.where(heat > 0, (64 + 191 * intensity) * config.heat_alpha, 0).astype(np.uint8)
+    return Image.fromarray(rgba, "RGBA")
+
+
+_RENDERERS = {"annotated": _render_annotated, "heatmap": _render_heatmap}
+
+
+def _tilejson(result: "AnalysisResult", layer: str, min_zoom: int, max_zoom: int,
+              extent: Tuple[float, float, float, float]) -> Dict:
+    """TileJSON 3.0 for one layer (tile URLs relative to the layer directory)."""
+    x1, y1, x2, y2 = extent
+    north, west = pixel_to_lat_lng(x1, y1, max_zoom)
+    south, east = pixel_to_lat_lng(x2, y2, max_zoom)
+    return {
+        "tilejson": "3.0.0",
+        "name": f"{result.zipcode} {layer}",
+        "scheme": "xyz",
+        "tiles": ["{z}/{x}/{y}.png"],
+        "minzoom": min_zoom,
+        "maxzoom": max_zoom,
+        "bounds": [west, south, east, north],
+        "center": [result.center_lng, result.center_lat, max_zoom],
+    }
+
+
+def write_pyramid(
+    result: "AnalysisResult",
+    out_dir: Union[str, Path],
+    zoom: int = 21,
+    config: Optional[PyramidConfig] = None
+) -> PyramidStats:
+    """
+    Render a result's annotated layer and heatmap as XYZ overlay tiles.
+
+    Layout::
+
+        <out_dir>/pyramid.json                   layers, zooms, tile counts
+        <out_dir>/<layer>/tilejson.json
+        <out_dir>/<layer>/<z>/<x>/<y>.png
+
+    Args:
+        result: Analysis result (pixel coordinates of its image)
+        out_dir: Directory to write (created)
+        zoom: Zoom level of the result's imagery (highest pyramid level)
+        config: Pyramid settings (defaults if None)
+
+    Returns:
+        PyramidStats
+    """
+    config = config or PyramidConfig()
+    start = time.perf_counter()
+    out_dir = Path(out_dir)
+    georef = mosaic_georef(result, zoom)
+    roofs, damages = _shapes(result, georef)
+    layers = {"annotated": roofs + damages, "heatmap": damages}
+    stats = PyramidStats(tiles={layer: 0 for layer in LAYERS})
+    min_zoom = min(config.min_zoom, zoom)
+
+    def render(layer: str, z: int, tx: int, ty: int, indices: List[int], scale: float) -> int:
+        image = _RENDERERS[layer](layers[layer], indices, tx, ty, scale, config)
+        if image is None:
+            return 0
+        data = _encode(image, config.compress_level)
+        path = out_dir / layer / str(z) / str(tx) / f"{ty}.png"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        return len(data)
+
+    with ThreadPoolExecutor(max_workers=config.workers) as executor:
+        jobs = []
+        for z in range(zoom, min_zoom - 1, -1):
+            scale = 2.0 ** (z - zoom)
+            for layer in LAYERS:
+                pad = config.line_px if layer == "annotated" else 0.0
+                for (tx, ty), indices in _tile_index(layers[layer], scale, pad).items():
+                    jobs.append((layer, z, executor.submit(render, layer, z, tx, ty, indices, scale)))
+        for layer, z, job in jobs:
+            written = job.result()
+            if written:
+                stats.tiles[layer] += 1
+                stats.tiles_per_zoom[z] = stats.tiles_per_zoom.get(z, 0) + 1
+                stats.bytes_written += written
+
+    shapes = roofs + damages
+    if shapes:
+        extent = (min(s.box[0] for s in shapes), min(s.box[1] for s in shapes),
+                  max(s.box[2] for s in shapes), max(s.box[3] for s in shapes))
+    else:
+        extent = _global_box(georef, (0, 0, result.image_width, result.image_height))
+    for layer in LAYERS:
+        (out_dir / layer).mkdir(parents=True, exist_ok=True)
+        with open(out_dir / layer / "tilejson.json", 'w', encoding='utf-8') as f:
+            json.dump(_tilejson(result, layer, min_zoom, zoom, extent), f, indent=2)
+    stats.elapsed_sec = time.perf_counter() - start
+    with open(out_dir / PYRAMID_NAME, 'w', encoding='utf-8') as f:
+        json.dump({
+            "zipcode": result.zipcode,
+            "layers": list(LAYERS),
+            "min_zoom": min_zoom,
+            "max_zoom": zoom,
+            "tile_size": TILE_SIZE,
+            "origin_px": list(georef.origin),
+            "image_scale": georef.scale,
+            **asdict(stats),
+        }, f, indent=2)
+    logger.info(f"Wrote {sum(stats.tiles.values())} overlay tiles ({stats.bytes_written / 1024 ** 2:.1f} MB) "
+                f"for zooms {min_zoom}-{zoom} in {stats.elapsed_sec:.2f}s")
+    return stats
+
+
+class TilePyramid:
+    """Reads windows of a pyramid written by write_pyramid."""
+
+    def __init__(self, path: Union[str, Path]):
+        """
+        Args:
+            path: Pyramid directory (or its pyramid.json)
+        """
+        path = Path(path)
+        self.root = path.parent if path.name == PYRAMID_NAME else path
+        with open(self.root / PYRAMID_NAME, 'r', encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.max_zoom = self.meta["max_zoom"]
+        self.min_zoom = self.meta["min_zoom"]
+        self.origin_px = tuple(self.meta["origin_px"])
+        # Global pixels per result image pixel (the stitcher may shrink its output)
+        self.image_scale = self.meta.get("image_scale", 1.0)
+
+    def tile_path(self, layer: str, z: int, x: int, y: int) -> Path:
+        return self.root / layer / str(z) / str(x) / f"{y}.png"
+
+    def _global_window(self, window: Tuple[int, int, int, int], scale: float = 1.0) -> Tuple[int, int, int, int]:
+        """Global pixels covering an image window, at a zoom ``scale`` times max_zoom."""
+        ox, oy = self.origin_px
+        gx0 = int(math.floor((ox + window[0] * self.image_scale) * scale))
+        gy0 = int(math.floor((oy + window[1] * self.image_scale) * scale))
+        gx1 = max(gx0 + 1, int(math.ceil((ox + window[2] * self.image_scale) * scale)))
+        gy1 = max(gy0 + 1, int(math.ceil((oy + window[3] * self.image_scale) * scale)))
+        return gx0, gy0, gx1, gy1
+
+    def read(self, layer: str, window: Tuple[int, int, int, int], zoom: Optional[int] = None) -> np.ndarray:
+        """
+        Window of a layer as an HxWx4 RGBA array (transparent where nothing was drawn).
+
+        Args:
+            layer: "annotated" or "heatmap"
+            window: (x0, y0, x1, y1) in result image pixels (imagery zoom), x1/y1 exclusive
+            zoom: Pyramid level to read (max_zoom if None); the window is
+                  scaled down accordingly
+
+        The array is in pyramid pixels, so it is ``image_scale`` times the
+        window's size at max_zoom.
+        """
+        from PIL import Image
+        zoom = self.max_zoom if zoom is None else zoom
+        gx0, gy0, gx1, gy1 = self._global_window(window, 2.0 ** (zoom - self.max_zoom))
+        out = np.zeros((gy1 - gy0, gx1 - gx0, 4), dtype=np.uint8)
+        for ty in range(gy0 // TILE_SIZE, (gy1 - 1) // TILE_SIZE + 1):
+            for tx in range(gx0 // TILE_SIZE, (gx1 - 1) // TILE_SIZE + 1):
+                path = self.tile_path(layer, zoom, tx, ty)
+                if not path.exists():
+                    continue
+                with Image.open(path) as tile:
+                    pixels = np.asarray(tile.convert("RGBA"))
+                left, top = tx * TILE_SIZE, ty * TILE_SIZE
+                ix0, iy0 = max(gx0, left), max(gy0, top)
+                ix1, iy1 = min(gx1, left + TILE_SIZE), min(gy1, top + TILE_SIZE)
+                out[iy0 - gy0:iy1 - gy0, ix0 - gx0:ix1 - gx0] = pixels[iy0 - top:iy1 - top, ix0 - left:ix1 - left]
+        return out
+
+    def composite(
+        self,
+        layer: str,
+        window: Tuple[int, int, int, int],
+        basemap: Optional[Callable[[TileKey], Optional[bytes]]] = None,
+        background: Tuple[int, int, int] = (128, 128, 128)
+    ) -> "Image.Image":
+        """
+        A layer window drawn over the imagery (RGB).
+
+        Args:
+            layer: "annotated" or "heatmap"
+            window: (x0, y0, x1, y1) in result image pixels
+            basemap: Imagery tile source at max_zoom (e.g. the tile cache);
+                     missing tiles show ``background``
+        """
+        from PIL import Image
+        overlay = Image.fromarray(self.read(layer, window), "RGBA")
+        base = Image.new("RGB", overlay.size, background)
+        if basemap is not None:
+            gx0, gy0 = self._global_window(window)[:2]
+            for ty in range(gy0 // TILE_SIZE, (gy0 + overlay.height - 1) // TILE_SIZE + 1):
+                for tx in range(gx0 // TILE_SIZE, (gx0 + overlay.width - 1) // TILE_SIZE + 1):
+                    data = basemap((self.max_zoom, tx, ty))
+                    if not data:
+                        continue
+                    with Image.open(io.BytesIO(data)) as tile:
+                        tile = tile.convert("RGB")
+                        if tile.size != (TILE_SIZE, TILE_SIZE):
+                            tile = tile.resize((TILE_SIZE, TILE_SIZE))
+                        base.paste(tile, (tx * TILE_SIZE - gx0, ty * TILE_SIZE - gy0))
+        base.paste(overlay, (0, 0), overlay)
+        return base
@@ -0,0 +1,249 @@
+"""
+Saved analysis results.
+Loads a pipeline result file ({zipcode}_{ts}.json) back into an object with
+the same fields as AnalysisResult, so costs and emails can be produced from
+disk without importing the detection stack.
+"""
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+# Sections the pipeline may nest result metadata under
+METADATA_SECTIONS = ("metadata", "summary", "image", "location", "statistics")
+
+# Result files are written as {zipcode}_{unix_ts}.json
+RESULT_FILE_PATTERN = re.compile(r"^\d{5}_\d+\.json$")
+
+
+@dataclass(frozen=True)
+class Label:
+    """Stands in for the DamageType / DamageSeverity enums (only .value is read)."""
+    value: str
+
+
+@dataclass
+class SavedRoof:
+    """Roof as read back from a result file."""
+    id: int
+    bbox: Optional[Tuple[float, float, float, float]]
+    center: Tuple[float, float]
+    area_pixels: int
+    confidence: float
+
+
+@dataclass
+class SavedDamage:
+    """Damage as read back from a result file."""
+    damage_type: Label
+    severity: Label
+    area_pixels: int
+    roof_id: Optional[int]
+    bbox: Optional[Tuple[float, float, float, float]]
+    confidence: float
+
+
+@dataclass
+class SavedResult:
+    """Field-for-field stand-in for AnalysisResult, built from a result file."""
+    zipcode: str
+    timestamp: Any
+    processing_time_sec: float
+    center_lat: float
+    center_lng: float
+    bounding_box: Any
+    image_width: int
+    image_height: int
+    tiles_processed: int
+    roofs: List[SavedRoof]
+    damages: List[SavedDamage]
+    total_roofs: int
+    roofs_with_damage: int
+    total_damage_area_pixels: int
+    performance: Dict[str, Any] = field(default_factory=dict)
+    source_path: Optional[str] = None
+
+    @property
+    def damage_summary(self) -> Dict[str, int]:
+        """Damage count per severity."""
+        summary: Dict[str, int] = {}
+        for damage in self.damages:
+            summary[damage.severity.value] = summary.get(damage.severity.value, 0) + 1
+        return summary
+
+
+def _lookup(data: dict, *keys: str, default=None):
+    """First of `keys` found at the top level or in a metadata section."""
+    sections = [data] + [data[s] for s in METADATA_SECTIONS if isinstance(data.get(s), dict)]
+    for key in keys:
+        for section in sections:
+            if section.get(key) is not None:
+                return section[key]
+    return default
+
+
+def _box(value) -> Optional[Tuple[float, float, float, float]]:
+    if value is None:
+        return None
+    if isinstance(value, dict):
+        if "x1" in value:
+            return value["x1"], value["y1"], value["x2"], value["y2"]
+        return value["x"], value["y"], value["x"] + value["width"], value["y"] + value["height"]
+    return tuple(float(v) for v in value[:4])
+
+
+def _point(value) -> Tuple[float, float]:
+    if value is None:
+        return 0.0, 0.0
+    if isinstance(value, dict):
+        return float(value["x"]), float(value["y"])
+    return float(value[0]), float(value[1])
+
+
+def _label(value) -> Label:
+    if isinstance(value, dict):
+        value = value.get("value") or value.get("name")
+    return Label(str(value).lower() if value is not None else "unknown")
+
+
+def _roof(data: dict, index: int) -> SavedRoof:
+    bbox = _box(data.get("bbox"))
+    center = data.get("center")
+    if center is None and bbox is not None:
+        center = ((bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2)
+    return SavedRoof(
+        id=int(data.get("id", data.get("roof_id", index + 1))),
+        bbox=bbox,
+        center=_point(center),
+        area_pixels=int(data.get("area_pixels", data.get("area", 0))),
+        confidence=float(data.get("confidence", 0.0))
+    )
+
+
+def _damage(data: dict, roof_id: Optional[int] = None) -> SavedDamage:
+    roof_id = data.get("roof_id", roof_id)
+    return SavedDamage(
+        damage_type=_label(data.get("damage_type", data.get("type"))),
+        severity=_label(data.get("severity")),
+        area_pixels=int(data.get("area_pixels", data.get("area", 0))),
+        roof_id=int(roof_id) if roof_id is not None else None,
+        bbox=_box(data.get("bbox")),
+        confidence=float(data.get("confidence", 0.0))
+    )
+
+
+def parse_result(data: dict, source_path: Optional[str] = None) -> SavedResult:
+    """
+    Build a SavedResult from a parsed result file.
+
+    Damages may be listed at the top level or nested under their roof.
+
+    Args:
+        data: Parsed JSON of a result file
+        source_path: File the data came from (kept for reporting)
+
+    Returns:
+        SavedResult
+    """
+    roofs, damages = [], []
+    for index, roof_data in enumerate(data.get("roofs", [])):
+        roof = _roof(roof_data, index)
+        roofs.append(roof)
+        damages.extend(_damage(d, roof.id) for d in roof_data.get("damages", []))
+    damages.extend(_damage(d) for d in data.get("damages", []))
+
+    center = _lookup(data, "center")
+    center_lat = _lookup(data, "center_lat", default=center[0] if isinstance(center, list) else 0.0)
+    center_lng = _lookup(data, "center_lng", default=center[1] if isinstance(center, list) else 0.0)
+
+    return SavedResult(
+        zipcode=str(_lookup(data, "zipcode", default="")),
+        timestamp=_lookup(data, "timestamp"),
+        processing_time_sec=float(_lookup(data, "processing_time_sec", default=0.0)),
+        center_lat=float(center_lat),
+        center_lng=float(center_lng),
+        bounding_box=_lookup(data, "bounding_box"),
+        image_width=int(_lookup(data, "image_width", "width", default=0)),
+        image_height=int(_lookup(data, "image_height", "height", default=0)),
+        tiles_processed=int(_lookup(data, "tiles_processed", default=0)),
+        roofs=roofs,
+        damages=damages,
+        total_roofs=len(roofs),
+        roofs_with_damage=len({d.roof_id for d in damages if d.roof_id is not None}),
+        total_damage_area_pixels=sum(d.area_pixels for d in damages),
+        performance=_lookup(data, "performance", default={}) or {},
+        source_path=source_path
+    )
+
+
+def load_result(path: str) -> SavedResult:
+    """
+    Load a saved result file.
+
+    Args:
+        path: {zipcode}_{ts}.json written by the pipeline
+
+    Returns:
+        SavedResult usable wherever an AnalysisResult is read
+
+    Raises:
+        ValueError: If the file is not a result file
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if not isinstance(data, dict) or "roofs" not in data:
+        raise ValueError(f"{Path(path).name} is not an analysis result file")
+    return parse_result(data, source_path=str(path))
+
+
+def find_result_files(path: str) -> List[Path]:
+    """
+    Result files at a path.
+
+    Args:
+        path: A result file, or a directory searched recursively (e.g. the
+              output folder with its run directories)
+
+    Returns:
+        Result file paths, sorted
+    """
+    root = Path(path)
+    if root.is_file():
+        return [root]
+    return sorted(p for p in root.rglob("*.json") if RESULT_FILE_PATTERN.match(p.name))
+
+
+def _load_or_error(path: str) -> Union[SavedResult, Exception]:
+    try:
+        return load_result(path)
+    except Exception as e:  # Reported per file by the caller
+        return e
+
+
+def load_results(
+    paths: List[Path],
+    max_workers: Optional[int] = None
+) -> List[Tuple[Path, Union[SavedResult, Exception]]]:
+    """
+    Load many result files in parallel worker processes.
+
+    JSON parsing holds the GIL, so files are spread over processes rather
+    than threads. A file that fails to load yields its exception instead
+    of stopping the others.
+
+    Args:
+        paths: Result files
+        max_workers: Worker processes (default: CPU count)
+
+    Returns:
+        (path, SavedResult or exception) in input order
+    """
+    if len(paths) <= 1:
+        return [(p, _load_or_error(str(p))) for p in paths]
+    workers = min(len(paths), max_workers or os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        loaded = list(pool.map(_load_or_error, [str(p) for p in paths]))
+    return list(zip(paths, loaded))
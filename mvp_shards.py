@@ -0,0 +1,601 @@
+"""
+Sharded full-zipcode analysis.
+Splits the zipcode's tile grid into fixed-size blocks and streams them
+through fetch -> detect one block at a time. Blocks are never stitched:
+detection reads chunk windows assembled from the block's tiles on demand,
+so peak memory is one block's encoded tiles plus the chunks in flight, no
+matter how large the zipcode is. Roofs that straddle block edges are
+de-duplicated and everything is merged into one AnalysisResult.
+"""
+import asyncio
+import dataclasses
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+import httpx
+from loguru import logger
+
+from mvp_app import (
+    bootstrap,
+    setup_logger,
+    get_settings,
+    create_pipeline,
+    run_manifest,
+    email_damage_reports,
+    write_overlay_tiles,
+    finish_trace,
+    run_with_profile,
+    start_detection_pool,
+    open_detection_cache,
+    detection_model_key,
+    DEFAULT_EMAILS,
+    DETECTION_WORKERS,
+)
+from mvp_geometry import Bounds, TileKey, TILE_SIZE, tile_range
+from mvp_tiles import FetchConfig, TileFetcher
+from mvp_crops import roof_bbox
+from mvp_footprints import FootprintIndex
+from mvp_gazetteer import Gazetteer, ZipArea
+from mvp_tile_cache import TileCache
+from mvp_detect_pool import (
+    DetectionPool,
+    DetectPoolConfig,
+    DetectPoolStats,
+    box_overlap,
+    replace_detection,
+    shift_detection,
+    ensure_detectors,
+)
+from mvp_damage_crops import DamageCropConfig
+from mvp_mosaic import TileMosaic
+from mvp_pyramid import PyramidConfig
+from mvp_trace import RunTracer, stage
+
+if TYPE_CHECKING:
+    from src.output.json_generator import AnalysisResult
+
+# Free-text postal code search; returns a bounding box for the zipcode
+NOMINATIM_SEARCH_URL = "https://nominatim.openstreetmap.org/search"
+
+# Offline ZCTA boundaries (see mvp_gazetteer); Nominatim is only used when missing
+GAZETTEER_PATH = Path(__file__).parent / "data" / "zcta.sqlite"
+
+# MapTiler tile fetching: concurrency adapts between the bounds, growing while
+# tiles come back fast and halving on 429/503 or latency spikes
+TILE_FETCH = FetchConfig(
+    initial_concurrency=16,
+    min_concurrency=4,
+    max_concurrency=96,
+    max_retries=4
+)
+
+# Sharded runs write no full-size images and keep their imagery in the tile
+# cache, so their overlays are always tiled (see mvp_pyramid)
+SHARDED_PYRAMID = PyramidConfig(min_zoom=16)
+
+
+@dataclass
+class ShardConfig:
+    """Settings for sharded analysis."""
+    zoom_level: int = 21
+    tile_size: int = TILE_SIZE
+    block_tiles: int = 8        # Block edge in tiles (8 x 256 = 2048 px)
+    overlap_tiles: int = 1      # Shared tiles between neighbouring blocks
+    dedupe_overlap: float = 0.5  # Share of the smaller box covered by the other -> same object
+    max_blocks: Optional[int] = None  # Stop early (testing / budgeting)
+    # In-process detection: damage model on roof crops only (None: whole chunks)
+    damage_crops: Optional[DamageCropConfig] = field(default_factory=DamageCropConfig)
+
+
+@dataclass
+class ShardBlock:
+    """One block of the tile grid; x1/y1 are exclusive."""
+    index: int
+    x0: int
+    y0: int
+    x1: int
+    y1: int
+
+    def tile_keys(self, zoom: int) -> List[TileKey]:
+        return [(zoom, x, y) for y in range(self.y0, self.y1) for x in range(self.x0, self.x1)]
+
+
+@dataclass
+class ShardStats:
+    """Counters reported in the merged result's performance section."""
+    blocks: int = 0
+    blocks_skipped: int = 0     # Blocks without buildings: never fetched or detected
+    tiles_fetched: int = 0
+    tiles_missing: int = 0
+    tiles_skipped: int = 0      # Tiles without buildings: never fetched
+    tiles_outside: int = 0      # Bounding-box tiles outside the zipcode polygon: never fetched
+    blocks_outside: int = 0
+    tile_cache_hits: int = 0
+    tile_cache_misses: int = 0
+    tile_cache_bytes_read: int = 0
+    tile_fetch: Dict = field(default_factory=dict)  # TileFetcher.summary()
+    roofs_detected: int = 0
+    roofs_deduplicated: int = 0
+    damages_deduplicated: int = 0
+    fetch_wait_sec: float = 0.0
+    detect_sec: float = 0.0
+    detection_pool: Dict = field(default_factory=dict)  # DetectPoolStats.summary() when a pool is used
+
+
+def plan_blocks(
+    grid: Tuple[int, int, int, int],
+    block_tiles: int,
+    overlap_tiles: int
+) -> List[ShardBlock]:
+    """
+    Split a tile range into overlapping blocks, row by row.
+
+    Args:
+        grid: (x0, y0, x1, y1) tile range, x1/y1 exclusive
+        block_tiles: Block edge in tiles
+        overlap_tiles: Tiles shared with the next block on each axis
+
+    Returns:
+        List of ShardBlock covering the whole grid
+    """
+    gx0, gy0, gx1, gy1 = grid
+    step = max(1, block_tiles - overlap_tiles)
+    blocks = []
+    for y0 in range(gy0, gy1, step):
+        for x0 in range(gx0, gx1, step):
+            blocks.append(ShardBlock(
+                index=len(blocks),
+                x0=x0,
+                y0=y0,
+                x1=min(x0 + block_tiles, gx1),
+                y1=min(y0 + block_tiles, gy1)
+            ))
+            if x0 + block_tiles >= gx1:
+                break
+        if y0 + block_tiles >= gy1:
+            break
+    return blocks
+
+
+class ShardMerger:
+    """Collects per-block detections in global mosaic pixels, dropping duplicates."""
+
+    def __init__(self, dedupe_overlap: float, cell_px: int = 512):
+        self.dedupe_overlap = dedupe_overlap
+        self.cell_px = cell_px
+        self.roofs: Dict[int, object] = {}
+        self.damages: List = []
+        self._roof_cells: Dict[Tuple[int, int], List[int]] = {}
+        self._damage_boxes: Dict[int, List[Tuple[float, float, float, float]]] = {}
+        self.roofs_deduplicated = 0
+        self.damages_deduplicated = 0
+
+    def _cells(self, box) -> List[Tuple[int, int]]:
+        c = self.cell_px
+        return [(cx, cy)
+                for cy in range(int(box[1] // c), int(box[3] // c) + 1)
+                for cx in range(int(box[0] // c), int(box[2] // c) + 1)]
+
+    def _index_roof(self, roof_id: int, box) -> None:
+        for cell in self._cells(box):
+            ids = self._roof_cells.setdefault(cell, [])
+            if roof_id not in ids:
+                ids.append(roof_id)
+
+    def _find_duplicate(self, box) -> Optional[int]:
+        for cell in self._cells(box):
+            for roof_id in self._roof_cells.get(cell, ()):
+                if box_overlap(box, roof_bbox(self.roofs[roof_id])) >= self.dedupe_overlap:
+                    return roof_id
+        return None
+
+    def add_block(self, roofs: List, damages: List, dx: float, dy: float) -> None:
+        """
+        Merge one block's detections.
+
+        Args:
+            roofs: Roofs detected in the block (block pixel coordinates)
+            damages: Damages detected in the block
+            dx: Block's x offset in the global mosaic
+            dy: Block's y offset in the global mosaic
+        """
+        local_to_global: Dict[int, int] = {}
+        for roof in roofs:
+            shifted = shift_detection(roof, dx, dy)
+            box = roof_bbox(shifted)
+            duplicate = self._find_duplicate(box)
+            if duplicate is not None:
+                self.roofs_deduplicated += 1
+                local_to_global[roof.id] = duplicate
+                # A roof cut by a block edge is smaller than the whole one
+                if shifted.area_pixels > self.roofs[duplicate].area_pixels:
+                    self.roofs[duplicate] = replace_detection(shifted, id=duplicate)
+                    self._index_roof(duplicate, box)
+                continue
+            global_id = len(self.roofs) + 1
+            self.roofs[global_id] = replace_detection(shifted, id=global_id)
+            local_to_global[roof.id] = global_id
+            self._index_roof(global_id, box)
+
+        for damage in damages:
+            roof_id = local_to_global.get(damage.roof_id) if damage.roof_id is not None else None
+            shifted = shift_detection(damage, dx, dy, roof_id=roof_id)
+            box = roof_bbox(shifted)
+            seen = self._damage_boxes.setdefault(roof_id if roof_id is not None else -1, [])
+            if any(box_overlap(box, other) >= self.dedupe_overlap for other in seen):
+                self.damages_deduplicated += 1
+                continue
+            seen.append(box)
+            self.damages.append(shifted)
+
+
+async def geocode_zipcode_bounds(zipcode: str, country: str = "us") -> Bounds:
+    """
+    Look up a zipcode's bounding box (OpenStreetMap Nominatim).
+
+    Args:
+        zipcode: US zipcode (5 digits)
+        country: ISO country code
+
+    Returns:
+        Bounds of the postal code area
+
+    Raises:
+        ValueError: If the zipcode is not found
+    """
+    params = {"postalcode": zipcode, "country": country, "format": "json", "limit": 1}
+    headers = {"User-Agent": "MVP_satelite/1.0"}
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        response = await client.get(NOMINATIM_SEARCH_URL, params=params, headers=headers)
+        response.raise_for_status()
+        matches = response.json()
+    if not matches:
+        raise ValueError(f"Zipcode {zipcode} not found")
+    south, north, west, east = (float(v) for v in matches[0]["boundingbox"])
+    return Bounds(south=south, west=west, north=north, east=east)
+
+
+async def resolve_zipcode(
+    zipcode: str,
+    gazetteer_path: Optional[str] = None
+) -> Tuple[Bounds, Optional[ZipArea]]:
+    """
+    Zipcode bounds, and its boundary polygon when the offline gazetteer has it.
+
+    Args:
+        zipcode: US zipcode (5 digits)
+        gazetteer_path: Gazetteer index (GAZETTEER_PATH if None)
+
+    Returns:
+        (bounds, area); area is None when the bounds came from Nominatim
+    """
+    path = Path(gazetteer_path) if gazetteer_path else GAZETTEER_PATH
+    if path.exists():
+        with Gazetteer(path) as gazetteer:
+            area = gazetteer.area(zipcode)
+        if area is not None:
+            return area.bounds, area
+        logger.warning(f"Zipcode {zipcode} not in {path.name}; geocoding online")
+    else:
+        logger.info(f"No gazetteer at {path}; geocoding {zipcode} online")
+    return await geocode_zipcode_bounds(zipcode), None
+
+
+async def analyze_zipcode_sharded(
+    pipeline,
+    fetcher: TileFetcher,
+    zipcode: str,
+    bounds: Bounds,
+    config: Optional[ShardConfig] = None,
+    footprints: Optional[FootprintIndex] = None,
+    pool: Optional[DetectionPool] = None,
+    area: Optional[ZipArea] = None
+) -> "AnalysisResult":
+    """
+    Analyze a whole zipcode block by block.
+
+    The next block's tiles are fetched while the current block is in
+    detection; only one stitched block is held in memory at a time.
+
+    Args:
+        pipeline: RoofDamagePipeline providing the detectors
+        fetcher: Tile fetcher
+        zipcode: US zipcode (5 digits)
+        bounds: Zipcode bounding box
+        config: Shard settings (defaults if None)
+        footprints: Building footprint index; when given, tiles without
+                    buildings are not fetched and empty blocks are skipped
+        pool: Detection pool; when given, each block is cut into chunks
+              detected in parallel worker processes. Otherwise chunks are
+              detected in-process (through the detection cache)
+        area: Zipcode boundary; when given, only tiles intersecting the
+              polygon are fetched and blocks outside it are skipped
+
+    Returns:
+        Merged AnalysisResult in global mosaic pixel coordinates
+    """
+    config = config or ShardConfig()
+    start = time.time()
+    zoom = config.zoom_level
+    grid = tile_range(bounds, zoom)
+    blocks = plan_blocks(grid, config.block_tiles, config.overlap_tiles)
+    if config.max_blocks is not None:
+        blocks = blocks[:config.max_blocks]
+
+    total_tiles = (grid[2] - grid[0]) * (grid[3] - grid[1])
+    logger.info(f"Sharded analysis of {zipcode}: {total_tiles} tiles in {len(blocks)} blocks "
+                f"of {config.block_tiles}x{config.block_tiles}")
+
+    stats = ShardStats()
+    mask = area.tiles(zoom) if area is not None else None
+    if mask is not None:
+        stats.tiles_outside = total_tiles - mask.count(grid)
+        kept = [b for b in blocks if any(mask.has_tile(k) for k in b.tile_keys(zoom))]
+        stats.blocks_outside = len(blocks) - len(kept)
+        blocks = kept
+        logger.info(f"Zipcode polygon: skipping {stats.tiles_outside}/{total_tiles} bounding-box tiles "
+                    f"and {stats.blocks_outside} blocks outside {zipcode}")
+    if footprints is not None:
+        occupied = sum(1 for x, y in footprints.occupied
+                       if grid[0] <= x < grid[2] and grid[1] <= y < grid[3]
+                       and (mask is None or mask.has_tile((zoom, x, y))))
+        stats.tiles_skipped = total_tiles - stats.tiles_outside - occupied
+        kept = [b for b in blocks if any(footprints.has_buildings(k) for k in b.tile_keys(zoom))]
+        stats.blocks_skipped = len(blocks) - len(kept)
+        blocks = kept
+        logger.info(f"Footprint prefilter: skipping {stats.tiles_skipped}/{total_tiles} tiles "
+                    f"and {stats.blocks_skipped} blocks without buildings")
+
+    local_pool = pool is None
+    if local_pool:
+        # Same chunked windows, detected in-process with the pipeline's models
+        await ensure_detectors(pipeline)
+        detection_cache = open_detection_cache()
+        model_key = detection_model_key(pipeline.config, config.damage_crops) if detection_cache is not None else ""
+        pool = DetectionPool(
+            DetectPoolConfig(workers=0, damage_crops=config.damage_crops, model_key=model_key),
+            detectors=(pipeline.roof_detector, pipeline.damage_detector),
+            cache=detection_cache
+        )
+    pool_stats = DetectPoolStats(workers=pool.config.workers, batch_size=pool.config.batch_size)
+    merger = ShardMerger(config.dedupe_overlap)
+    cache = fetcher.cache
+    cache_start = dataclasses.replace(cache.stats) if cache is not None else None
+
+    async def fetch_block(block: ShardBlock, reuse: Dict[TileKey, Optional[bytes]]):
+        keys = block.tile_keys(zoom)
+        if mask is not None:
+            keys = [k for k in keys if mask.has_tile(k)]
+        if footprints is not None:
+            keys = [k for k in keys if footprints.has_buildings(k)]
+        tiles = {k: reuse[k] for k in keys if k in reuse}
+        tiles.update(await fetcher.fetch_many(k for k in keys if k not in tiles))
+        return tiles
+
+    pending = asyncio.create_task(fetch_block(blocks[0], {})) if blocks else None
+    for i, block in enumerate(blocks):
+        wait_start = time.perf_counter()
+        with stage("block.fetch_wait") as s:
+            tiles = await pending
+            s.count(tiles=len(tiles))
+        stats.fetch_wait_sec += time.perf_counter() - wait_start
+        if i + 1 < len(blocks):
+            # Overlapping tiles from this block are reused by the next one
+            pending = asyncio.create_task(fetch_block(blocks[i + 1], tiles))
+
+        stats.tiles_fetched += sum(1 for v in tiles.values() if v)
+        stats.tiles_missing += sum(1 for v in tiles.values() if not v)
+        if not any(tiles.values()):
+            continue
+
+        detect_start = time.perf_counter()
+        mosaic = TileMosaic(tiles, zoom, block.x0, block.y0, block.x1 - block.x0, block.y1 - block.y0,
+                            config.tile_size)
+        with stage("block.detect") as s:
+            roofs, damages, block_stats = await asyncio.to_thread(pool.detect, mosaic)
+            pool_stats.add(block_stats)
+            s.count(**block_stats.counts())
+            s.count(roofs=len(roofs), damages=len(damages))
+        stats.detect_sec += time.perf_counter() - detect_start
+
+        stats.blocks += 1
+        stats.roofs_detected += len(roofs)
+        merger.add_block(
+            roofs,
+            damages,
+            dx=(block.x0 - grid[0]) * config.tile_size,
+            dy=(block.y0 - grid[1]) * config.tile_size
+        )
+        logger.info(f"Block {i + 1}/{len(blocks)}: {len(roofs)} roofs, {len(damages)} damages "
+                    f"(total {len(merger.roofs)} roofs)")
+
+    stats.roofs_deduplicated = merger.roofs_deduplicated
+    stats.damages_deduplicated = merger.damages_deduplicated
+    if cache is not None:
+        cache.flush()
+        stats.tile_cache_hits = cache.stats.hits - cache_start.hits
+        stats.tile_cache_misses = cache.stats.misses - cache_start.misses
+        stats.tile_cache_bytes_read = cache.stats.bytes_read - cache_start.bytes_read
+    stats.tile_fetch = fetcher.summary()
+    stats.detection_pool = pool_stats.summary()
+    if local_pool:
+        pool.close()
+
+    from src.output.json_generator import AnalysisResult
+    roofs = list(merger.roofs.values())
+    damages = merger.damages
+    center_lat, center_lng = bounds.center
+    result = AnalysisResult(
+        zipcode=zipcode,
+        timestamp=int(start),
+        processing_time_sec=round(time.time() - start, 2),
+        center_lat=center_lat,
+        center_lng=center_lng,
+        bounding_box=(bounds.south, bounds.west, bounds.north, bounds.east),
+        image_width=(grid[2] - grid[0]) * config.tile_size,
+        image_height=(grid[3] - grid[1]) * config.tile_size,
+        tiles_processed=stats.tiles_fetched,
+        roofs=roofs,
+        damages=damages,
+        total_roofs=len(roofs),
+        roofs_with_damage=len({d.roof_id for d in damages if d.roof_id is not None}),
+        total_damage_area_pixels=sum(d.area_pixels for d in damages),
+        performance=dataclasses.asdict(stats)
+    )
+    logger.info(f"Sharded analysis complete for {zipcode}: {len(roofs)} roofs, {len(damages)} damages, "
+                f"{stats.roofs_deduplicated} duplicate roofs merged, {result.processing_time_sec}s")
+    return result
+
+
+async def analyze_and_email_sharded(
+    zipcode: str,
+    email_list: List[str],
+    config: Optional[ShardConfig] = None,
+    footprints_path: Optional[str] = None,
+    chrome_trace: bool = False,
+    detect_workers: Optional[int] = None,
+    gazetteer_path: Optional[str] = None
+):
+    """
+    Sharded counterpart of mvp_app.analyze_and_email_per_property.
+
+    Args:
+        zipcode: US zipcode (5 digits)
+        email_list: Recipients for every property report
+        config: Shard settings (defaults if None)
+        footprints_path: Optional building footprint file used to skip
+                         tiles without buildings
+        chrome_trace: Also write trace.chrome.json to the run directory
+        detect_workers: Detection worker processes (mvp_app.DETECTION_WORKERS
+                        if None, 0 = detect each block in-process)
+        gazetteer_path: Offline zipcode boundaries (GAZETTEER_PATH if None)
+    """
+    config = config or ShardConfig()
+    setup_logger()
+    settings = get_settings()
+    if not settings.has_maptiler_api_key:
+        print("ERROR: MAPTILER_API_KEY not set in .env file")
+        return
+
+    api_key = settings.maptiler_api_key.get_secret_value()
+    pipeline = create_pipeline(settings)
+    tile_cache = TileCache()
+    fetcher = TileFetcher(api_key, config=TILE_FETCH, cache=tile_cache)
+    tracer = RunTracer(zipcode, mode="sharded", recipients=len(email_list))
+    artifacts = None
+    pool = None
+
+    with tracer.activate():
+        try:
+            with stage("detection_pool"):
+                pool = await asyncio.to_thread(start_detection_pool, detect_workers, pipeline.config)
+            with stage("geocode") as s:
+                bounds, area = await resolve_zipcode(zipcode, gazetteer_path)
+                s.count(offline=int(area is not None))
+            footprints = None
+            if footprints_path:
+                with stage("footprints") as s:
+                    footprints = FootprintIndex.from_file(footprints_path, bounds, config.zoom_level)
+                    s.count(footprints=footprints.footprints, tiles=len(footprints.occupied))
+            print(f"Analyzing full zipcode {zipcode} in blocks...")
+            with stage("analyze") as s:
+                result = await analyze_zipcode_sharded(pipeline, fetcher, zipcode, bounds, config, footprints, pool,
+                                                       area)
+                s.count(roofs=len(result.roofs), damages=len(result.damages))
+
+            print(f"\nAnalysis Complete!")
+            print(f"  - Total roofs: {result.total_roofs}")
+            print(f"  - Roofs with damage: {result.roofs_with_damage}")
+            print(f"  - Total damage area: {result.total_damage_area_pixels} pixels")
+            if area is not None:
+                print(f"  - Skipped outside the zipcode: {result.performance['tiles_outside']} tiles, "
+                      f"{result.performance['blocks_outside']} blocks")
+            if footprints is not None:
+                print(f"  - Skipped without buildings: {result.performance['tiles_skipped']} tiles, "
+                      f"{result.performance['blocks_skipped']} blocks")
+            performance = result.performance
+            print(f"  - Tile cache: {performance['tile_cache_hits']} hits, "
+                  f"{performance['tile_cache_misses']} misses, "
+                  f"{performance['tile_cache_bytes_read'] / 1024 ** 2:.1f} MB read from cache")
+            fetch_summary = performance['tile_fetch']
+            print(f"  - Tile fetch: {fetch_summary['tiles_fetched']} fetched, {fetch_summary['not_modified']} "
+                  f"revalidated, {fetch_summary['tiles_per_sec']:.1f} tiles/s, p95 "
+                  f"{fetch_summary['request_ms_p95']:.0f} ms, concurrency peak {fetch_summary['concurrency_peak']}, "
+                  f"{fetch_summary['throttled']} throttled, {fetch_summary['retries']} retries")
+            pool_summary = performance['detection_pool']
+            print(f"  - Detection: {pool_summary['chunks']} chunks on {pool_summary['workers'] or 1} "
+                  f"process(es), p95 {pool_summary['chunk_ms_p95']:.0f} ms/chunk, "
+                  f"{pool_summary['roofs_suppressed']} cross-chunk duplicates, damage model on "
+                  f"{pool_summary['damage_crops']['inferred_ratio']:.1%} of the pixels")
+            print(f"  - Detection cache: {pool_summary['cache_hits']} hits, {pool_summary['cache_misses']} misses "
+                  f"({pool_summary['cache_hit_rate']:.0%}), {pool_summary['cache_saved_sec']:.1f}s of detection saved")
+
+            # No full-size mosaic is written in sharded mode; emails crop the overlay tiles
+            manifest = run_manifest()
+            artifacts = manifest.new_run(zipcode)
+            await write_overlay_tiles(result, artifacts, SHARDED_PYRAMID)
+            artifacts = manifest.record(artifacts)
+            with stage("email"):
+                await email_damage_reports(result, zipcode, email_list, artifacts)
+        except Exception as e:
+            print(f"ERROR: {e}")
+            import traceback
+            traceback.print_exc()
+        finally:
+            if pool is not None:
+                pool.close()
+            await fetcher.close()
+            tile_cache.close()
+            await pipeline.close()
+
+    finish_trace(tracer, artifacts, chrome_trace)
+
+
+if __name__ == "__main__":
+    launch_dir = bootstrap()
+    profile = "--profile" in sys.argv
+    chrome_trace = "--trace-chrome" in sys.argv
+    args = [arg for arg in sys.argv[1:] if arg not in ("--profile", "--trace-chrome")]
+    options = {}
+    for option in ("--footprints", "--detect-workers", "--gazetteer"):
+        if option in args:
+            position = args.index(option)
+            options[option] = args[position + 1] if position + 1 < len(args) else None
+            args = args[:position] + args[position + 2:]
+    footprints_path = options.get("--footprints")
+    detect_workers = options.get("--detect-workers")
+    gazetteer_path = options.get("--gazetteer")
+
+    if (not args or any(value is None for value in options.values())
+            or (detect_workers is not None and not detect_workers.isdigit())):
+        print("Usage: python mvp_shards.py <zipcode> [--footprints <file>] [--detect-workers N] "
+              "[--gazetteer <file>] [--profile] [--trace-chrome] [email1] [email2] ...")
+        print("Analyzes the whole zipcode area block by block (no 500-tile cap).")
+        print("--footprints: GeoJSON/GeoJSONL/GeoPackage building footprints (EPSG:4326);")
+        print("              tiles without buildings are not fetched or analyzed.")
+        print(f"--detect-workers: detection worker processes (default {DETECTION_WORKERS}; "
+              f"0 = detect in-process)")
+        print("--gazetteer: zipcode boundary index built by mvp_gazetteer.py (default data/zcta.sqlite);")
+        print("             only tiles inside the zipcode polygon are fetched.")
+        sys.exit(1)
+
+    if footprints_path and not Path(footprints_path).is_absolute():
+        footprints_path = str(launch_dir / footprints_path)
+    if gazetteer_path and not Path(gazetteer_path).is_absolute():
+        gazetteer_path = str(launch_dir / gazetteer_path)
+
+    email_list = args[1:] if len(args) > 1 else DEFAULT_EMAILS
+    run = analyze_and_email_sharded(
+        args[0],
+        email_list,
+        footprints_path=footprints_path,
+        chrome_trace=chrome_trace,
+        detect_workers=int(detect_workers) if detect_workers is not None else None,
+        gazetteer_path=gazetteer_path
+    )
+    if profile:
+        run_with_profile(run, args[0])
+    else:
+        asyncio.run(run)
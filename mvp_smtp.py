@@ -0,0 +1,244 @@
+"""
+Pooled SMTP transport.
+Keeps a small pool of authenticated connections open and sends whole
+batches of messages through them instead of one handshake per email.
+"""
+import queue
+import smtplib
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from email.message import Message
+from typing import List, Optional
+from loguru import logger
+
+
+# Errors that mean the connection itself is gone and a fresh one may succeed.
+# Not OSError as a whole: every SMTPException is an OSError, and protocol or
+# auth errors will fail again on a new connection.
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, socket.timeout)
+
+
+def smtp_error_code(error: BaseException) -> Optional[int]:
+    """Return the SMTP reply code carried by an exception, if any."""
+    code = getattr(error, 'smtp_code', None)
+    if code is None and isinstance(error, smtplib.SMTPRecipientsRefused) and error.recipients:
+        code = next(iter(error.recipients.values()))[0]
+    return code
+
+
+@dataclass
+class SendResult:
+    """Outcome of sending one message."""
+    index: int
+    recipient: str
+    success: bool
+    elapsed_sec: float
+    error: Optional[str] = None
+    smtp_code: Optional[int] = None
+
+
+@dataclass
+class BatchSendReport:
+    """Per-message results and throughput of a batch send."""
+    results: List[SendResult] = field(default_factory=list)
+    elapsed_sec: float = 0.0
+    connections_opened: int = 0
+
+    @property
+    def sent(self) -> int:
+        return sum(1 for r in self.results if r.success)
+
+    @property
+    def failed(self) -> int:
+        return sum(1 for r in self.results if not r.success)
+
+    @property
+    def messages_per_sec(self) -> float:
+        return len(self.results) / self.elapsed_sec if self.elapsed_sec > 0 else 0.0
+
+
+class SMTPTransport:
+    """
+    Thread-safe pool of SMTP connections.
+
+    Connections are opened lazily (connect, STARTTLS, login) and returned to
+    the pool after each send. A connection that drops is discarded and the
+    message is retried once on a fresh one.
+
+    For local testing point it at a debug server with ``use_tls=False`` and
+    no credentials, e.g. ``python -m aiosmtpd -n -l localhost:8025`` (the
+    tests use a small stdlib server, tests/test_smtp.py).
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        use_tls: bool = True,
+        pool_size: int = 2,
+        timeout: float = 30.0
+    ):
+        """
+        Initialize transport.
+
+        Args:
+            host: SMTP server host
+            port: SMTP server port
+            username: Login user (None to skip AUTH)
+            password: Login password
+            use_tls: Upgrade connections with STARTTLS
+            pool_size: Maximum number of open connections
+            timeout: Socket timeout in seconds
+        """
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.pool_size = max(1, pool_size)
+        self.timeout = timeout
+
+        self._idle: "queue.LifoQueue[smtplib.SMTP]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.pool_size)
+        self._lock = threading.Lock()
+        self._closed = False
+        self.connections_opened = 0
+
+    def _connect(self) -> smtplib.SMTP:
+        """Open and authenticate a new connection."""
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.use_tls:
+                server.starttls()
+            if self.username:
+                server.login(self.username, self.password or "")
+        except Exception:
+            server.close()
+            raise
+        with self._lock:
+            self.connections_opened += 1
+        logger.debug(f"Opened SMTP connection to {self.host}:{self.port}")
+        return server
+
+    def _acquire(self) -> smtplib.SMTP:
+        """Take an idle connection from the pool or open a new one."""
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            return self._connect()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _release(self, server: Optional[smtplib.SMTP]) -> None:
+        """Return a healthy connection to the pool (None for a dead one)."""
+        if server is not None:
+            if self._closed:
+                self._quit(server)
+            else:
+                self._idle.put(server)
+        self._slots.release()
+
+    @staticmethod
+    def _quit(server: smtplib.SMTP) -> None:
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    def send(self, msg: Message) -> None:
+        """
+        Send one message, reconnecting once if the pooled connection dropped.
+
+        Args:
+            msg: Message with From/To headers set
+
+        Raises:
+            smtplib.SMTPException, or a CONNECTION_ERRORS error if the
+            fresh connection dropped too
+        """
+        if self._closed:
+            raise RuntimeError("SMTPTransport is closed")
+
+        for attempt in range(2):
+            server = self._acquire()
+            try:
+                server.send_message(msg)
+            except (smtplib.SMTPResponseException, smtplib.SMTPRecipientsRefused):
+                # Server answered; the connection is still usable
+                self._release(server)
+                raise
+            except CONNECTION_ERRORS as e:
+                server.close()
+                self._release(None)
+                if attempt == 0:
+                    logger.warning(f"SMTP connection lost ({e}), reconnecting")
+                    continue
+                raise
+            except Exception:
+                server.close()
+                self._release(None)
+                raise
+            self._release(server)
+            return
+
+    def send_batch(self, messages: List[Message]) -> BatchSendReport:
+        """
+        Send many messages concurrently over the pooled connections.
+
+        Args:
+            messages: Messages to send
+
+        Returns:
+            BatchSendReport with one SendResult per message, in input order
+        """
+        opened_before = self.connections_opened
+        start = time.perf_counter()
+
+        def _send_one(index: int, msg: Message) -> SendResult:
+            t0 = time.perf_counter()
+            try:
+                self.send(msg)
+                return SendResult(index, msg['To'], True, time.perf_counter() - t0)
+            except Exception as e:
+                code = smtp_error_code(e)
+                logger.error(f"Failed to send email to {msg['To']}: {e}")
+                return SendResult(index, msg['To'], False, time.perf_counter() - t0, str(e), code)
+
+        with ThreadPoolExecutor(max_workers=self.pool_size) as executor:
+            results = list(executor.map(_send_one, range(len(messages)), messages))
+
+        report = BatchSendReport(
+            results=results,
+            elapsed_sec=time.perf_counter() - start,
+            connections_opened=self.connections_opened - opened_before
+        )
+        logger.info(
+            f"Sent {report.sent}/{len(results)} emails in {report.elapsed_sec:.1f}s "
+            f"({report.messages_per_sec:.2f} msg/s, {report.connections_opened} connection(s))"
+        )
+        return report
+
+    def close(self) -> None:
+        """Close every idle connection."""
+        self._closed = True
+        while True:
+            try:
+                server = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._quit(server)
+
+    def __enter__(self) -> "SMTPTransport":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
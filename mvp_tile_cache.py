@@ -0,0 +1,379 @@
+"""
+Content-addressed tile cache.
+Tiles are keyed by (z, x, y, source, imagery date), stored once per content
+hash in a few large append-only segment files and located through an SQLite
+index, so a lookup is one indexed query plus an mmap slice instead of a
+filesystem stat/open per tile. Entries expire after a TTL and the least
+recently used content is evicted once the cache exceeds its byte budget.
+The tile server's ETag / Last-Modified are kept with each entry, so an
+expired tile can be revalidated with a conditional request instead of
+being downloaded again. Index writes are committed in batches, so storing
+a tile from the fetch loop does not wait on an SQLite commit each time.
+"""
+import hashlib
+import mmap
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from loguru import logger
+
+from mvp_geometry import TileKey
+
+SEGMENT_PATTERN = "segment_{:06d}.bin"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    digest TEXT PRIMARY KEY,
+    segment INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS blobs_last_access ON blobs (last_access);
+CREATE INDEX IF NOT EXISTS blobs_segment ON blobs (segment);
+CREATE TABLE IF NOT EXISTS tiles (
+    z INTEGER NOT NULL,
+    x INTEGER NOT NULL,
+    y INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    imagery_date TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    stored_at REAL NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    PRIMARY KEY (z, x, y, source, imagery_date)
+);
+CREATE INDEX IF NOT EXISTS tiles_digest ON tiles (digest);
+"""
+
+# Columns added after the first release; caches created before them are migrated on open
+MIGRATIONS = {
+    "etag": "ALTER TABLE tiles ADD COLUMN etag TEXT",
+    "last_modified": "ALTER TABLE tiles ADD COLUMN last_modified TEXT",
+}
+
+
+@dataclass
+class TileCacheConfig:
+    """Settings for the tile cache."""
+    cache_dir: str = str(Path(__file__).parent / "cache" / "tile_store")
+    max_bytes: int = 2 * 1024 ** 3      # LRU byte budget for tile content
+    ttl_sec: float = 30 * 86400         # Tiles older than this are refetched
+    segment_bytes: int = 64 * 1024 ** 2  # Start a new segment file past this size
+    commit_every: int = 256             # Index writes per commit; flush()/close() commit the rest
+
+
+@dataclass
+class TileCacheStats:
+    """Counters for one cache instance (reported in the run summary)."""
+    hits: int = 0
+    misses: int = 0
+    expired: int = 0
+    revalidated: int = 0        # Expired tiles confirmed unchanged by the server (HTTP 304)
+    bytes_read: int = 0
+    bytes_written: int = 0
+    evicted_blobs: int = 0
+    evicted_bytes: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+@dataclass
+class CachedTile:
+    """A cache entry, fresh or expired, with the validators for a conditional request."""
+    data: bytes
+    etag: Optional[str]
+    last_modified: Optional[str]
+    expired: bool
+
+
+class TileCache:
+    """
+    Tile store: SQLite index + append-only segment files read through mmap.
+
+    ``tiles`` maps a tile key to a content digest and ``blobs`` maps a digest
+    to (segment, offset, length), so identical tiles (water, empty lots)
+    are stored once. Evicting a blob drops every tile pointing at it;
+    segments whose content has all been evicted are deleted.
+
+    Safe to share between the event loop and worker threads.
+    """
+
+    def __init__(self, config: Optional[TileCacheConfig] = None):
+        """
+        Open (or create) the cache.
+
+        Args:
+            config: Cache settings (defaults if None)
+        """
+        self.config = config or TileCacheConfig()
+        self.root = Path(self.config.cache_dir)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.stats = TileCacheStats()
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(str(self.root / "index.sqlite"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(tiles)")}
+        for column, statement in MIGRATIONS.items():
+            if column not in columns:
+                self._db.execute(statement)
+        self._db.commit()
+        self._maps: Dict[int, mmap.mmap] = {}
+        self._touched: Dict[str, float] = {}
+        self._uncommitted = 0
+
+        row = self._db.execute("SELECT MAX(segment) FROM blobs").fetchone()
+        self._segment = row[0] if row[0] is not None else 0
+        self._segment_file = open(self._segment_path(self._segment), 'ab')
+        self._total_bytes = self._db.execute("SELECT COALESCE(SUM(length), 0) FROM blobs").fetchone()[0]
+
+    def _wrote(self) -> None:
+        """Count one index write and commit once a batch is full (lock held)."""
+        self._uncommitted += 1
+        if self._uncommitted >= self.config.commit_every:
+            self._db.commit()
+            self._uncommitted = 0
+
+    def _segment_path(self, segment: int) -> Path:
+        return self.root / SEGMENT_PATTERN.format(segment)
+
+    def _read(self, segment: int, offset: int, length: int) -> bytes:
+        mapped = self._maps.get(segment)
+        if mapped is None or offset + length > len(mapped):
+            # New segment, or the active one grew since it was mapped
+            if mapped is not None:
+                mapped.close()
+            with open(self._segment_path(segment), 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[segment] = mapped
+        return mapped[offset:offset + length]
+
+    def get(self, key: TileKey, source: str, imagery_date: str = "") -> Optional[bytes]:
+        """
+        Look up a tile.
+
+        Args:
+            key: (z, x, y)
+            source: Imagery source (e.g. tile URL template without the key)
+            imagery_date: Imagery date/version, "" if unknown
+
+        Returns:
+            Tile bytes, or None on a miss or expired entry
+        """
+        entry = self.lookup(key, source, imagery_date)
+        return entry.data if entry is not None and not entry.expired else None
+
+    def lookup(self, key: TileKey, source: str, imagery_date: str = "") -> Optional[CachedTile]:
+        """
+        Look up a tile, returning expired entries too (for revalidation).
+
+        Expired entries count as misses; a later ``refresh()`` after a 304
+        turns them back into fresh entries.
+
+        Args:
+            key: (z, x, y)
+            source: Imagery source (e.g. tile URL template without the key)
+            imagery_date: Imagery date/version, "" if unknown
+
+        Returns:
+            CachedTile, or None when the tile is not stored
+        """
+        z, x, y = key
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT b.digest, b.segment, b.offset, b.length, t.stored_at, t.etag, t.last_modified "
+                "FROM tiles t JOIN blobs b ON b.digest = t.digest "
+                "WHERE t.z = ? AND t.x = ? AND t.y = ? AND t.source = ? AND t.imagery_date = ?",
+                (z, x, y, source, imagery_date)
+            ).fetchone()
+            if row is None:
+                self.stats.misses += 1
+                return None
+            digest, segment, offset, length, stored_at, etag, last_modified = row
+            expired = now - stored_at > self.config.ttl_sec
+            data = self._read(segment, offset, length)
+            if expired:
+                self.stats.expired += 1
+                self.stats.misses += 1
+            else:
+                # Access times are written back in batches by flush()
+                self._touched[digest] = now
+                self.stats.hits += 1
+                self.stats.bytes_read += length
+            return CachedTile(data=data, etag=etag, last_modified=last_modified, expired=expired)
+
+    def refresh(self, key: TileKey, source: str, imagery_date: str = "") -> None:
+        """Mark an expired tile fresh again (the server answered 304 Not Modified)."""
+        z, x, y = key
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "UPDATE tiles SET stored_at = ? "
+                "WHERE z = ? AND x = ? AND y = ? AND source = ? AND imagery_date = ?",
+                (now, z, x, y, source, imagery_date)
+            )
+            self._db.execute(
+                "UPDATE blobs SET last_access = ? WHERE digest = "
+                "(SELECT digest FROM tiles WHERE z = ? AND x = ? AND y = ? AND source = ? AND imagery_date = ?)",
+                (now, z, x, y, source, imagery_date)
+            )
+            self._wrote()
+            self.stats.revalidated += 1
+
+    def put(
+        self,
+        key: TileKey,
+        source: str,
+        data: bytes,
+        imagery_date: str = "",
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None
+    ) -> None:
+        """
+        Store a tile, appending its content only if it is not stored yet.
+
+        Args:
+            key: (z, x, y)
+            source: Imagery source
+            data: Encoded tile bytes
+            imagery_date: Imagery date/version, "" if unknown
+            etag: Server ETag, for conditional requests once the tile expires
+            last_modified: Server Last-Modified, same purpose
+        """
+        if not data:
+            return
+        z, x, y = key
+        digest = hashlib.sha256(data).hexdigest()
+        now = time.time()
+        with self._lock:
+            exists = self._db.execute("SELECT 1 FROM blobs WHERE digest = ?", (digest,)).fetchone()
+            if exists:
+                self._db.execute("UPDATE blobs SET last_access = ? WHERE digest = ?", (now, digest))
+            else:
+                if self._segment_file.tell() + len(data) > self.config.segment_bytes and self._segment_file.tell():
+                    self._segment_file.close()
+                    self._segment += 1
+                    self._segment_file = open(self._segment_path(self._segment), 'ab')
+                offset = self._segment_file.tell()
+                self._segment_file.write(data)
+                self._segment_file.flush()
+                self._db.execute(
+                    "INSERT INTO blobs (digest, segment, offset, length, last_access) VALUES (?, ?, ?, ?, ?)",
+                    (digest, self._segment, offset, len(data), now)
+                )
+                self._total_bytes += len(data)
+                self.stats.bytes_written += len(data)
+            self._db.execute(
+                "INSERT OR REPLACE INTO tiles (z, x, y, source, imagery_date, digest, stored_at, etag, last_modified) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (z, x, y, source, imagery_date, digest, now, etag, last_modified)
+            )
+            self._wrote()
+            if self._total_bytes > self.config.max_bytes:
+                self.evict()
+
+    def flush(self) -> None:
+        """Write pending access times to the index and commit every pending write."""
+        with self._lock:
+            if self._touched:
+                self._db.executemany(
+                    "UPDATE blobs SET last_access = ? WHERE digest = ?",
+                    [(ts, digest) for digest, ts in self._touched.items()]
+                )
+                self._touched.clear()
+                self._uncommitted += 1
+            if self._uncommitted:
+                self._db.commit()
+                self._uncommitted = 0
+
+    def evict(self) -> Tuple[int, int]:
+        """
+        Drop expired tiles, then least recently used content over the budget.
+
+        Returns:
+            (blobs evicted, bytes evicted)
+        """
+        with self._lock:
+            self.flush()
+            cutoff = time.time() - self.config.ttl_sec
+            self._db.execute("DELETE FROM tiles WHERE stored_at < ?", (cutoff,))
+
+            # Unreferenced content first, then oldest access until under budget
+            victims = self._db.execute(
+                "SELECT digest, segment, length FROM blobs "
+                "WHERE digest NOT IN (SELECT digest FROM tiles)"
+            ).fetchall()
+            excess = self._total_bytes - sum(v[2] for v in victims) - self.config.max_bytes
+            if excess > 0:
+                for digest, segment, length in self._db.execute(
+                    "SELECT digest, segment, length FROM blobs "
+                    "WHERE digest IN (SELECT digest FROM tiles) ORDER BY last_access"
+                ):
+                    victims.append((digest, segment, length))
+                    excess -= length
+                    if excess <= 0:
+                        break
+
+            segments = set()
+            for digest, segment, length in victims:
+                self._db.execute("DELETE FROM tiles WHERE digest = ?", (digest,))
+                self._db.execute("DELETE FROM blobs WHERE digest = ?", (digest,))
+                self._total_bytes -= length
+                segments.add(segment)
+            self._db.commit()
+            self._uncommitted = 0
+            self._drop_empty_segments(segments)
+
+            freed = sum(v[2] for v in victims)
+            self.stats.evicted_blobs += len(victims)
+            self.stats.evicted_bytes += freed
+            if victims:
+                logger.info(f"Tile cache evicted {len(victims)} tiles ({freed / 1024 ** 2:.1f} MB), "
+                            f"{self._total_bytes / 1024 ** 2:.1f} MB kept")
+            return len(victims), freed
+
+    def _drop_empty_segments(self, segments) -> None:
+        # LRU order follows write order closely, so old segments empty out as a whole
+        for segment in segments:
+            if segment == self._segment:
+                continue
+            live = self._db.execute("SELECT 1 FROM blobs WHERE segment = ? LIMIT 1", (segment,)).fetchone()
+            if live:
+                continue
+            mapped = self._maps.pop(segment, None)
+            if mapped is not None:
+                mapped.close()
+            try:
+                os.remove(self._segment_path(segment))
+            except FileNotFoundError:
+                pass
+
+    @property
+    def total_bytes(self) -> int:
+        """Bytes of tile content currently stored."""
+        return self._total_bytes
+
+    def close(self) -> None:
+        with self._lock:
+            self.flush()
+            for mapped in self._maps.values():
+                mapped.close()
+            self._maps.clear()
+            self._segment_file.close()
+            self._db.close()
+
+    def __enter__(self) -> "TileCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,300 @@
+"""
+MapTiler tile fetching.
+Fetches satellite tiles for the MVP's block-based processing modes; the
+Web-Mercator tile math lives in mvp_geometry.
+Fetching goes through one keep-alive client (HTTP/2 when the h2 package is
+installed) whose concurrency adapts to the server: it grows while responses
+stay fast and is halved on throttling (429/503), timeouts or latency spikes.
+"""
+import asyncio
+import importlib.util
+import math
+import random
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional
+import httpx
+from loguru import logger
+
+from mvp_geometry import TileKey
+
+if TYPE_CHECKING:
+    from mvp_tile_cache import TileCache
+
+# MapTiler satellite tiles
+MAPTILER_TILE_URL = "https://api.maptiler.com/tiles/satellite-v2/{z}/{x}/{y}.jpg?key={key}"
+
+# Responses worth retrying; 429/503 also mean "slow down"
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+THROTTLE_STATUSES = (429, 503)
+
+
+@dataclass
+class FetchConfig:
+    """Settings for tile fetching."""
+    initial_concurrency: int = 16
+    min_concurrency: int = 2
+    max_concurrency: int = 128      # Equal to min_concurrency for a fixed limit
+    latency_factor: float = 3.0     # Slower than this multiple of the fastest response = congestion
+    latency_floor_sec: float = 0.5  # ...unless still under this
+    max_retries: int = 4            # Retries per tile on errors or 429/5xx
+    backoff_base_sec: float = 0.5   # Retry n sleeps up to base * 2^n (full jitter) or Retry-After
+    backoff_max_sec: float = 16.0
+    timeout: float = 30.0
+    http2: bool = True              # Used when the h2 package is installed
+    keepalive_expiry_sec: float = 30.0
+
+
+@dataclass
+class FetchStats:
+    """Counters and request latencies of one fetcher (reported in the run summary)."""
+    requests: int = 0
+    tiles_fetched: int = 0
+    not_modified: int = 0       # Expired cache entries revalidated with a 304
+    stale_served: int = 0       # Expired cache entries returned because the refetch failed
+    failed: int = 0
+    retries: int = 0
+    throttled: int = 0          # 429/503 responses
+    errors: int = 0             # Connection errors and timeouts
+    bytes_fetched: int = 0
+    wall_sec: float = 0.0
+    http_versions: Dict[str, int] = field(default_factory=dict)
+    latencies_sec: List[float] = field(default_factory=list)
+
+    def summary(self) -> Dict:
+        """Counters plus latency percentiles and throughput."""
+        latencies = sorted(self.latencies_sec)
+
+        def percentile(p: float) -> float:
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(round(p * (len(latencies) - 1))))]
+
+        summary = {k: v for k, v in self.__dict__.items() if k != "latencies_sec"}
+        summary.update(
+            wall_sec=round(self.wall_sec, 3),
+            request_ms_p50=round(percentile(0.5) * 1000, 1),
+            request_ms_p95=round(percentile(0.95) * 1000, 1),
+            tiles_per_sec=round((self.tiles_fetched + self.not_modified) / self.wall_sec, 1)
+            if self.wall_sec > 0 else 0.0
+        )
+        return summary
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit for requests to one server.
+
+    Starts in slow start (+1 per success, doubling every round trip) and
+    switches to additive increase (+1 per round trip) after the first
+    congestion signal, which halves the limit. Congestion signals arriving
+    within one round trip of a decrease count once, so a burst of 429s from
+    the same window does not collapse the limit.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.peak = self.limit
+        self.decreases = 0
+        self.in_flight = 0
+        self._slow_start = True
+        self._rtt = 0.0
+        self._last_decrease = -math.inf
+        self._condition = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, latency_sec: float, congested: bool) -> None:
+        async with self._condition:
+            self.in_flight -= 1
+            self._rtt = latency_sec if not self._rtt else 0.8 * self._rtt + 0.2 * latency_sec
+            now = time.monotonic()
+            if congested:
+                if now - self._last_decrease > self._rtt:
+                    self.limit = max(float(self.minimum), self.limit / 2)
+                    self.decreases += 1
+                    self._last_decrease = now
+                    self._slow_start = False
+            elif self._slow_start:
+                self.limit = min(float(self.maximum), self.limit + 1.0)
+            else:
+                self.limit = min(float(self.maximum), self.limit + 1.0 / self.limit)
+            self.peak = max(self.peak, self.limit)
+            self._condition.notify_all()
+
+
+def _retry_after(response: Optional[httpx.Response]) -> Optional[float]:
+    """Seconds from a Retry-After header (delay-seconds form only)."""
+    if response is None:
+        return None
+    value = response.headers.get("Retry-After", "")
+    return float(value) if value.strip().isdigit() else None
+
+
+class TileFetcher:
+    """
+    Async MapTiler tile fetcher with adaptive concurrency and retries.
+
+    Uses one shared httpx.AsyncClient so connections (or HTTP/2 streams on
+    one connection) are reused across tiles; call ``close()`` when done.
+    With a TileCache, fresh cached tiles are returned without a request,
+    expired ones are revalidated with If-None-Match / If-Modified-Since,
+    and fetched tiles are stored with their validators.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        url_template: str = MAPTILER_TILE_URL,
+        config: Optional[FetchConfig] = None,
+        cache: Optional["TileCache"] = None,
+        imagery_date: str = ""
+    ):
+        """
+        Initialize fetcher.
+
+        Args:
+            api_key: MapTiler API key
+            url_template: Tile URL with {z}/{x}/{y}/{key} placeholders
+            config: Concurrency, retry and connection settings (defaults if None)
+            cache: Optional tile cache
+            imagery_date: Imagery date/version the cache entries are keyed by
+        """
+        self.api_key = api_key
+        self.url_template = url_template
+        self.config = config or FetchConfig()
+        self.cache = cache
+        self.imagery_date = imagery_date
+        # Cache source identity: the URL without the query (and API key)
+        self.source = url_template.split("?", 1)[0]
+        self.stats = FetchStats()
+        self.limiter = AdaptiveLimiter(self.config.initial_concurrency, self.config.min_concurrency,
+                                       self.config.max_concurrency)
+        self._fastest_sec = math.inf
+        http2 = self.config.http2 and importlib.util.find_spec("h2") is not None
+        if self.config.http2 and not http2:
+            logger.debug("h2 not installed; fetching tiles over HTTP/1.1")
+        self._client = httpx.AsyncClient(
+            timeout=self.config.timeout,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=self.config.max_concurrency,
+                max_keepalive_connections=self.config.max_concurrency,
+                keepalive_expiry=self.config.keepalive_expiry_sec
+            )
+        )
+
+    def _congested(self, response: Optional[httpx.Response], error: Optional[Exception], latency_sec: float) -> bool:
+        if response is None:
+            return isinstance(error, httpx.TimeoutException)
+        if response.status_code in THROTTLE_STATUSES:
+            return True
+        if response.status_code in (200, 304):
+            self._fastest_sec = min(self._fastest_sec, latency_sec)
+        return latency_sec > max(self.config.latency_floor_sec, self.config.latency_factor * self._fastest_sec)
+
+    async def fetch(self, key: TileKey) -> Optional[bytes]:
+        """
+        Fetch one tile.
+
+        Args:
+            key: (z, x, y)
+
+        Returns:
+            Encoded image bytes, or None if the tile could not be fetched
+            (an expired cached copy is returned instead when there is one)
+        """
+        cached = None
+        headers = {}
+        if self.cache is not None:
+            cached = self.cache.lookup(key, self.source, self.imagery_date)
+            if cached is not None and not cached.expired:
+                return cached.data
+            if cached is not None:
+                if cached.etag:
+                    headers["If-None-Match"] = cached.etag
+                if cached.last_modified:
+                    headers["If-Modified-Since"] = cached.last_modified
+
+        z, x, y = key
+        url = self.url_template.format(z=z, x=x, y=y, key=self.api_key)
+        config = self.config
+        for attempt in range(config.max_retries + 1):
+            response, error = None, None
+            await self.limiter.acquire()
+            start = time.perf_counter()
+            try:
+                response = await self._client.get(url, headers=headers)
+            except Exception as e:
+                error = e
+            latency = time.perf_counter() - start
+            # The slot is released before any backoff sleep
+            await self.limiter.release(latency, self._congested(response, error, latency))
+
+            stats = self.stats
+            stats.requests += 1
+            stats.latencies_sec.append(latency)
+            if response is None:
+                stats.errors += 1
+            else:
+                stats.http_versions[response.http_version] = stats.http_versions.get(response.http_version, 0) + 1
+                status = response.status_code
+                if status == 200:
+                    stats.tiles_fetched += 1
+                    stats.bytes_fetched += len(response.content)
+                    if self.cache is not None:
+                        self.cache.put(key, self.source, response.content, self.imagery_date,
+                                       etag=response.headers.get("ETag"),
+                                       last_modified=response.headers.get("Last-Modified"))
+                    return response.content
+                if status == 304 and cached is not None:
+                    stats.not_modified += 1
+                    self.cache.refresh(key, self.source, self.imagery_date)
+                    return cached.data
+                if status in THROTTLE_STATUSES:
+                    stats.throttled += 1
+                if status not in RETRY_STATUSES:
+                    logger.warning(f"Tile {key} returned HTTP {status}")
+                    break
+
+            if attempt == config.max_retries:
+                reason = error if response is None else f"HTTP {response.status_code}"
+                logger.warning(f"Tile {key} failed after {attempt + 1} attempts: {reason}")
+                break
+            stats.retries += 1
+            delay = _retry_after(response)
+            if delay is None:
+                delay = random.uniform(0, min(config.backoff_max_sec, config.backoff_base_sec * 2 ** attempt))
+            await asyncio.sleep(min(delay, config.backoff_max_sec))
+
+        if cached is not None:
+            self.stats.stale_served += 1
+            return cached.data
+        self.stats.failed += 1
+        return None
+
+    async def fetch_many(self, keys: Iterable[TileKey]) -> Dict[TileKey, Optional[bytes]]:
+        """Fetch tiles concurrently, returning a dict keyed by (z, x, y)."""
+        keys = list(keys)
+        start = time.perf_counter()
+        images = await asyncio.gather(*(self.fetch(key) for key in keys))
+        self.stats.wall_sec += time.perf_counter() - start
+        return dict(zip(keys, images))
+
+    def summary(self) -> Dict:
+        """Fetch stats plus the concurrency limit's course."""
+        summary = self.stats.summary()
+        summary.update(
+            concurrency=int(self.limiter.limit),
+            concurrency_peak=int(self.limiter.peak),
+            concurrency_decreases=self.limiter.decreases
+        )
+        return summary
+
+    async def close(self) -> None:
+        await self._client.aclose()
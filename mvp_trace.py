@@ -0,0 +1,225 @@
+"""
+Stage-level run tracing.
+Records wall time, CPU time, peak RSS and item counts for each stage of a
+run and writes them as one JSON record per run (plus an optional Chrome
+trace), so a slow run can be broken down without diffing log timestamps.
+"""
+import asyncio
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Process peak resident set size so far in MB, or None if unavailable."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KB, macOS bytes
+        return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+    if psutil is not None:
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / 1024 ** 2
+    return None
+
+
+@dataclass
+class StageRecord:
+    """
+    One timed stage.
+
+    cpu_sec is process CPU time (all threads) while the stage was open, so
+    stages that overlap with other work also include that work's CPU.
+    peak_rss_mb is the process high-water mark when the stage ended.
+    """
+    name: str
+    parent: Optional[str] = None
+    start_sec: float = 0.0      # Offset from the start of the run
+    wall_sec: float = 0.0
+    cpu_sec: float = 0.0
+    peak_rss_mb: Optional[float] = None
+    counts: Dict[str, int] = field(default_factory=dict)
+    details: Dict[str, Any] = field(default_factory=dict)
+    lane: int = 0               # Thread/task lane for the Chrome trace
+
+    def count(self, **counts: int) -> None:
+        """Add item counts (tiles, roofs, emails, bytes...) to the stage."""
+        for key, value in counts.items():
+            self.counts[key] = self.counts.get(key, 0) + int(value)
+
+
+_tracer: contextvars.ContextVar[Optional["RunTracer"]] = contextvars.ContextVar("mvp_tracer", default=None)
+_stage: contextvars.ContextVar[Optional[StageRecord]] = contextvars.ContextVar("mvp_stage", default=None)
+
+
+class RunTracer:
+    """
+    Collects the stages of one run.
+
+    Activate it around the run (``with tracer.activate():``); code anywhere
+    below then opens stages through the module-level ``stage()``, which is
+    a no-op when no tracer is active. Tasks and ``asyncio.to_thread``
+    calls inherit the active tracer through contextvars.
+    """
+
+    def __init__(self, run: str, **meta: Any):
+        """
+        Initialize tracer.
+
+        Args:
+            run: Run label (e.g. the zipcode)
+            **meta: Extra fields stored in the run record
+        """
+        self.run = run
+        self.meta = meta
+        self.started_at = time.time()
+        self.stages: List[StageRecord] = []
+        self._t0 = time.perf_counter()
+        self._cpu0 = time.process_time()
+        self._lanes: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def _lane(self) -> int:
+        try:
+            owner = id(asyncio.current_task())
+        except RuntimeError:
+            owner = threading.get_ident()
+        with self._lock:
+            return self._lanes.setdefault(owner, len(self._lanes))
+
+    @contextmanager
+    def activate(self) -> Iterator["RunTracer"]:
+        token = _tracer.set(self)
+        try:
+            yield self
+        finally:
+            _tracer.reset(token)
+
+    @contextmanager
+    def stage(self, name: str, **counts: int) -> Iterator[StageRecord]:
+        parent = _stage.get()
+        record = StageRecord(
+            name=name,
+            parent=parent.name if parent is not None else None,
+            start_sec=time.perf_counter() - self._t0,
+            lane=self._lane()
+        )
+        record.count(**counts)
+        token = _stage.set(record)
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield record
+        finally:
+            record.wall_sec = time.perf_counter() - wall_start
+            record.cpu_sec = time.process_time() - cpu_start
+            record.peak_rss_mb = peak_rss_mb()
+            _stage.reset(token)
+            with self._lock:
+                self.stages.append(record)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Per stage name: calls, total wall/CPU seconds and summed counts."""
+        totals: Dict[str, Dict[str, Any]] = {}
+        for record in sorted(self.stages, key=lambda r: r.start_sec):
+            total = totals.setdefault(record.name, {"calls": 0, "wall_sec": 0.0, "cpu_sec": 0.0, "counts": {}})
+            total["calls"] += 1
+            total["wall_sec"] += record.wall_sec
+            total["cpu_sec"] += record.cpu_sec
+            for key, value in record.counts.items():
+                total["counts"][key] = total["counts"].get(key, 0) + value
+        for total in totals.values():
+            total["wall_sec"] = round(total["wall_sec"], 3)
+            total["cpu_sec"] = round(total["cpu_sec"], 3)
+        return totals
+
+    def to_record(self) -> dict:
+        """The run as one JSON-serializable record."""
+        return {
+            "run": self.run,
+            "started_at": self.started_at,
+            "wall_sec": round(time.perf_counter() - self._t0, 3),
+            "cpu_sec": round(time.process_time() - self._cpu0, 3),
+            "peak_rss_mb": peak_rss_mb(),
+            **self.meta,
+            "summary": self.summary(),
+            "stages": [asdict(r) for r in sorted(self.stages, key=lambda r: r.start_sec)],
+        }
+
+    def write_json(self, path: str) -> None:
+        """Write the run record as a JSON file."""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_record(), f, indent=2, default=str)
+
+    def append_jsonl(self, path: str) -> None:
+        """Append the run record as one line of a JSONL history file."""
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(self.to_record(), default=str) + "\n")
+
+    def write_chrome_trace(self, path: str) -> None:
+        """Write the stages as a Chrome trace (chrome://tracing, Perfetto)."""
+        pid = os.getpid()
+        events = [
+            {
+                "name": r.name,
+                "cat": "stage",
+                "ph": "X",
+                "ts": round(r.start_sec * 1e6),
+                "dur": round(r.wall_sec * 1e6),
+                "pid": pid,
+                "tid": r.lane,
+                "args": {**r.counts, "cpu_sec": round(r.cpu_sec, 3)},
+            }
+            for r in self.stages
+        ]
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def print_summary(self) -> None:
+        print(f"\n⏱️  Stage timings ({self.run}):")
+        for name, total in self.summary().items():
+            counts = ", ".join(f"{k}={v}" for k, v in total["counts"].items())
+            calls = f" x{total['calls']}" if total["calls"] > 1 else ""
+            print(f"   {name:<20} {total['wall_sec']:8.2f}s wall {total['cpu_sec']:8.2f}s cpu{calls}"
+                  f"{'  ' + counts if counts else ''}")
+
+
+@contextmanager
+def stage(name: str, **counts: int) -> Iterator[StageRecord]:
+    """
+    Time a stage of the active run; does nothing when no tracer is active.
+
+    Usage::
+
+        with stage("email.build") as s:
+            ...
+            s.count(emails=len(emails))
+    """
+    tracer = _tracer.get()
+    if tracer is None:
+        yield StageRecord(name=name)
+        return
+    with tracer.stage(name, **counts) as record:
+        yield record
+
+
+def current_tracer() -> Optional[RunTracer]:
+    """The active tracer, or None."""
+    return _tracer.get()
@@ -9,9 +9,10 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent / "AI_Roof_Damage_Detection"))
 sys.path.insert(0, str(Path(__file__).parent))
 
-from main import analyze_and_email
+from mvp_app import bootstrap, analyze_and_email_per_property
 
 if __name__ == "__main__":
+    bootstrap()
     # Default zipcode for testing
     zipcode = sys.argv[1] if len(sys.argv) > 1 else "75201"
     recipient = "aliyanew16@gmail.com"
@@ -23,5 +24,5 @@ if __name__ == "__main__":
     print("=" * 60)
     print()
     
-    asyncio.run(analyze_and_email(zipcode, recipient))
+    asyncio.run(analyze_and_email_per_property(zipcode, [recipient]))
 
@@ -0,0 +1,5 @@
+"""Put the MVP modules on sys.path, as main.py and the benchmarks do."""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,59 @@
+"""RunManifest.adopt: moving a run's pipeline outputs into its run directory."""
+import pytest
+from loguru import logger
+
+from mvp_artifacts import RunManifest
+
+
+@pytest.fixture
+def warnings():
+    messages = []
+    handler_id = logger.add(messages.append, level="WARNING", format="{message}")
+    yield messages
+    logger.remove(handler_id)
+
+
+def test_adopt_moves_the_runs_outputs(tmp_path, warnings):
+    manifest = RunManifest(str(tmp_path / "output"))
+    artifacts = manifest.new_run("75201")
+    source = tmp_path / "shared"
+    source.mkdir()
+    for name in ("75201_1.json", "75201_1_annotated.png", "75201_1_heatmap.png", "75201_2.json"):
+        (source / name).write_text("x")
+
+    manifest.adopt(artifacts, str(source), "75201_1", expected=("json", "annotated", "heatmap"))
+    artifacts = manifest.record(artifacts)
+
+    assert artifacts.json.endswith("75201_1.json")
+    assert artifacts.annotated.endswith("75201_1_annotated.png")
+    assert artifacts.heatmap.endswith("75201_1_heatmap.png")
+    assert sorted(p.name for p in source.iterdir()) == ["75201_2.json"]
+    assert warnings == []
+
+
+def test_adopt_warns_about_missing_expected_outputs(tmp_path, warnings):
+    manifest = RunManifest(str(tmp_path / "output"))
+    artifacts = manifest.new_run("75201")
+    source = tmp_path / "shared"
+    source.mkdir()
+    (source / "75201_1.json").write_text("x")
+
+    manifest.adopt(artifacts, str(source), "75201_1", expected=("json", "annotated"))
+    artifacts = manifest.record(artifacts)
+
+    assert artifacts.json.endswith("75201_1.json")
+    assert artifacts.annotated is None
+    assert len(warnings) == 1
+    assert "annotated" in warnings[0] and "75201_1_annotated.png" in warnings[0]
+
+
+def test_adopt_ignores_outputs_that_were_not_expected(tmp_path, warnings):
+    manifest = RunManifest(str(tmp_path / "output"))
+    artifacts = manifest.new_run("75201")
+    source = tmp_path / "shared"
+    source.mkdir()
+    (source / "75201_1.json").write_text("x")
+
+    manifest.adopt(artifacts, str(source), "75201_1")
+
+    assert warnings == []
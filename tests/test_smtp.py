@@ -0,0 +1,153 @@
+"""SMTPTransport against a local SMTP server: pooling, reconnects, per-message results."""
+import smtplib
+import socketserver
+import threading
+from email.message import EmailMessage
+
+import pytest
+
+from mvp_dispatch import is_transient_error
+from mvp_smtp import CONNECTION_ERRORS, SMTPTransport
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """
+    Minimal SMTP server session (no TLS, no AUTH).
+
+    Recipients containing "reject" get a 550. With ``drop_after`` set, the
+    connection is closed without a reply to the command after that many
+    accepted messages, as a server timing out an idle session would.
+    """
+
+    def reply(self, line: str) -> None:
+        self.wfile.write((line + "\r\n").encode())
+
+    def handle(self) -> None:
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        accepted = 0
+        recipients = []
+        self.reply("220 localhost test SMTP")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode().strip()
+            verb = command.split(" ", 1)[0].upper()
+            if server.drop_after is not None and accepted >= server.drop_after and verb == "MAIL":
+                return
+            if verb in ("EHLO", "HELO"):
+                self.reply("250 localhost")
+            elif verb == "MAIL":
+                recipients = []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                address = command.split(":", 1)[1].strip(" <>")
+                with server.lock:
+                    server.rcpt_attempts.append(address)
+                if "reject" in address:
+                    self.reply("550 No such user")
+                else:
+                    recipients.append(address)
+                    self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b""):
+                    pass
+                accepted += 1
+                with server.lock:
+                    server.delivered.extend(recipients)
+                self.reply("250 OK")
+            elif verb in ("RSET", "NOOP"):
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class SMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, drop_after=None):
+        super().__init__(("127.0.0.1", 0), SMTPHandler)
+        self.drop_after = drop_after
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.delivered = []
+        self.rcpt_attempts = []
+
+
+@pytest.fixture
+def smtp_server(request):
+    server = SMTPServer(drop_after=getattr(request, "param", None))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def make_transport(server: SMTPServer, pool_size: int = 2) -> SMTPTransport:
+    host, port = server.server_address
+    return SMTPTransport(host, port, use_tls=False, pool_size=pool_size, timeout=5.0)
+
+
+def make_message(recipient: str) -> EmailMessage:
+    msg = EmailMessage()
+    msg["From"] = "mvp@example.com"
+    msg["To"] = recipient
+    msg["Subject"] = "Roof damage report"
+    msg.set_content("report")
+    return msg
+
+
+def test_batch_reuses_pooled_connections(smtp_server):
+    recipients = [f"owner{i}@example.com" for i in range(10)]
+    with make_transport(smtp_server) as transport:
+        report = transport.send_batch([make_message(r) for r in recipients])
+
+    assert [r.success for r in report.results] == [True] * 10
+    assert [r.recipient for r in report.results] == recipients
+    assert report.connections_opened <= 2
+    assert sorted(smtp_server.delivered) == sorted(recipients)
+
+
+@pytest.mark.parametrize("smtp_server", [1], indirect=True)
+def test_dropped_connection_is_reopened(smtp_server):
+    # The server drops every connection after one message
+    recipients = [f"owner{i}@example.com" for i in range(4)]
+    with make_transport(smtp_server, pool_size=1) as transport:
+        report = transport.send_batch([make_message(r) for r in recipients])
+
+    assert report.sent == 4
+    assert report.connections_opened == 4
+    assert smtp_server.delivered == recipients
+
+
+def test_rejected_recipient_fails_alone_without_retry(smtp_server):
+    recipients = ["owner1@example.com", "reject@example.com", "owner2@example.com"]
+    with make_transport(smtp_server, pool_size=1) as transport:
+        report = transport.send_batch([make_message(r) for r in recipients])
+
+    assert [r.success for r in report.results] == [True, False, True]
+    failed = report.results[1]
+    assert failed.smtp_code == 550
+    # Refused once, and the connection stayed in use for the next message
+    assert smtp_server.rcpt_attempts.count("reject@example.com") == 1
+    assert report.connections_opened == 1
+    assert smtp_server.delivered == ["owner1@example.com", "owner2@example.com"]
+
+
+def test_protocol_and_auth_errors_are_not_connection_errors():
+    auth_error = smtplib.SMTPAuthenticationError(535, b"Authentication failed")
+    protocol_error = smtplib.SMTPDataError(554, b"Transaction failed")
+    assert not isinstance(auth_error, CONNECTION_ERRORS)
+    assert not isinstance(protocol_error, CONNECTION_ERRORS)
+    assert not is_transient_error(auth_error)
+    assert not is_transient_error(smtplib.SMTPNotSupportedError("STARTTLS not supported"))
+    assert is_transient_error(smtplib.SMTPServerDisconnected("Connection unexpectedly closed"))
+    assert is_transient_error(TimeoutError("timed out"))